@@ -0,0 +1,12 @@
+'use strict';
+
+// Computes the MFCC summary for /api/evaluate/features off the main thread
+importScripts('featureExtractor.js');
+
+self.onmessage = function(e) {
+  try {
+    self.postMessage({ command: 'features', payload: CoughFeatures.extractFeatures(e.data.channels, e.data.sampleRate) });
+  } catch (error) {
+    self.postMessage({ command: 'featuresError', error: error.message });
+  }
+};
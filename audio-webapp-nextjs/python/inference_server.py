@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cpu_runtime
+
+# Size this process's torch, BLAS and OpenMP pools (and with CPU_THREADS=...:pin, pin it like
+# prefork.py's first worker) before numpy and the models create them
+cpu_runtime.apply(worker_index=0 if __name__ == "__main__" else None)
+
+import model_registry
+import model_manager
+import feature_pipeline
+import feature_schema
+import feature_cache
+import batching
+import head_runner
+import metrics
+import result_cache
+import predict_covid
+import predict_age
+
+# Predictors served by /evaluate
+PREDICTORS = [predict_covid, predict_age]
+
+# Accept browser-computed MFCC features on /evaluate_features
+CLIENT_FEATURES = os.environ.get("CLIENT_FEATURES", "1") == "1"
+
+# Predictor heads run concurrently, each with its own timeout (as in the Flask app)
+HEAD_WORKERS = int(os.environ.get("HEAD_WORKERS", head_runner.DEFAULT_HEAD_WORKERS))
+HEAD_TIMEOUT_SECONDS = float(os.environ.get("HEAD_TIMEOUT_SECONDS", head_runner.DEFAULT_HEAD_TIMEOUT_SECONDS))
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def _feature_types():
+    """Feature type of each predictor's serving model (None when it can't be loaded)"""
+    feature_types = {}
+    for predictor in PREDICTORS:
+        try:
+            feature_types[predictor.PREDICTOR_NAME] = predictor.get_feature_type()
+        except Exception as e:
+            print(f"Could not load the {predictor.PREDICTOR_NAME} model: {e}")
+            feature_types[predictor.PREDICTOR_NAME] = None
+    return feature_types
+
+
+def create_batcher(executor, max_batch_size=batching.DEFAULT_MAX_BATCH_SIZE, max_wait_ms=batching.DEFAULT_MAX_WAIT_MS):
+    """Micro-batcher running every head of PREDICTORS in isolation, so one broken model doesn't fail the others"""
+    return batching.MicroBatcher(
+        lambda audio_paths: head_runner.evaluate_batch(audio_paths, PREDICTORS, executor, HEAD_TIMEOUT_SECONDS),
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+    )
+
+
+def head_results(evaluation):
+    """{name: result} from a head_runner evaluation, with {"error": ...} for each head that failed"""
+    return {name: head['result'] if head['status'] == 'ok' else {'error': head['error']}
+            for name, head in evaluation['heads'].items()}
+
+
+def _client_features_enabled(feature_types):
+    """Browser-computed features are only accepted when every model takes them (CLIENT_FEATURES=0 disables)"""
+    return CLIENT_FEATURES and all(feature_type in feature_pipeline.CLIENT_FEATURE_TYPES
+                                   for feature_type in feature_types.values())
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """JSON protocol for the Next.js route
+
+    GET  /health    -> {"status": "ok"}
+    GET  /metrics   -> Prometheus text format (stage latency histograms, model loads, cache stats)
+    POST /evaluate  {"audio_path": "..."} -> {"results": {"covid": {...}, "age": {...}}}; a head
+                    that failed is {"error": "..."} and the others are still returned (500 only
+                    when every head failed)
+    POST /evaluate  raw audio bytes (application/octet-stream) -> same response,
+                    decoded in memory without touching disk; identical bodies are answered
+                    from the result cache (X-Result-Cache: hit, coalesced or miss)
+    GET  /cache/metrics  -> result and feature cache statistics
+    GET  /features/config  -> whether the browser may compute the features itself, and its settings
+    POST /evaluate_features  {"feature_type": "mfcc", "n_mfcc": 40, "sample_rate": 16000, "features": [...]}
+                    -> same response, without decoding or feature extraction
+    """
+
+    # Head thread pool and the micro-batcher grouping concurrent evaluations (set in main;
+    # no batcher when batching is disabled)
+    executor = None
+    batcher = None
+    # --batch-max-size left unset: only batch while that shares wav2vec2 passes
+    batch_auto = True
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/cache/metrics":
+            results, features = result_cache.get_cache(), feature_cache.get_cache()
+            self._send_json(200, {"results": results.stats() if results is not None else None,
+                                  "features": features.stats() if features is not None else None})
+        elif self.path == "/features/config":
+            feature_types = _feature_types()
+            self._send_json(200, {"enabled": _client_features_enabled(feature_types), "feature_types": feature_types,
+                                  **feature_pipeline.client_feature_config()})
+        elif self.path == "/models":
+            self._send_json(200, {predictor.PREDICTOR_NAME: predictor.get_manager().status()
+                                  for predictor in PREDICTORS})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/evaluate_features":
+            self._evaluate_features()
+            return
+        if self.path != "/evaluate":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.headers.get("Content-Type", "").startswith("application/octet-stream"):
+            if not body:
+                self._send_json(400, {"error": "Empty audio body"})
+                return
+            source = body
+        else:
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError as e:
+                self._send_json(400, {"error": f"Invalid JSON request: {e}"})
+                return
+            source = request.get("audio_path")
+            if not source:
+                self._send_json(400, {"error": "audio_path is required"})
+                return
+
+        start = time.perf_counter()
+        try:
+            evaluation, outcome = self._evaluate(source)
+            results = head_results(evaluation)
+            headers = {"X-Result-Cache": outcome} if outcome else None
+            if all(head['status'] != 'ok' for head in evaluation['heads'].values()):
+                self._send_json(500, {"error": "All predictions failed", "results": results}, headers)
+                metrics.inc("http_requests_total", route="/evaluate", status=500)
+            else:
+                self._send_json(200, {"results": results}, headers)
+                metrics.inc("http_requests_total", route="/evaluate", status=200)
+        except Exception as e:
+            metrics.inc("http_requests_total", route="/evaluate", status=500)
+            print(f"Error processing {feature_pipeline.describe_source(source)}: {e}")
+            print(traceback.format_exc())
+            self._send_json(500, {"error": f"Error processing audio: {e}"})
+        metrics.observe("http_request_seconds", time.perf_counter() - start, route="/evaluate")
+
+    def _evaluate(self, source):
+        """Batch-evaluate a source; raw bodies go through the result cache (paths may change on disk)
+
+        Evaluations are cached when every head succeeded except those whose
+        model can't be loaded, under a key that changes once it loads.
+        Returns (head_runner evaluation, 'hit' | 'coalesced' | 'miss' | None).
+        """
+        compute = lambda: self._run(source)
+        cache = result_cache.get_cache()
+        if cache is None or not isinstance(source, bytes):
+            return compute(), None
+        state = result_cache.model_state(PREDICTORS)
+        unavailable = result_cache.unavailable(state)
+        key = result_cache.request_key(source, "batch", state)
+        return cache.get_or_compute(key, compute, cacheable=lambda evaluation: all(
+            head['status'] == 'ok' or name in unavailable for name, head in evaluation['heads'].items()))
+
+    def _run(self, source):
+        """Evaluate a source through the micro-batcher, or on its own when batching wouldn't help"""
+        if self.batcher is None or (self.batch_auto and not feature_pipeline.micro_batching_helps(PREDICTORS)):
+            return head_runner.evaluate_file(source, PREDICTORS, self.executor, HEAD_TIMEOUT_SECONDS)
+        return self.batcher.submit(source).result()
+
+    def _evaluate_features(self):
+        """Run the predictors on an MFCC summary computed in the browser"""
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            features = feature_pipeline.parse_client_features(json.loads(self.rfile.read(length) or b"{}"))
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid features: {e}"})
+            return
+        feature_types = _feature_types()
+        if not _client_features_enabled(feature_types):
+            self._send_json(409, {"error": "The models need features the client cannot compute; upload the audio instead",
+                                  "feature_types": feature_types})
+            return
+
+        start = time.perf_counter()
+        try:
+            results = {predictor.PREDICTOR_NAME: predictor.predict_from_features(features)
+                       for predictor in PREDICTORS}
+            self._send_json(200, {"results": results})
+            metrics.inc("http_requests_total", route="/evaluate_features", status=200)
+        except feature_schema.FeatureSchemaError as e:
+            # The vector passed parse_client_features() but doesn't fit a serving model
+            metrics.inc("http_requests_total", route="/evaluate_features", status=400)
+            self._send_json(400, {"error": f"Invalid features: {e}"})
+        except Exception as e:
+            metrics.inc("http_requests_total", route="/evaluate_features", status=500)
+            print(f"Error evaluating client features: {e}")
+            print(traceback.format_exc())
+            self._send_json(500, {"error": f"Error evaluating features: {e}"})
+        metrics.observe("http_request_seconds", time.perf_counter() - start, route="/evaluate_features")
+
+    def log_message(self, format, *args):
+        print(f"inference_server: {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident inference server for the audio biomarker predictors")
+    parser.add_argument("--host", default=os.environ.get("INFERENCE_SERVER_HOST", DEFAULT_HOST),
+                        help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("INFERENCE_SERVER_PORT", DEFAULT_PORT)),
+                        help="Port to listen on")
+    parser.add_argument("--batch-max-size", type=int, default=os.environ.get("BATCH_MAX_SIZE"),
+                        help=f"Maximum number of recordings evaluated in one batch (default "
+                             f"{batching.DEFAULT_MAX_BATCH_SIZE}, but only while batches share wav2vec2 passes; "
+                             f"1 disables batching)")
+    parser.add_argument("--batch-max-wait-ms", type=float,
+                        default=float(os.environ.get("BATCH_MAX_WAIT_MS", batching.DEFAULT_MAX_WAIT_MS)),
+                        help="How long the first request of a batch waits for others to join")
+    parser.add_argument("--model-watch-seconds", type=float, default=model_manager.DEFAULT_WATCH_SECONDS,
+                        help="Deploy new model package versions as they appear, checking this often (0 disables)")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Report import, model load and first-request times and exit")
+    args = parser.parse_args()
+
+    if args.startup_profile:
+        import profiling
+        return 0 if profiling.startup_profile("inference_server") else 1
+
+    InferenceHandler.executor = head_runner.create_executor(HEAD_WORKERS)
+    InferenceHandler.batch_auto = args.batch_max_size is None
+    batch_max_size = batching.DEFAULT_MAX_BATCH_SIZE if args.batch_max_size is None else args.batch_max_size
+    if batch_max_size > 1:
+        InferenceHandler.batcher = create_batcher(InferenceHandler.executor, batch_max_size, args.batch_max_wait_ms)
+
+    # Load everything before accepting requests
+    print("Warming up models...")
+    model_registry.warm_up(PREDICTORS)
+    model_manager.start_watchers(PREDICTORS, args.model_watch_seconds)
+
+    server = ThreadingHTTPServer((args.host, args.port), InferenceHandler)
+    print(f"Inference server listening on http://{args.host}:{args.port} "
+          f"(batches of up to {batch_max_size}, {args.batch_max_wait_ms} ms window)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import subprocess
+
+# The predictors' models directory, so packages written from any working directory are served
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+
+# Version of the package layout below; bump when it changes incompatibly
+FORMAT_VERSION = 1
+MODEL_FILE = "model.joblib"
+MANIFEST_FILE = "manifest.json"
+
+# One packages directory can be shared by several apps (and every worker on the
+# host) so they all map the same files; defaults to <models dir>/packages
+PACKAGES_DIR = os.environ.get("MODEL_PACKAGES_DIR")
+# Set MODEL_PACKAGE_VERIFY=0 to skip checksum verification on load
+VERIFY_CHECKSUMS = os.environ.get("MODEL_PACKAGE_VERIFY", "1") == "1"
+
+# A package is a versioned directory:
+#   <packages dir>/<name>/v<version>/manifest.json   format, versions, feature_info, checksums
+#   <packages dir>/<name>/v<version>/model.joblib    uncompressed joblib dump of the estimator
+# Uncompressed joblib stores every NumPy array (coefficients, tree node and value
+# arrays) as raw aligned bytes, so joblib.load(mmap_mode='r') maps them straight
+# from the page cache instead of copying them into each process.
+
+
+def packages_dir(models_dir):
+    """Root directory holding the packages for an app whose models live in models_dir"""
+    return PACKAGES_DIR or os.path.join(models_dir, "packages")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _to_json(value):
+    """feature_info values as JSON (tuples become lists, NumPy scalars become numbers)"""
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _from_json(feature_info):
+    feature_info = dict(feature_info)
+    if feature_info.get("input_shape") is not None:
+        feature_info["input_shape"] = tuple(feature_info["input_shape"])
+    return feature_info
+
+
+def versions(package_root):
+    """Versions available under <packages dir>/<name>, oldest first"""
+    if not os.path.isdir(package_root):
+        return []
+    found = []
+    for entry in os.listdir(package_root):
+        if entry.startswith("v") and entry[1:].isdigit() and \
+                os.path.exists(os.path.join(package_root, entry, MANIFEST_FILE)):
+            found.append(int(entry[1:]))
+    return sorted(found)
+
+
+def latest(package_root):
+    """Directory of the newest version under package_root, or None if there is none"""
+    available = versions(package_root)
+    return os.path.join(package_root, f"v{available[-1]}") if available else None
+
+
+def package(model, feature_info, package_root, version=None, source=None):
+    """Write model and feature_info as a new version under package_root; returns its directory
+
+    The version directory is written under a temporary name and renamed
+    into place, so readers never see a half-written package.
+    """
+    import joblib
+    import sklearn
+    import numpy as np
+
+    if version is None:
+        version = (versions(package_root) or [0])[-1] + 1
+    version_dir = os.path.join(package_root, f"v{version}")
+    if os.path.exists(version_dir):
+        raise FileExistsError(f"Package version already exists: {version_dir}")
+
+    tmp_dir = f"{version_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir)
+    model_path = os.path.join(tmp_dir, MODEL_FILE)
+    joblib.dump(model, model_path, compress=0)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "name": os.path.basename(os.path.normpath(package_root)),
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": source,
+        "model_class": f"{type(model).__module__}.{type(model).__name__}",
+        "feature_info": _to_json(feature_info),
+        "files": {MODEL_FILE: {"sha256": _sha256(model_path), "bytes": os.path.getsize(model_path)}},
+        "python": platform.python_version(),
+        "sklearn": sklearn.__version__,
+        "numpy": np.__version__,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(tmp_dir, version_dir)
+    return version_dir
+
+
+def read_manifest(version_dir):
+    with open(os.path.join(version_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model package format {manifest.get('format')} in {version_dir}")
+    return manifest
+
+
+def verify(version_dir):
+    """Raise ValueError if any file's checksum differs from the manifest"""
+    manifest = read_manifest(version_dir)
+    for name, expected in manifest["files"].items():
+        actual = _sha256(os.path.join(version_dir, name))
+        if actual != expected["sha256"]:
+            raise ValueError(f"Checksum mismatch for {name} in {version_dir}")
+    return manifest
+
+
+def load(version_dir, mmap=True, verify_checksums=VERIFY_CHECKSUMS):
+    """Load (model, feature_info, manifest) from a package version directory
+
+    With mmap=True the model's arrays are read-only views of the mapped
+    file and are shared by every process that loads the same package.
+    """
+    import joblib
+    manifest = verify(version_dir) if verify_checksums else read_manifest(version_dir)
+    model = joblib.load(os.path.join(version_dir, MODEL_FILE), mmap_mode="r" if mmap else None)
+    return model, _from_json(manifest["feature_info"]), manifest
+
+
+# Runs in a fresh interpreter: load once and print load time and memory growth as JSON
+_MEASURE_SCRIPT = """
+import sys, json, time
+sys.path.insert(0, {app_dir!r})
+import model_package
+def memory():
+    fields = {{}}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[1].isdigit():
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        fields['Rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return fields
+{preload}
+before = memory()
+start = time.perf_counter()
+{load}
+seconds = time.perf_counter() - start
+after = memory()
+print(json.dumps({{'seconds': seconds, **{{key: after[key] - before.get(key, 0) for key in after}}}}))
+"""
+
+
+def measure(load_code, preload_code=""):
+    """Load time and RSS / private-dirty growth (MB) of one load in a fresh process
+
+    preload_code runs before the first measurement, so library imports
+    (sklearn, joblib) aren't counted as the model's memory.
+    """
+    script = _MEASURE_SCRIPT.format(app_dir=os.path.dirname(os.path.abspath(__file__)),
+                                    preload=preload_code, load=load_code)
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _report(pickle_path, version_dir, repeats):
+    """Print pickle vs package load time and per-worker memory growth"""
+    runs = {
+        "pickle": f"loaded = joblib.load({pickle_path!r})",
+        "package (mmap)": f"loaded = model_package.load({version_dir!r}, verify_checksums=False)",
+        "package (mmap, verified)": f"loaded = model_package.load({version_dir!r}, verify_checksums=True)",
+        "package (no mmap)": f"loaded = model_package.load({version_dir!r}, mmap=False, verify_checksums=False)",
+    }
+    model_module = read_manifest(version_dir)["model_class"].rsplit(".", 1)[0]
+    preload = f"import joblib, importlib; importlib.import_module({model_module!r})"
+    print(f"{'loader':<26} {'load s':>8} {'RSS MB':>8} {'private dirty MB':>17}")
+    for label, code in runs.items():
+        results = [measure(code, preload) for _ in range(repeats)]
+        seconds = min(r["seconds"] for r in results)
+        rss = min(r.get("Rss", 0) for r in results)
+        dirty = min(r.get("Private_Dirty", float("nan")) for r in results)
+        print(f"{label:<26} {seconds:8.3f} {rss:8.1f} {dirty:17.1f}")
+    print("Private dirty memory is what every worker pays for itself; mapped, clean pages are shared.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Package pickled models into versioned, memory-mappable bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("package", help="Write a new package version from a pickled model")
+    create.add_argument("--model", required=True, help="Pickled (or joblib-dumped) estimator")
+    create.add_argument("--feature-info", help="Pickled feature_info dict (default: {'feature_type': 'mfcc'})")
+    create.add_argument("--name", required=True, help="Package name, e.g. covid or age")
+    create.add_argument("--packages-dir", default=packages_dir(MODELS_DIR),
+                        help="Root directory of the packages (default: where the predictors look)")
+    create.add_argument("--version", type=int, help="Version number (default: latest + 1)")
+    create.add_argument("--report", action="store_true", help="Compare load time and memory with the pickle")
+    create.add_argument("--repeats", type=int, default=3, help="Fresh-process loads per loader for --report")
+
+    check = commands.add_parser("verify", help="Check a package version's checksums")
+    check.add_argument("version_dir")
+
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        manifest = verify(args.version_dir)
+        print(f"{manifest['name']} v{manifest['version']}: checksums OK")
+        return 0
+
+    # joblib.load reads both plain pickles and joblib dumps (age_model.pkl is one)
+    import joblib
+    model = joblib.load(args.model)
+    feature_info = joblib.load(args.feature_info) if args.feature_info else {"feature_type": "mfcc"}
+
+    version_dir = package(model, feature_info, os.path.join(args.packages_dir, args.name),
+                          args.version, source=os.path.basename(args.model))
+    print(f"Wrote {version_dir}")
+    if args.report:
+        _report(args.model, version_dir, args.repeats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
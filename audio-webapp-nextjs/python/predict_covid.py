@@ -1,12 +1,13 @@
 import os
-import sys
 import pickle
-import numpy as np
-import librosa
-import torch
-import torchaudio
 import argparse
-from transformers import Wav2Vec2Processor, Wav2Vec2Model
+
+import model_registry
+import model_package
+import model_manager
+import feature_pipeline
+import metrics
+import cpu_runtime
 
 # Set paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,8 +16,15 @@ MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
 MODEL_PATH = os.path.join(MODELS_DIR, "covid_cough_classifier_v1.pkl")
 FEATURE_INFO_PATH = os.path.join(MODELS_DIR, "feature_info.pkl")
 
-def load_model():
-    """Load the trained COVID prediction model"""
+# Key for this predictor's result in feature_pipeline.run_predictors()
+PREDICTOR_NAME = "covid"
+
+# Versioned, memory-mapped packages written by model_package.py; served by model_manager, which
+# falls back to the pickles below when there is none
+PACKAGE_ROOT = os.path.join(model_package.packages_dir(MODELS_DIR), PREDICTOR_NAME)
+
+def _load_model_files():
+    """Read the trained COVID prediction model and feature info from the legacy pickles"""
     if not os.path.exists(MODEL_PATH):
         raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
     
@@ -38,115 +46,93 @@ def load_model():
     
     return model, feature_info
 
+def get_manager():
+    """Model manager serving this predictor's model versions"""
+    return model_manager.get_manager(PREDICTOR_NAME, PACKAGE_ROOT, _load_model_files)
+
+def load_model():
+    """Return the (model, feature_info) of the version currently taking most traffic"""
+    version = get_manager().primary()
+    return version.model, version.feature_info
+
 def load_audio_model():
-    """Load a pretrained audio model from Hugging Face"""
-    print("Loading audio model...")
-    try:
-        processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-        model = Wav2Vec2Model.from_pretrained("facebook/wav2vec2-base-960h")
-        print("Loaded wav2vec2 model successfully")
-        return processor, model
-    except Exception as e:
-        print(f"Error loading wav2vec2 model: {e}")
-        print("Falling back to MFCC features")
-        return None, None
+    """Load a pretrained audio model from Hugging Face (shared with the other predictors)"""
+    return model_registry.get_audio_model()
+
+def warm_up():
+    """Load the model and, if this predictor needs it, the audio model"""
+    load_model()
+    if feature_pipeline.split_feature_type(get_feature_type())[0] == 'wav2vec2':
+        load_audio_model()
+
+def get_feature_type():
+    """Return the feature type the loaded model was trained on (TRIM_COVID=1/0 switches silence trimming)"""
+    model, feature_info = load_model()
+    return feature_pipeline.predictor_feature_type(PREDICTOR_NAME, feature_info)
 
 def extract_features(processor, model, audio_path, feature_type='mfcc'):
     """Extract features from audio using wav2vec2 model or MFCC fallback"""
     try:
-        # Load and resample audio
-        if os.path.exists(audio_path):
-            if processor is not None and model is not None and feature_type == 'wav2vec2':
-                # Use wav2vec2 model
-                waveform, sample_rate = torchaudio.load(audio_path)
-                if sample_rate != 16000:
-                    resampler = torchaudio.transforms.Resample(sample_rate, 16000)
-                    waveform = resampler(waveform)
-                    sample_rate = 16000
-                
-                # Ensure mono audio
-                if waveform.shape[0] > 1:
-                    waveform = torch.mean(waveform, dim=0, keepdim=True)
-                
-                # Process audio with wav2vec2 model
-                inputs = processor(waveform.squeeze().numpy(), sampling_rate=sample_rate, return_tensors="pt")
-                with torch.no_grad():
-                    outputs = model(**inputs)
-                
-                # Extract embeddings
-                embeddings = outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
-                return embeddings
-            else:
-                # Fallback to MFCC features
-                y, sr = librosa.load(audio_path, sr=16000)
-                mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40)
-                mfcc_features = np.mean(mfccs, axis=1)
-                
-                # Add delta features
-                delta_mfccs = librosa.feature.delta(mfccs)
-                delta_mfcc_features = np.mean(delta_mfccs, axis=1)
-                
-                # Add delta-delta features
-                delta2_mfccs = librosa.feature.delta(mfccs, order=2)
-                delta2_mfcc_features = np.mean(delta2_mfccs, axis=1)
-                
-                # Combine features
-                combined_features = np.concatenate([mfcc_features, delta_mfcc_features, delta2_mfcc_features])
-                return combined_features
-        else:
+        if not os.path.exists(audio_path):
             print(f"File not found: {audio_path}")
             return None
+        y, sr = feature_pipeline.load_audio(audio_path)
+        return feature_pipeline.extract(y, sr, feature_type, processor, model)
     except Exception as e:
         print(f"Error processing {audio_path}: {e}")
         return None
 
+def predict_batch(feature_matrix):
+    """Predict COVID status for a stack of feature vectors, one row per recording
+
+    Rows are split between model versions by the manager's A/B weights;
+    each result names the version that produced it.
+    """
+    results = [None] * len(feature_matrix)
+    for version, rows in get_manager().route(len(feature_matrix)):
+        # Raises FeatureSchemaError when the features don't fit this version
+        matrix = version.schema.prepare(feature_matrix, rows)
+
+        # Make predictions for all of this version's rows at once
+        try:
+            with metrics.span('predict', predictor=PREDICTOR_NAME):
+                predictions = version.model.predict(matrix)
+            with metrics.span('predict_proba', predictor=PREDICTOR_NAME):
+                probabilities = version.model.predict_proba(matrix)
+
+            for row, prediction, row_probabilities in zip(rows, predictions, probabilities):
+                results[row] = {
+                    'prediction': 'Positive' if int(prediction) == 1 else 'Negative',
+                    'confidence': float(max(row_probabilities)),
+                    'model_version': version.label,
+                }
+        except Exception as e:
+            print(f"Error during prediction with model {version.label}: {e}")
+    return results
+
+def predict_from_features(features):
+    """Predict COVID status from an already extracted feature vector"""
+    return predict_batch(features.reshape(1, -1))[0]  # Reshape for single sample prediction
+
+def format_result(result):
+    """Format a prediction from predict_from_features as a display string"""
+    return f"COVID: {result['prediction']} (Confidence: {result['confidence']:.2f})"
+
 def predict_covid(audio_path):
     """Predict COVID status from cough audio"""
-    # Load the trained model
-    model, feature_info = load_model()
-    
-    # Get feature type
-    feature_type = feature_info.get('feature_type', 'mfcc')
+    feature_type = get_feature_type()
     print(f"Using feature type: {feature_type}")
     
-    # Load audio model if needed
-    processor, audio_model = load_audio_model()
-    
     # Extract features
-    features = extract_features(processor, audio_model, audio_path, feature_type)
-    
+    features = feature_pipeline.compute_features(audio_path, [feature_type])
     if features is None:
         print(f"Failed to extract features from {audio_path}")
         return None
     
-    # Check feature shape
-    expected_shape = feature_info.get('input_shape', None)
-    if expected_shape and features.shape != expected_shape:
-        print(f"Warning: Feature shape mismatch. Expected {expected_shape}, got {features.shape}")
-        
-        # Try to reshape or pad if possible
-        if len(features) > expected_shape[0]:
-            print(f"Truncating features from {len(features)} to {expected_shape[0]}")
-            features = features[:expected_shape[0]]
-        elif len(features) < expected_shape[0]:
-            print(f"Padding features from {len(features)} to {expected_shape[0]}")
-            padding = np.zeros(expected_shape[0] - len(features))
-            features = np.concatenate([features, padding])
-    
-    # Make prediction
-    features = features.reshape(1, -1)  # Reshape for single sample prediction
-    try:
-        prediction = int(model.predict(features)[0])
-        probabilities = model.predict_proba(features)[0]
-        
-        # Format the result as a string
-        result = f"COVID: {'Positive' if prediction == 1 else 'Negative'} "
-        result += f"(Confidence: {max(probabilities):.2f})"
-        
-        return result
-    except Exception as e:
-        print(f"Error during prediction: {e}")
+    result = predict_from_features(features[feature_type])
+    if result is None:
         return None
+    return format_result(result)
 
 def main(audio_path=None):
     parser = argparse.ArgumentParser(description="Run COVID cough classifier on an audio file")
@@ -168,4 +154,6 @@ def main(audio_path=None):
         return "Error: COVID prediction failed"
 
 if __name__ == "__main__":
+    # Servers size the thread pools before importing the predictors; from the command line, do it here
+    cpu_runtime.apply()
     main()
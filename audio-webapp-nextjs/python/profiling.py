@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import uuid
+import subprocess
+import pstats
+import cProfile
+from contextlib import contextmanager
+
+# Where per-request profiles are written
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# Modules whose import dominates cold start; reported when a startup profile loads them
+HEAVY_MODULES = ('torch', 'torchaudio', 'transformers', 'onnxruntime', 'librosa', 'numba',
+                 'scipy.signal', 'sklearn', 'pyarrow')
+
+# Set PROFILE_TORCH=0 to skip the torch profiler even when torch is loaded
+PROFILE_TORCH = os.environ.get('PROFILE_TORCH', '1') == '1'
+
+
+@contextmanager
+def profile(name, profile_dir=PROFILE_DIR):
+    """Profile the enclosed block with cProfile (and the torch profiler if torch is loaded)
+
+    Yields a dict that is filled with the written file paths on exit:
+    'cprofile' (load with pstats or snakeviz), 'summary' (top functions by
+    cumulative time as text) and, with torch, 'torch_trace' (Chrome trace
+    JSON, open in chrome://tracing or Perfetto). cProfile only sees the
+    calling thread, so callers should run the work inline while profiling.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, f"{name}-{uuid.uuid4().hex[:12]}")
+    paths = {}
+
+    torch_profiler = None
+    if PROFILE_TORCH and 'torch' in sys.modules:
+        import torch.profiler
+        torch_profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU],
+                                                record_shapes=True)
+
+    profiler = cProfile.Profile()
+    if torch_profiler is not None:
+        torch_profiler.__enter__()
+    profiler.enable()
+    try:
+        yield paths
+    finally:
+        profiler.disable()
+        if torch_profiler is not None:
+            torch_profiler.__exit__(None, None, None)
+            paths['torch_trace'] = base + ".torch.json"
+            torch_profiler.export_chrome_trace(paths['torch_trace'])
+
+        paths['cprofile'] = base + ".prof"
+        profiler.dump_stats(paths['cprofile'])
+        paths['summary'] = base + ".txt"
+        with open(paths['summary'], 'w') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+        print(f"Wrote profile to {paths['cprofile']}")
+
+
+# Runs in a fresh interpreter under -X importtime; prints one JSON line of phase timings
+_STARTUP_SCRIPT = """
+import io, sys, json, time
+start = time.perf_counter()
+heavy = {heavy!r}
+loaded = lambda: [m for m in heavy if m in sys.modules]
+import {module}
+imported = time.perf_counter()
+after_import = loaded()
+import model_registry, feature_pipeline, predict_covid, predict_age
+predictors = [predict_covid, predict_age]
+model_registry.warm_up(predictors)
+warmed = time.perf_counter()
+after_warm_up = loaded()
+import numpy as np, soundfile as sf
+clip = io.BytesIO()
+sf.write(clip, np.zeros(16000, dtype=np.float32), 16000, format='WAV')
+error = None
+try:
+    feature_pipeline.run_predictors(clip.getvalue(), predictors)
+except Exception as e:
+    error = str(e)
+first = time.perf_counter()
+print("STARTUP_PROFILE " + json.dumps({{
+    'import_seconds': imported - start, 'warm_up_seconds': warmed - imported,
+    'first_request_seconds': first - warmed, 'first_request_error': error, 'after_import': after_import,
+    'after_warm_up': after_warm_up, 'after_first_request': loaded()}}))
+"""
+
+
+def _top_level_imports(importtime_output, limit):
+    """Slowest top-level imports from -X importtime output, as (module, cumulative seconds)"""
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  ") or not cumulative.strip().isdigit() or int(cumulative) < 1000:
+            continue
+        imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda item: -item[1])[:limit]
+
+
+def startup_profile(module, cwd=None, env=None, top=15):
+    """Measure cold start of module in a fresh interpreter and print a report
+
+    Phases are: importing module (with WARM_UP_MODELS=0), loading every
+    predictor's models, and the first request on a 1 s clip. Also lists
+    which heavy dependencies each phase pulled in and the slowest top-level
+    imports. Returns the timings dict, or None if the run failed.
+    """
+    child_env = dict(os.environ if env is None else env, WARM_UP_MODELS='0')
+    total_start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _STARTUP_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=cwd, env=child_env)
+    total = time.perf_counter() - total_start
+
+    report = None
+    for line in completed.stdout.splitlines():
+        if line.startswith("STARTUP_PROFILE "):
+            report = json.loads(line[len("STARTUP_PROFILE "):])
+    if completed.returncode != 0 or report is None:
+        print(f"Startup profile of {module} failed:")
+        print("\n".join(line for line in completed.stderr.splitlines() if not line.startswith("import time:")))
+        return None
+    report['total_seconds'] = total
+
+    print(f"Startup profile: {module}")
+    phases = [('import ' + module, 'import_seconds', 'after_import'),
+              ('warm-up (model loads)', 'warm_up_seconds', 'after_warm_up'),
+              ('first request', 'first_request_seconds', 'after_first_request')]
+    for label, seconds, loaded in phases:
+        print(f"  {label:<27}{report[seconds]:7.3f}s  loaded: {', '.join(report[loaded]) or '-'}")
+    if report['first_request_error']:
+        print(f"  first request failed: {report['first_request_error']}")
+    print(f"  {'total (incl. interpreter)':<27}{total:7.3f}s")
+    print("  slowest top-level imports:")
+    for name, seconds in _top_level_imports(completed.stderr, top):
+        print(f"    {seconds:7.3f}s  {name}")
+    return report
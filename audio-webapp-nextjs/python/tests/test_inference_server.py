@@ -0,0 +1,138 @@
+import json
+import threading
+import types
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import feature_pipeline
+import feature_schema
+import head_runner
+import inference_server
+import model_registry
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start the handler on a free port with the given stand-in predictors; returns a POST helper"""
+    servers = []
+
+    def start(*predictors):
+        monkeypatch.setattr(inference_server, "PREDICTORS", list(predictors))
+        executor = head_runner.create_executor(2)
+        monkeypatch.setattr(inference_server.InferenceHandler, "executor", executor)
+        monkeypatch.setattr(inference_server.InferenceHandler, "batcher",
+                            inference_server.create_batcher(executor, max_wait_ms=0))
+        server = ThreadingHTTPServer(("127.0.0.1", 0), inference_server.InferenceHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+        def post(path, payload):
+            request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}{path}",
+                                             data=json.dumps(payload).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request) as response:
+                    return response.status, json.load(response)
+            except urllib.error.HTTPError as e:
+                return e.code, json.load(e)
+        return post
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def predictor(name, predict):
+    return types.SimpleNamespace(PREDICTOR_NAME=name, get_feature_type=lambda: "mfcc", predict_from_features=predict,
+                                 predict_batch=lambda matrix: [predict(row) for row in matrix])
+
+
+def unloadable(name):
+    """A head whose model file is missing: resolving its feature type raises"""
+    def missing():
+        raise FileNotFoundError(f"Model file not found: models/{name}_prediction_model.pkl")
+    return types.SimpleNamespace(PREDICTOR_NAME=name, get_feature_type=missing)
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "cough.wav"
+    sf.write(str(path), (0.1 * np.random.default_rng(0).standard_normal(16000)).astype(np.float32), 16000)
+    return str(path)
+
+
+def client_payload():
+    config = feature_pipeline.client_feature_config()
+    return {"feature_type": "mfcc", "n_mfcc": config["n_mfcc"], "sample_rate": config["sample_rate"],
+            "features": [0.0] * config["width"]}
+
+
+def test_evaluate_features_ok(serve):
+    post = serve(predictor("covid", lambda features: {"prediction": "Negative", "width": len(features)}))
+    status, body = post("/evaluate_features", client_payload())
+    assert status == 200
+    assert body["results"]["covid"]["width"] == feature_pipeline.client_feature_config()["width"]
+
+
+def test_evaluate_features_schema_mismatch_is_400(serve):
+    def mismatch(features):
+        raise feature_schema.FeatureSchemaError("covid v2 takes 768 features, got 120")
+
+    status, body = serve(predictor("covid", mismatch))("/evaluate_features", client_payload())
+    assert status == 400
+    assert "768" in body["error"]
+
+
+def test_evaluate_features_model_failure_is_500(serve):
+    def broken(features):
+        raise FileNotFoundError("model file missing")
+
+    status, body = serve(predictor("covid", broken))("/evaluate_features", client_payload())
+    assert status == 500
+    assert "model file missing" in body["error"]
+
+
+def test_evaluate_features_invalid_payload_is_400(serve):
+    payload = dict(client_payload(), features=[1.0, 2.0])
+    status, body = serve(predictor("covid", lambda features: {}))("/evaluate_features", payload)
+    assert status == 400
+
+
+def test_evaluate_returns_the_heads_that_work(serve, recording):
+    post = serve(predictor("covid", lambda features: {"prediction": "Negative", "confidence": 0.9}), unloadable("age"))
+    status, body = post("/evaluate", {"audio_path": recording})
+    assert status == 200
+    assert body["results"]["covid"] == {"prediction": "Negative", "confidence": 0.9}
+    assert "Model file not found" in body["results"]["age"]["error"]
+
+
+def test_evaluate_fails_when_every_head_fails(serve, recording):
+    status, body = serve(unloadable("covid"), unloadable("age"))("/evaluate", {"audio_path": recording})
+    assert status == 500
+    assert body["error"] == "All predictions failed"
+    assert set(body["results"]) == {"covid", "age"}
+
+
+def test_unmasked_wav2vec2_checkpoint_is_not_batched(serve, recording, monkeypatch):
+    # Like wav2vec2-base-960h: no attention mask, so a batch would run one pass per clip length anyway
+    processor = types.SimpleNamespace(feature_extractor=types.SimpleNamespace(return_attention_mask=False))
+    monkeypatch.setattr(model_registry, "get_audio_model", lambda: (processor, None))
+    monkeypatch.setattr(feature_pipeline, "extract", lambda y, sr, feature_type, **kwargs: np.zeros(3))
+    head = predictor("covid", lambda features: {"prediction": "Negative", "width": len(features)})
+    head.get_feature_type = lambda: "wav2vec2"
+    post = serve(head)
+    # Any request sent to the batcher now fails
+    monkeypatch.setattr(inference_server.InferenceHandler.batcher, "submit", None)
+
+    status, body = post("/evaluate", {"audio_path": recording})
+    assert status == 200
+    assert body["results"]["covid"] == {"prediction": "Negative", "width": 3}
+
+    processor.feature_extractor.return_attention_mask = True
+    assert feature_pipeline.micro_batching_helps([head])
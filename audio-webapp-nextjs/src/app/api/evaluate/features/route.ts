@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { ClientFeatures, InferenceError, evaluateFeatures, formatResults } from '@/lib/inferenceServer';
+
+// Features computed in the browser: no audio upload, decode or feature extraction
+export async function POST(request: NextRequest) {
+  let features: ClientFeatures;
+  try {
+    features = await request.json();
+  } catch {
+    return NextResponse.json({ error: 'Invalid JSON body' }, { status: 400 });
+  }
+
+  try {
+    const results = await evaluateFeatures(features);
+    return NextResponse.json({ result: formatResults(results) });
+  } catch (error: any) {
+    console.error('Error running inference on client features:', error);
+    const status = error instanceof InferenceError && error.status < 500 ? error.status : 500;
+    return NextResponse.json({ error: error.message }, { status });
+  }
+}
@@ -0,0 +1,11 @@
+import { NextResponse } from 'next/server';
+import { getFeatureConfig } from '@/lib/inferenceServer';
+
+export async function GET() {
+  try {
+    return NextResponse.json(await getFeatureConfig());
+  } catch (error: any) {
+    console.error('Error reading the feature config:', error);
+    return NextResponse.json({ enabled: false, error: error.message }, { status: 500 });
+  }
+}
@@ -1,13 +1,48 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import AudioRecorder from '@/components/AudioRecorder';
 
+// Decode the recording and compute its MFCC summary in a worker (public/featureWorker.js)
+async function computeFeatures(blob: Blob): Promise<unknown> {
+  const context = new AudioContext();
+  try {
+    const decoded = await context.decodeAudioData(await blob.arrayBuffer());
+    const channels: Float32Array[] = [];
+    for (let channel = 0; channel < decoded.numberOfChannels; channel++) {
+      channels.push(decoded.getChannelData(channel));
+    }
+    return await new Promise((resolve, reject) => {
+      const worker = new Worker('/featureWorker.js');
+      worker.onmessage = (e) => {
+        worker.terminate();
+        if (e.data.command === 'features') {
+          resolve(e.data.payload);
+        } else {
+          reject(new Error(e.data.error));
+        }
+      };
+      worker.postMessage({ channels, sampleRate: decoded.sampleRate }, channels.map((channel) => channel.buffer));
+    });
+  } finally {
+    context.close();
+  }
+}
+
 export default function Home() {
   const [audioBlob, setAudioBlob] = useState<Blob | null>(null);
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [result, setResult] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
+  // Client feature mode: upload ~120 MFCC values instead of the recording when the models take them
+  const [clientFeatures, setClientFeatures] = useState(false);
+
+  useEffect(() => {
+    fetch('/api/features/config')
+      .then((response) => (response.ok ? response.json() : null))
+      .then((config) => setClientFeatures(Boolean(config?.enabled && typeof Worker !== 'undefined')))
+      .catch(() => setClientFeatures(false));
+  }, []);
 
   const handleRecordingComplete = (blob: Blob) => {
     setAudioBlob(blob);
@@ -26,6 +61,24 @@ export default function Home() {
     setError(null);
 
     try {
+      if (clientFeatures) {
+        try {
+          const response = await fetch('/api/evaluate/features', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(await computeFeatures(audioBlob)),
+          });
+          const data = await response.json();
+          if (response.ok && !data.error) {
+            setResult(data.result);
+            return;
+          }
+          console.warn('Client feature mode failed, uploading audio:', data.error);
+        } catch (featureError) {
+          console.warn('Client feature mode failed, uploading audio:', featureError);
+        }
+      }
+
       const formData = new FormData();
       formData.append('audio', audioBlob, 'recording.mp3');
 
@@ -0,0 +1,175 @@
+import { spawn, ChildProcess } from 'child_process';
+import path from 'path';
+
+const PYTHON_SCRIPT_DIR = path.join(process.cwd(), 'python');
+const PYTHON_BIN = process.env.PYTHON_BIN ?? 'python';
+
+const HOST = process.env.INFERENCE_SERVER_HOST ?? '127.0.0.1';
+const PORT = Number(process.env.INFERENCE_SERVER_PORT ?? 8765);
+const BASE_URL = process.env.INFERENCE_SERVER_URL ?? `http://${HOST}:${PORT}`;
+
+// Loading torch and wav2vec2 can take a while on the first start
+const STARTUP_TIMEOUT_MS = Number(process.env.INFERENCE_SERVER_STARTUP_TIMEOUT_MS ?? 120000);
+const HEALTH_POLL_MS = 500;
+
+export interface CovidResult {
+  prediction: 'Positive' | 'Negative';
+  confidence: number;
+}
+
+export interface AgeResult {
+  age: number;
+}
+
+// A head whose model failed; the other heads are still returned
+export interface HeadError {
+  error: string;
+}
+
+export interface EvaluationResults {
+  covid: CovidResult | HeadError | null;
+  age: AgeResult | HeadError | null;
+}
+
+// MFCC summary computed in the browser (public/featureExtractor.js)
+export interface ClientFeatures {
+  feature_type: string;
+  n_mfcc: number;
+  sample_rate: number;
+  features: number[];
+}
+
+export class InferenceError extends Error {
+  constructor(message: string, public status: number) {
+    super(message);
+  }
+}
+
+// Keep the worker across hot reloads in development
+const globalForServer = globalThis as unknown as {
+  inferenceServer?: ChildProcess | null;
+  inferenceServerReady?: Promise<void> | null;
+};
+
+async function isHealthy(): Promise<boolean> {
+  try {
+    const response = await fetch(`${BASE_URL}/health`, { cache: 'no-store' });
+    return response.ok;
+  } catch {
+    return false;
+  }
+}
+
+async function startServer(): Promise<void> {
+  // Reuse a server that is already running (another worker or started by hand)
+  if (await isHealthy()) {
+    return;
+  }
+
+  const child = spawn(
+    PYTHON_BIN,
+    [path.join(PYTHON_SCRIPT_DIR, 'inference_server.py'), '--host', HOST, '--port', String(PORT)],
+    { cwd: PYTHON_SCRIPT_DIR, stdio: ['ignore', 'inherit', 'inherit'] }
+  );
+  globalForServer.inferenceServer = child;
+
+  child.on('exit', (code) => {
+    console.error(`Inference server exited with code ${code}`);
+    globalForServer.inferenceServer = null;
+    globalForServer.inferenceServerReady = null;
+  });
+
+  const deadline = Date.now() + STARTUP_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    if (child.exitCode !== null) {
+      throw new Error(`Inference server exited during startup with code ${child.exitCode}`);
+    }
+    if (await isHealthy()) {
+      return;
+    }
+    await new Promise((resolve) => setTimeout(resolve, HEALTH_POLL_MS));
+  }
+
+  child.kill();
+  throw new Error(`Inference server did not become ready within ${STARTUP_TIMEOUT_MS} ms`);
+}
+
+export function ensureInferenceServer(): Promise<void> {
+  if (!globalForServer.inferenceServerReady) {
+    globalForServer.inferenceServerReady = startServer().catch((error) => {
+      globalForServer.inferenceServerReady = null;
+      throw error;
+    });
+  }
+  return globalForServer.inferenceServerReady;
+}
+
+// Accepts the recording itself (decoded in memory by the server) or a path on disk
+export async function evaluateAudio(audio: Buffer | string): Promise<EvaluationResults> {
+  await ensureInferenceServer();
+
+  const response = await fetch(`${BASE_URL}/evaluate`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': typeof audio === 'string' ? 'application/json' : 'application/octet-stream',
+    },
+    body: typeof audio === 'string' ? JSON.stringify({ audio_path: audio }) : audio,
+    cache: 'no-store',
+  });
+
+  const payload = await response.json();
+  if (!response.ok) {
+    throw new Error(payload.error ?? `Inference server returned ${response.status}`);
+  }
+  return payload.results as EvaluationResults;
+}
+
+// Skips decoding and feature extraction; fails with status 409 when the models need other features
+export async function evaluateFeatures(features: ClientFeatures): Promise<EvaluationResults> {
+  await ensureInferenceServer();
+
+  const response = await fetch(`${BASE_URL}/evaluate_features`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(features),
+    cache: 'no-store',
+  });
+
+  const payload = await response.json();
+  if (!response.ok) {
+    throw new InferenceError(payload.error ?? `Inference server returned ${response.status}`, response.status);
+  }
+  return payload.results as EvaluationResults;
+}
+
+// Whether the browser should compute features itself, and the settings it must use
+export async function getFeatureConfig(): Promise<Record<string, unknown>> {
+  await ensureInferenceServer();
+
+  const response = await fetch(`${BASE_URL}/features/config`, { cache: 'no-store' });
+  return response.json();
+}
+
+function succeeded<T extends object>(head: T | HeadError | null): head is T {
+  return head != null && !('error' in head);
+}
+
+export function formatResults(results: EvaluationResults): string {
+  let result = '';
+
+  if (succeeded(results.covid)) {
+    result += `COVID: ${results.covid.prediction} (Confidence: ${results.covid.confidence.toFixed(2)})`;
+  } else {
+    result += 'COVID prediction failed';
+  }
+
+  result += ' | ';
+
+  if (succeeded(results.age)) {
+    result += `Age Prediction: ${results.age.age.toFixed(1)} years`;
+  } else {
+    result += 'Age prediction failed';
+  }
+
+  return result;
+}
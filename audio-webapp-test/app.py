@@ -1,11 +1,32 @@
 import os
-from flask import Flask, request, jsonify, render_template
-import pickle
+import json
+import time
+import uuid
+
+import cpu_runtime
+
+# Size this process's torch, BLAS and OpenMP pools (and with CPU_THREADS=...:pin, pin it) before
+# numpy and the models create them; run as a script it is worker 0, prefork.py pins its own workers
+cpu_runtime.apply(worker_index=0 if __name__ == '__main__' else None)
+
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, g, request, jsonify, render_template
 import numpy as np
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import predict_covid
 import predict_age
+import model_registry
+import model_manager
+import feature_pipeline
+import feature_cache
+import batching
+import streaming
+import head_runner
+import job_queue
+import metrics
+import profiling
+import result_cache
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -17,95 +38,513 @@ if not os.path.exists(UPLOAD_FOLDER):
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
-# Load the model (replace with your actual model path)
-MODEL_PATH = 'model/covid_cough_classifier_v1.pkl'
+# Uploads are decoded in memory; set ARCHIVE_UPLOADS=1 to also keep a copy in UPLOAD_FOLDER
+app.config['ARCHIVE_UPLOADS'] = os.environ.get('ARCHIVE_UPLOADS', '0') == '1'
 
-def load_model():
-    try:
-        with open(MODEL_PATH, 'rb') as f:
-            model = pickle.load(f)
-        return model
-    except FileNotFoundError:
-        print(f"Model file not found at {MODEL_PATH}")
-        return None
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return None
+# Micro-batching of concurrent /api/evaluate requests (BATCH_MAX_SIZE=1 disables it). Left unset,
+# it is skipped while batches can't share wav2vec2 passes (see feature_pipeline.micro_batching_helps)
+app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', batching.DEFAULT_MAX_BATCH_SIZE))
+app.config['BATCH_AUTO'] = 'BATCH_MAX_SIZE' not in os.environ
+app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', batching.DEFAULT_MAX_WAIT_MS))
+
+# Concurrent predictor heads: thread pool size and per-head timeout
+app.config['HEAD_WORKERS'] = int(os.environ.get('HEAD_WORKERS', head_runner.DEFAULT_HEAD_WORKERS))
+app.config['HEAD_TIMEOUT_SECONDS'] = float(os.environ.get('HEAD_TIMEOUT_SECONDS', head_runner.DEFAULT_HEAD_TIMEOUT_SECONDS))
+
+# Window size for ?mode=streaming evaluations
+app.config['STREAMING_WINDOW_SECONDS'] = float(os.environ.get('STREAMING_WINDOW_SECONDS', streaming.DEFAULT_WINDOW_SECONDS))
+app.config['STREAMING_OVERLAP_SECONDS'] = float(os.environ.get('STREAMING_OVERLAP_SECONDS', streaming.DEFAULT_OVERLAP_SECONDS))
+
+# Asynchronous /api/jobs queue: capacity (429 beyond it), inference workers, result retention
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', job_queue.DEFAULT_MAX_QUEUE_SIZE))
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', job_queue.DEFAULT_JOB_WORKERS))
+app.config['JOB_RESULT_TTL_SECONDS'] = float(os.environ.get('JOB_RESULT_TTL_SECONDS', job_queue.DEFAULT_RESULT_TTL_SECONDS))
+
+# Accept browser-computed MFCC features on /api/evaluate/features (CLIENT_FEATURES=0 disables it)
+app.config['CLIENT_FEATURES'] = os.environ.get('CLIENT_FEATURES', '1') == '1'
+
+# Allow ?profile=1 to dump a cProfile (and torch profiler) trace of a request to PROFILE_DIR
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '0') == '1'
+
+# Model versions: /api/admin/models is only enabled when ADMIN_TOKEN is set (sent as X-Admin-Token);
+# MODEL_WATCH_SECONDS > 0 also deploys new package versions as they appear on disk
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+app.config['MODEL_WATCH_SECONDS'] = model_manager.DEFAULT_WATCH_SECONDS
+
+# Predictors served by /api/evaluate
+PREDICTORS = [predict_covid, predict_age]
+PREDICTORS_BY_NAME = {predictor.PREDICTOR_NAME: predictor for predictor in PREDICTORS}
+
+def warm_up_models():
+    """Load classifiers and the shared wav2vec2 model once, before the first request"""
+    print("Warming up models...")
+    model_registry.warm_up(PREDICTORS)
+
+# Thread pools and queues, created per process by start_background_workers()
+head_executor = None
+batcher = None
+archive_executor = None
+jobs = None
+
+def format_results(heads):
+    """Combine the per-head results into the display string"""
+    # Get COVID prediction
+    covid_head = heads[predict_covid.PREDICTOR_NAME]
+    if covid_head['status'] != 'ok':
+        print(f"COVID prediction failed: {covid_head['error']}")
+        covid_result = "COVID prediction: Error"
+    else:
+        covid_result = predict_covid.format_result(covid_head['result'])
+    
+    # Get age prediction
+    age_head = heads[predict_age.PREDICTOR_NAME]
+    if age_head['status'] != 'ok':
+        print(f"Age prediction failed: {age_head['error']}")
+        age_result = "Age prediction: Error"
+    else:
+        age_result = predict_age.format_result(age_head['result'])
+    
+    # Combine results
+    return f"{covid_result} | Age Prediction: {age_result} years"
+
+def summarize_evaluation(evaluation):
+    """Count head outcomes and add the model versions and display string to an evaluation"""
+    for name, head in evaluation['heads'].items():
+        metrics.inc('predictions_total', predictor=name, status=head['status'])
+    evaluation['model_versions'] = {name: head['result'].get('model_version')
+                                    for name, head in evaluation['heads'].items() if head['status'] == 'ok'}
+    evaluation['result'] = format_results(evaluation['heads'])
+    print(f"Prediction result: {evaluation['result']}")
+    return evaluation
+
+def use_batcher():
+    """Whether requests go through the micro-batcher (BATCH_MAX_SIZE above)"""
+    if app.config['BATCH_MAX_SIZE'] <= 1:
+        return False
+    return not app.config['BATCH_AUTO'] or feature_pipeline.micro_batching_helps(PREDICTORS)
 
 # Function to process audio and get prediction
-def evaluate_audio(audio_path):
+def evaluate_audio(audio_path, profile=False):
     """
-    Process audio file and return prediction
+    Process audio (a path, raw bytes or a file-like object) and return the
+    structured per-head results, their timings and a display string
+
+    With profile=True every stage runs on this thread under the profiler and
+    the written profile paths are returned under 'profile'.
     """
     try:
-        print(f"Processing audio file: {audio_path}")
+        print(f"Processing audio: {feature_pipeline.describe_source(audio_path)}")
         
-        # Get COVID prediction
-        covid_result = predict_covid.predict_covid(audio_path)
-        if covid_result is None:
-            print("COVID prediction returned None")
-            covid_result = "COVID prediction: Error"
+        # Decode and extract features once, then run every head on them concurrently
+        if profile:
+            with profiling.profile('evaluate') as profile_paths:
+                evaluation = head_runner.evaluate_file(
+                    audio_path, PREDICTORS, head_runner.InlineExecutor(), app.config['HEAD_TIMEOUT_SECONDS'])
+            evaluation['profile'] = profile_paths
+        elif use_batcher():
+            evaluation = batcher.submit(audio_path).result()
+        else:
+            evaluation = head_runner.evaluate_file(
+                audio_path, PREDICTORS, head_executor, app.config['HEAD_TIMEOUT_SECONDS'])
+        
+        return summarize_evaluation(evaluation)
+    except Exception as e:
+        import traceback
+        print(f"Error processing audio: {str(e)}")
+        print(traceback.format_exc())
+        return f"Error processing audio: {str(e)}"
+
+def _write_archive(filepath, audio_bytes):
+    try:
+        with open(filepath, 'wb') as f:
+            f.write(audio_bytes)
+    except Exception as e:
+        print(f"Error archiving upload to {filepath}: {e}")
+
+def archive_upload(filename, audio_bytes):
+    """Save a copy of an upload in the background under a unique name"""
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{secure_filename(filename)}")
+    archive_executor.submit(_write_archive, filepath, audio_bytes)
+    return filepath
+
+def evaluate_audio_streaming(audio_path):
+    """
+    Process audio file window by window; returns the clip-level results
+    and the per-window results
+    """
+    try:
+        print(f"Streaming audio: {feature_pipeline.describe_source(audio_path)}")
         
-        # Get age prediction
-        age_result = predict_age.predict_age(audio_path)
-        if age_result is None:
-            print("Age prediction returned None")
-            age_result = "Age prediction: Error"
+        start = time.perf_counter()
+        streamed = streaming.run_predictors_streaming(
+            audio_path, PREDICTORS,
+            window_seconds=app.config['STREAMING_WINDOW_SECONDS'],
+            overlap_seconds=app.config['STREAMING_OVERLAP_SECONDS'],
+        )
         
-        # Combine results
-        result = f"{covid_result} | Age Prediction: {age_result} years"
-        print(f"Prediction result: {result}")
-        return result
+        heads = {}
+        for name, result in streamed['clip'].items():
+            heads[name] = {
+                'status': 'ok' if result is not None else 'error',
+                'result': result,
+                'error': None if result is not None else streamed['errors'].get(name, f"{name} prediction failed"),
+                'seconds': None,
+            }
+        evaluation = {
+            'heads': heads,
+            'windows': streamed['windows'],
+            'timings': {'total': time.perf_counter() - start},
+            'result': format_results(heads),
+        }
+        print(f"Prediction result: {evaluation['result']} ({len(streamed['windows'])} windows)")
+        return evaluation
     except Exception as e:
         import traceback
         print(f"Error processing audio: {str(e)}")
         print(traceback.format_exc())
         return f"Error processing audio: {str(e)}"
 
+def evaluation_complete(evaluation, unavailable=()):
+    """
+    Whether an evaluation may be cached: not an error, and every head
+    succeeded except those whose model couldn't be loaded (the key says so)
+    """
+    return not isinstance(evaluation, str) and all(
+        head['status'] == 'ok' or name in unavailable for name, head in evaluation['heads'].items())
+
+def evaluate_upload(audio_bytes, mode=None):
+    """
+    evaluate_audio (or evaluate_audio_streaming for mode='streaming') through
+    the result cache; returns (evaluation, 'hit' | 'coalesced' | 'miss' | None)
+
+    The key covers the upload's bytes and the serving model versions, so a
+    client retrying the same recording gets the stored result, and retries
+    arriving while it is still being evaluated wait for that evaluation.
+    Results missing a head whose model can't be loaded are cached too,
+    under a key that changes once it loads.
+    """
+    if mode == 'streaming':
+        compute = lambda: evaluate_audio_streaming(audio_bytes)
+    else:
+        compute = lambda: evaluate_audio(audio_bytes)
+    cache = result_cache.get_cache()
+    if cache is None:
+        return compute(), None
+    state = result_cache.model_state(PREDICTORS)
+    unavailable = result_cache.unavailable(state)
+    return cache.get_or_compute(result_cache.request_key(audio_bytes, mode or 'clip', state), compute,
+                                cacheable=lambda evaluation: evaluation_complete(evaluation, unavailable))
+
+def run_job(item):
+    """Evaluate one queued upload on a job worker; failures mark the job as 'error'"""
+    audio_bytes, mode = item
+    evaluation, _ = evaluate_upload(audio_bytes, mode)
+    if isinstance(evaluation, str):
+        raise RuntimeError(evaluation)
+    if all(head['status'] != 'ok' for head in evaluation['heads'].values()):
+        raise RuntimeError('All predictions failed')
+    return evaluation
+
+def start_background_workers():
+    """Create the thread pools, micro-batcher and job queue for this process
+
+    Threads don't survive fork(), so under prefork.py each worker calls this
+    after forking instead of inheriting them from the parent.
+    """
+    global head_executor, batcher, archive_executor, jobs
+    
+    # Predictor heads run concurrently on a bounded thread pool, each with its own timeout
+    head_executor = head_runner.create_executor(app.config['HEAD_WORKERS'])
+    
+    # Requests arriving within the batching window share one feature extraction
+    # pass (shared wav2vec2 calls) and one predict call per predictor
+    batcher = batching.MicroBatcher(
+        lambda audio_paths: head_runner.evaluate_batch(
+            audio_paths, PREDICTORS, head_executor, app.config['HEAD_TIMEOUT_SECONDS']),
+        max_batch_size=app.config['BATCH_MAX_SIZE'],
+        max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+    )
+    
+    # Archival writes happen off the request path, one at a time
+    archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload-archive")
+    
+    # Job workers share the head executor and micro-batcher with the synchronous route
+    jobs = job_queue.JobQueue(
+        run_job,
+        max_queue_size=app.config['JOB_QUEUE_SIZE'],
+        workers=app.config['JOB_WORKERS'],
+        result_ttl=app.config['JOB_RESULT_TTL_SECONDS'],
+    )
+    
+    # Each process watches for new model packages itself (an admin call only reaches one worker)
+    model_manager.start_watchers(PREDICTORS, app.config['MODEL_WATCH_SECONDS'])
+
+# prefork.py sets PREFORK_PARENT=1 so the parent only loads models and starts no threads
+if os.environ.get('PREFORK_PARENT') != '1':
+    start_background_workers()
+
+def _collect_job_metrics():
+    """Queue depth and wait times of the /api/jobs queue for /metrics"""
+    if jobs is None:
+        return []
+    queue_metrics = jobs.metrics()
+    return [
+        ('job_queue_depth', 'gauge', 'Jobs waiting for a worker', [({}, queue_metrics['queue_depth'])]),
+        ('job_queue_running', 'gauge', 'Jobs being evaluated', [({}, queue_metrics['running'])]),
+        ('job_queue_jobs_total', 'counter', 'Jobs by outcome',
+         [({'outcome': outcome}, queue_metrics[outcome]) for outcome in ('submitted', 'rejected', 'done', 'error')]),
+        ('job_queue_wait_seconds', 'gauge', 'Queue wait time over recent jobs',
+         [({'quantile': q}, queue_metrics['wait_seconds'][q]) for q in ('p50', 'p95', 'max')]),
+    ]
+
+metrics.register_collector(_collect_job_metrics)
+metrics.describe('http_request_seconds', 'HTTP request latency by route')
+metrics.describe('http_requests_total', 'HTTP requests by route and status code')
+metrics.describe('predictions_total', 'Predictor head outcomes')
+
+# Warm up at startup so the first request does not pay the model load cost
+if os.environ.get('WARM_UP_MODELS', '1') == '1':
+    warm_up_models()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route != '/metrics':
+        metrics.observe('http_request_seconds', time.perf_counter() - g.request_start, route=route)
+        metrics.inc('http_requests_total', route=route, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text format: stage/request latency histograms, counters, model loads, cache and queue stats"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/evaluate', methods=['POST'])
-def evaluate():
+def read_upload():
+    """Validate the 'audio' upload; returns (audio_bytes, None) or (None, error response)"""
     if 'audio' not in request.files:
-        return jsonify({'error': 'No audio file provided'}), 400
+        return None, (jsonify({'error': 'No audio file provided'}), 400)
     
     audio_file = request.files['audio']
     if audio_file.filename == '':
-        return jsonify({'error': 'No audio file selected'}), 400
+        return None, (jsonify({'error': 'No audio file selected'}), 400)
     
     # Check file extension
     allowed_extensions = {'mp3', 'wav', 'ogg', 'flac', 'm4a'}
     if '.' not in audio_file.filename or \
        audio_file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
-        return jsonify({'error': 'Invalid audio file format. Allowed formats: mp3, wav, ogg, flac, m4a'}), 400
+        return None, (jsonify({'error': 'Invalid audio file format. Allowed formats: mp3, wav, ogg, flac, m4a'}), 400)
+    
+    # Decode straight from the request body; nothing is written to disk on this path
+    with metrics.span('upload'):
+        audio_bytes = audio_file.read()
+    if app.config['ARCHIVE_UPLOADS']:
+        archive_upload(audio_file.filename, audio_bytes)
+    return audio_bytes, None
+
+@app.route('/api/evaluate', methods=['POST'])
+def evaluate():
+    audio_bytes, error = read_upload()
+    if error:
+        return error
     
     try:
-        filename = secure_filename(audio_file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        audio_file.save(filepath)
-        
-        # Process the audio file
-        result = evaluate_audio(filepath)
+        # Process the audio (?mode=streaming scores long recordings window by window);
+        # profiled requests always run, everything else goes through the result cache
+        profile = app.config['PROFILING_ENABLED'] and request.args.get('profile') == '1'
+        if profile and request.args.get('mode') != 'streaming':
+            evaluation, cache_outcome = evaluate_audio(audio_bytes, profile=True), None
+        else:
+            evaluation, cache_outcome = evaluate_upload(audio_bytes, request.args.get('mode'))
         
         # Check if result is an error message
-        if isinstance(result, str) and result.startswith("Error"):
-            return jsonify({'error': result}), 500
+        if isinstance(evaluation, str) and evaluation.startswith("Error"):
+            return jsonify({'error': evaluation}), 500
         
-        return jsonify({'result': result})
+        # One failed head still returns the others; only fail if every head failed
+        if all(head['status'] != 'ok' for head in evaluation['heads'].values()):
+            return jsonify({'error': 'All predictions failed', **evaluation}), 500
+        
+        response = jsonify(evaluation)
+        if cache_outcome:
+            response.headers['X-Result-Cache'] = cache_outcome
+        return response
     except Exception as e:
         print(f"Exception in evaluate route: {str(e)}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+def predictor_feature_types():
+    """Feature type of each predictor's serving model (None when it can't be loaded)"""
+    feature_types = {}
+    for predictor in PREDICTORS:
+        try:
+            feature_types[predictor.PREDICTOR_NAME] = predictor.get_feature_type()
+        except Exception as e:
+            print(f"Could not load the {predictor.PREDICTOR_NAME} model: {e}")
+            feature_types[predictor.PREDICTOR_NAME] = None
+    return feature_types
+
+def client_features_enabled(feature_types):
+    """Client feature mode is only offered when every model takes features the browser can compute"""
+    return app.config['CLIENT_FEATURES'] and all(
+        feature_type in feature_pipeline.CLIENT_FEATURE_TYPES for feature_type in feature_types.values())
+
+@app.route('/api/features/config')
+def features_config():
+    """Whether the page should compute features itself, and the settings it must use"""
+    feature_types = predictor_feature_types()
+    return jsonify({
+        'enabled': client_features_enabled(feature_types),
+        'feature_types': feature_types,
+        **feature_pipeline.client_feature_config(),
+    })
+
+@app.route('/api/evaluate/features', methods=['POST'])
+def evaluate_features():
+    """Evaluate an MFCC summary computed in the browser; skips upload decoding and feature extraction"""
+    if not app.config['CLIENT_FEATURES']:
+        return jsonify({'error': 'Client feature mode is disabled'}), 404
+    try:
+        features = feature_pipeline.parse_client_features(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid features: {e}'}), 400
+    feature_types = predictor_feature_types()
+    if not client_features_enabled(feature_types):
+        return jsonify({'error': 'The models need features the client cannot compute; upload the audio instead',
+                        'feature_types': feature_types}), 409
+    
+    evaluation = summarize_evaluation(head_runner.evaluate_features(
+        features, PREDICTORS, head_executor, app.config['HEAD_TIMEOUT_SECONDS']))
+    if all(head['status'] != 'ok' for head in evaluation['heads'].values()):
+        return jsonify({'error': 'All predictions failed', **evaluation}), 500
+    return jsonify(evaluation)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an evaluation and return its job id straight away (202), or 429 if the queue is full"""
+    audio_bytes, error = read_upload()
+    if error:
+        return error
+    
+    try:
+        job_id = jobs.submit((audio_bytes, request.args.get('mode')))
+    except job_queue.QueueFull as e:
+        response = jsonify({'error': str(e), 'queue_depth': jobs.metrics()['queue_depth']})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'events_url': f'/api/jobs/{job_id}/events',
+    }), 202
+
+@app.route('/api/jobs/metrics')
+def job_metrics():
+    return jsonify(jobs.metrics())
+
+@app.route('/api/cache/metrics')
+def cache_metrics():
+    """Result and feature cache statistics, for tuning their TTL and size limits"""
+    results = result_cache.get_cache()
+    features = feature_cache.get_cache()
+    return jsonify({
+        'results': results.stats() if results is not None else None,
+        'features': features.stats() if features is not None else None,
+    })
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Poll a job; the evaluation is under 'result' once status is 'done'"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown or expired job: {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-sent events: one 'status' event per state change, ending with 'done' or 'error'"""
+    if jobs.get(job_id) is None:
+        return jsonify({'error': f'Unknown or expired job: {job_id}'}), 404
+    
+    def stream():
+        status = None
+        while True:
+            job = jobs.wait(job_id, timeout=15, last_status=status)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job expired'})}\n\n"
+                return
+            if job['status'] == status:
+                # Keep idle connections (and proxies) alive while waiting
+                yield ": keep-alive\n\n"
+                continue
+            status = job['status']
+            event = status if status in ('done', 'error') else 'status'
+            yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+            if event != 'status':
+                return
+    
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+def admin_manager(name):
+    """Check the admin token and look up a predictor's model manager; returns (manager, None) or (None, error response)"""
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        return None, (jsonify({'error': 'Admin API disabled; set ADMIN_TOKEN to enable it'}), 404)
+    if request.headers.get('X-Admin-Token') != token:
+        return None, (jsonify({'error': 'Invalid admin token'}), 403)
+    if name is not None and name not in PREDICTORS_BY_NAME:
+        return None, (jsonify({'error': f'Unknown predictor: {name}'}), 404)
+    return (PREDICTORS_BY_NAME[name].get_manager() if name else None), None
+
+@app.route('/api/admin/models')
+def model_status():
+    """Serving weights, loaded and available versions and load status of every predictor"""
+    _, error = admin_manager(None)
+    if error:
+        return error
+    return jsonify({name: predictor.get_manager().status() for name, predictor in PREDICTORS_BY_NAME.items()})
+
+@app.route('/api/admin/models/<name>/deploy', methods=['POST'])
+def deploy_model(name):
+    """Load a version ({"version": "v3"}, default newest on disk) in the background and swap it in"""
+    manager, error = admin_manager(name)
+    if error:
+        return error
+    available = manager.available()
+    version = (request.get_json(silent=True) or {}).get('version') or (available[-1] if available else None)
+    if version not in available:
+        return jsonify({'error': f'Unknown version: {version}', 'available': available}), 404
+    manager.deploy(version)
+    return jsonify({'status': 'loading', 'version': version, 'status_url': '/api/admin/models'}), 202
+
+@app.route('/api/admin/models/<name>/weights', methods=['POST'])
+def set_model_weights(name):
+    """A/B routing: {"weights": {"v3": 90, "v4": 10}} (percentages adding up to 100); loads missing versions first"""
+    manager, error = admin_manager(name)
+    if error:
+        return error
+    weights = (request.get_json(silent=True) or {}).get('weights') or {}
+    unknown = [version for version in weights if version not in manager.available()]
+    if unknown:
+        return jsonify({'error': f'Unknown versions: {unknown}', 'available': manager.available()}), 404
+    try:
+        manager.set_weights(weights)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(manager.status())
+
 if __name__ == '__main__':
     # Create uploads directory if it doesn't exist
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
     
-    # Create model directory if it doesn't exist
-    model_dir = os.path.dirname(MODEL_PATH)
-    if not os.path.exists(model_dir):
-        os.makedirs(model_dir)
-    
     app.run(debug=True, port=5001)
@@ -0,0 +1,127 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+import soundfile as sf
+
+import metrics
+
+# Upload formats the app accepts; libsndfile reads wav, flac, ogg and mp3,
+# ffmpeg decodes the rest (m4a, and webm from the browser recorder)
+DECODE_FORMATS = ('mp3', 'wav', 'ogg', 'flac', 'm4a', 'webm')
+
+# soxr quality librosa uses for res_type='soxr_hq' (its default), so features
+# match models trained on librosa.load output
+RESAMPLE_QUALITY = 'HQ'
+
+# Upper bound on one ffmpeg decode
+FFMPEG_TIMEOUT_SECONDS = 60
+
+_local = threading.local()
+
+metrics.describe('audio_decoded_total', 'Decoded audio sources by decoder (libsndfile or ffmpeg)')
+
+
+class AudioDecodeError(ValueError):
+    """Neither libsndfile nor ffmpeg could decode the audio"""
+
+
+def ffmpeg_binary():
+    """ffmpeg executable from FFMPEG_BINARY or PATH (None if there is none)"""
+    return os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg')
+
+
+def _run_ffmpeg(path):
+    """Decode one file with ffmpeg into float32 (frames, channels) at its native rate
+
+    The output is Sun AU written to a pipe: its header allows an unknown
+    data length, so libsndfile reads it without a second file.
+    """
+    binary = ffmpeg_binary()
+    if binary is None:
+        raise AudioDecodeError("libsndfile can't read this format and ffmpeg was not found "
+                               "(install it or set FFMPEG_BINARY)")
+    command = [binary, '-nostdin', '-v', 'error', '-i', path, '-map', '0:a:0',
+               '-c:a', 'pcm_f32be', '-f', 'au', 'pipe:1']
+    try:
+        completed = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError(f"ffmpeg did not finish within {FFMPEG_TIMEOUT_SECONDS}s")
+    if completed.returncode != 0:
+        raise AudioDecodeError(f"ffmpeg failed: {completed.stderr.decode(errors='replace').strip()}")
+    return sf.read(io.BytesIO(completed.stdout), dtype='float32', always_2d=True)
+
+
+def _read_ffmpeg(source):
+    """ffmpeg decode of a path or file-like object
+
+    In-memory uploads are spooled to a temporary file rather than piped:
+    m4a keeps its index at the end of the file, and ffmpeg has to seek to it.
+    """
+    if not hasattr(source, 'read'):
+        return _run_ffmpeg(os.fspath(source))
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".audio") as tmp:
+        shutil.copyfileobj(source, tmp)
+        tmp.flush()
+        return _run_ffmpeg(tmp.name)
+
+
+def read(source):
+    """Decode a path or file-like object to float32 (frames, channels) and its sample rate"""
+    try:
+        y, sr = sf.read(source, dtype='float32', always_2d=True)
+        decoder = 'libsndfile'
+    except sf.LibsndfileError:
+        y, sr = _read_ffmpeg(source)
+        decoder = 'ffmpeg'
+    metrics.inc('audio_decoded_total', decoder=decoder)
+    return y, sr
+
+
+def downmix(y):
+    """Average a (frames, channels) array into one contiguous float32 channel"""
+    mono = y[:, 0] if y.shape[1] == 1 else y.mean(axis=1, dtype=np.float32)
+    return np.ascontiguousarray(mono, dtype=np.float32)
+
+
+def resampler(orig_sr, target_sr):
+    """This thread's soxr resampler for orig_sr -> target_sr, designed on first use
+
+    Streams aren't thread-safe, so each thread keeps its own per rate pair;
+    resample() clears the state between signals.
+    """
+    streams = getattr(_local, 'streams', None)
+    if streams is None:
+        streams = _local.streams = {}
+    stream = streams.get((orig_sr, target_sr))
+    if stream is None:
+        import soxr
+        stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype='float32', quality=RESAMPLE_QUALITY)
+        streams[(orig_sr, target_sr)] = stream
+    return stream
+
+
+def resample(y, orig_sr, target_sr):
+    """Resample a mono float32 signal; matches librosa.resample(res_type='soxr_hq') sample for sample"""
+    if orig_sr == target_sr:
+        return y
+    with metrics.span('resample'):
+        stream = resampler(orig_sr, target_sr)
+        stream.clear()
+        resampled = stream.resample_chunk(np.ascontiguousarray(y, dtype=np.float32), last=True)
+    # librosa fixes the length to ceil(len(y) * target_sr / orig_sr)
+    length = int(np.ceil(len(y) * float(target_sr) / orig_sr))
+    if len(resampled) >= length:
+        return resampled[:length]
+    return np.pad(resampled, (0, length - len(resampled)))
+
+
+def decode(source, sample_rate):
+    """Decode, downmix, then resample: a mono float32 waveform at sample_rate"""
+    y, orig_sr = read(source)
+    return resample(downmix(y), orig_sr, sample_rate), sample_rate
@@ -0,0 +1,262 @@
+import os
+import csv
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import model_registry
+import feature_pipeline
+import feature_cache
+import cpu_runtime
+import predict_covid
+import predict_age
+
+# Predictors run on every file
+PREDICTORS = [predict_covid, predict_age]
+
+# Extensions picked up when scanning a directory
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.ogg', '.flac', '.m4a', '.webm'}
+
+OUTPUT_COLUMNS = ['path', 'covid_prediction', 'covid_confidence', 'age', 'error']
+
+
+def collect_inputs(inputs):
+    """Expand directories, glob patterns and CSV manifests into a sorted list of audio paths"""
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _, files in os.walk(entry):
+                for name in files:
+                    if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                        paths.append(os.path.join(root, name))
+        elif entry.lower().endswith('.csv') and os.path.isfile(entry):
+            paths.extend(read_manifest(entry))
+        else:
+            matches = glob.glob(entry, recursive=True)
+            if not matches:
+                print(f"Warning: No files match {entry}")
+            paths.extend(matches)
+    return sorted(set(paths))
+
+
+def read_manifest(manifest_path):
+    """Read audio paths from a CSV manifest (a 'path' column, or the first column)"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return []
+        if 'path' in header:
+            column = header.index('path')
+        else:
+            # No header row: treat the first line as data
+            column = 0
+            reader = [header] + list(reader)
+        paths = []
+        for row in reader:
+            if row and row[column]:
+                path = row[column]
+                paths.append(path if os.path.isabs(path) else os.path.join(base_dir, path))
+        return paths
+
+
+class CsvResultWriter:
+    """Append result rows to a CSV file, flushing after every chunk"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        exists = os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        self._file = open(output_path, 'a', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+
+    @staticmethod
+    def completed_paths(output_path):
+        """Paths a previous run scored without an error (failed rows are retried)"""
+        if not os.path.exists(output_path):
+            return set()
+        with open(output_path, newline='') as f:
+            return {row['path'] for row in csv.DictReader(f) if not row.get('error')}
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Write each chunk as a numbered part file inside a Parquet dataset directory"""
+
+    def __init__(self, output_path):
+        import pyarrow  # noqa: F401 - fail early if pyarrow is missing
+        self.output_path = output_path
+        os.makedirs(output_path, exist_ok=True)
+        self._next_part = len(glob.glob(os.path.join(output_path, 'part-*.parquet')))
+
+    @staticmethod
+    def completed_paths(output_path):
+        """Paths a previous run scored without an error (failed rows are retried)"""
+        if not os.path.isdir(output_path):
+            return set()
+        import pyarrow.parquet as pq
+        done = set()
+        for part in glob.glob(os.path.join(output_path, 'part-*.parquet')):
+            table = pq.read_table(part, columns=['path', 'error']).to_pydict()
+            done.update(path for path, error in zip(table['path'], table['error']) if not error)
+        return done
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(rows, schema=pa.schema([
+            ('path', pa.string()),
+            ('covid_prediction', pa.string()),
+            ('covid_confidence', pa.float64()),
+            ('age', pa.float64()),
+            ('error', pa.string()),
+        ]))
+        part_path = os.path.join(self.output_path, f'part-{self._next_part:05d}.parquet')
+        # Write under a temporary name so an interrupted run never leaves a partial part
+        pq.write_table(table, part_path + '.tmp')
+        os.replace(part_path + '.tmp', part_path)
+        self._next_part += 1
+
+    def close(self):
+        pass
+
+
+def _init_worker(threads_per_worker, feature_cache_dir):
+    """Load the models once per worker process"""
+    if feature_cache_dir:
+        feature_cache.configure(cache_dir=feature_cache_dir)
+    cpu_runtime.apply(cpu_runtime.CpuConfig(threads_per_worker))
+    model_registry.warm_up(PREDICTORS)
+
+
+def _cache_counts():
+    """Current (hits, misses) of this process's feature cache"""
+    cache = feature_cache.get_cache()
+    if cache is None:
+        return 0, 0
+    stats = cache.stats()
+    return stats['hits'], stats['misses']
+
+
+def score_chunk(audio_paths):
+    """Score one chunk of files in a worker
+
+    Returns the result rows, per-stage seconds and the feature cache
+    (hits, misses) for this chunk.
+    """
+    timings = {}
+    hits_before, misses_before = _cache_counts()
+    try:
+        results = feature_pipeline.run_predictors_batch(audio_paths, PREDICTORS, timings)
+        rows = [_row(path, result) for path, result in zip(audio_paths, results)]
+    except Exception as e:
+        rows = [_row(path, None, str(e)) for path in audio_paths]
+    hits_after, misses_after = _cache_counts()
+    return rows, timings, (hits_after - hits_before, misses_after - misses_before)
+
+
+def _row(path, result, error=None):
+    """Flatten one file's predictor results into an output row"""
+    covid = result.get(predict_covid.PREDICTOR_NAME) if result else None
+    age = result.get(predict_age.PREDICTOR_NAME) if result else None
+    if error is None and (covid is None or age is None):
+        error = "prediction failed"
+    return {
+        'path': path,
+        'covid_prediction': covid['prediction'] if covid else None,
+        'covid_confidence': covid['confidence'] if covid else None,
+        'age': age['age'] if age else None,
+        'error': error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score directories, globs or CSV manifests of cough recordings")
+    parser.add_argument("inputs", nargs='+', help="Audio directories, glob patterns or CSV manifests")
+    parser.add_argument("--output", required=True,
+                        help="Output file; .csv appends rows, .parquet writes a directory of part files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=16,
+                        help="Files per task (also the wav2vec2 batch size)")
+    parser.add_argument("--threads-per-worker", type=int, default=1,
+                        help="Torch, BLAS and OpenMP threads in each worker process")
+    parser.add_argument("--feature-cache-dir", default=os.environ.get("FEATURE_CACHE_DIR"),
+                        help="Shared on-disk feature cache, so re-scoring skips feature extraction")
+    parser.add_argument("--no-resume", action='store_true',
+                        help="Score every file even if it was already scored successfully")
+    args = parser.parse_args()
+
+    writer_class = ParquetResultWriter if args.output.endswith('.parquet') else CsvResultWriter
+
+    paths = collect_inputs(args.inputs)
+    if not args.no_resume:
+        done = writer_class.completed_paths(args.output)
+        if done:
+            print(f"Resuming: skipping {len(done)} files already scored in {args.output} "
+                  f"(files that failed are retried)")
+        paths = [path for path in paths if path not in done]
+
+    if not paths:
+        print("Nothing to score")
+        return
+
+    chunks = [paths[i:i + args.chunk_size] for i in range(0, len(paths), args.chunk_size)]
+    print(f"Scoring {len(paths)} files in {len(chunks)} chunks with {args.workers} workers")
+
+    writer = writer_class(args.output)
+    stage_totals = {}
+    cache_hits = 0
+    cache_misses = 0
+    scored = 0
+    failed = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.threads_per_worker, args.feature_cache_dir)) as executor:
+            # Keep a bounded number of chunks in flight so memory stays flat on huge inputs
+            pending = set()
+            next_chunk = 0
+            while next_chunk < len(chunks) or pending:
+                while next_chunk < len(chunks) and len(pending) < args.workers * 2:
+                    pending.add(executor.submit(score_chunk, chunks[next_chunk]))
+                    next_chunk += 1
+
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    rows, timings, (hits, misses) = future.result()
+                    cache_hits += hits
+                    cache_misses += misses
+                    writer.write(rows)
+                    scored += len(rows)
+                    failed += sum(1 for row in rows if row['error'])
+                    for stage, seconds in timings.items():
+                        stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+                elapsed = time.perf_counter() - start
+                print(f"{scored}/{len(paths)} files, {scored / elapsed:.1f} files/s", flush=True)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {scored} files ({failed} failed) in {elapsed:.1f}s: {scored / elapsed:.1f} files/s")
+    if cache_hits + cache_misses:
+        print(f"Feature cache: {cache_hits} hits, {cache_misses} misses "
+              f"({100 * cache_hits / (cache_hits + cache_misses):.1f}% hit ratio)")
+    print("Per-stage time (summed over workers):")
+    for stage, seconds in sorted(stage_totals.items()):
+        print(f"  {stage:<24} {seconds:10.2f}s  {1000 * seconds / max(scored, 1):8.2f} ms/file")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
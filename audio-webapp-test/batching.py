@@ -0,0 +1,77 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+# Defaults for the /api/evaluate batching window
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 20
+
+
+metrics.describe('micro_batches_total', 'Batches dispatched by each micro-batcher')
+metrics.describe('micro_batch_items_total', 'Items dispatched by each micro-batcher (divide by batches for mean batch size)')
+
+
+class MicroBatcher:
+    """Collect concurrent requests into batches for a single process_batch() call
+
+    A batch is dispatched as soon as it holds max_batch_size items or the
+    oldest item has waited max_wait_ms. process_batch receives the list of
+    submitted items and must return one result per item, in order; each
+    result is delivered to the Future returned by submit() for that item
+    (an Exception instance is raised to that caller instead).
+    """
+
+    def __init__(self, process_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, name="micro-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one item and return a Future for its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            metrics.inc('micro_batches_total', batcher=self._thread.name)
+            metrics.inc('micro_batch_items_total', len(items), batcher=self._thread.name)
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"process_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                print(f"Error processing batch of {len(items)}: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
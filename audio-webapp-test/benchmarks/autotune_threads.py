@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import itertools
+import subprocess
+import contextlib
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import cpu_runtime
+
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "audio-biomarkers-bench-corpus")
+
+
+def powers_of_two(limit):
+    """1, 2, 4, ... up to limit (and limit itself)"""
+    values = [2 ** i for i in range(limit.bit_length()) if 2 ** i <= limit]
+    return values if values[-1] == limit else values + [limit]
+
+
+def percentiles(values):
+    import numpy as np
+    values = np.asarray(values) * 1000
+    return {'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+
+
+def run_worker(index, manifest, requests):
+    """One serving process: warm up, report ready, wait for the start signal, evaluate requests files
+
+    Prints the JSON result on the original stdout; everything the pipeline
+    prints goes to /dev/null.
+    """
+    # Pools and pinning first, like a prefork.py worker
+    cpu_runtime.apply(worker_index=index)
+    protocol = sys.stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # Recompute every time: the sweep is about the compute, not the caches
+        import feature_cache
+        import result_cache
+        feature_cache.configure(enabled=False)
+        result_cache.configure(enabled=False)
+        import feature_pipeline
+        import predict_covid
+        import predict_age
+        predictors = [predict_covid, predict_age]
+        paths = [entry['path'] for entry in manifest]
+        for path in paths:
+            feature_pipeline.run_predictors(path, predictors)
+
+        print("ready", file=protocol, flush=True)
+        sys.stdin.readline()
+
+        latencies = []
+        start = time.time()
+        for i in range(requests):
+            # Workers start at different files so they don't all decode the same one at once
+            path = paths[(index + i) % len(paths)]
+            request_start = time.perf_counter()
+            feature_pipeline.run_predictors(path, predictors)
+            latencies.append(time.perf_counter() - request_start)
+        end = time.time()
+    print(json.dumps({'start': start, 'end': end, 'latencies': latencies, 'runtime': cpu_runtime.status()}),
+          file=protocol, flush=True)
+
+
+def measure(workers, spec, manifest_path, requests):
+    """Run workers processes with CPU_THREADS=spec under concurrent load; returns the results dict"""
+    env = dict(os.environ, CPU_THREADS=spec, WORKERS=str(workers))
+    # Each library reads its own variable; only CPU_THREADS may decide in the sweep
+    for name in cpu_runtime.INTRA_OP_ENV_VARS + cpu_runtime.INTER_OP_ENV_VARS:
+        env.pop(name, None)
+    processes = []
+    with tempfile.TemporaryFile() as errors:
+        for index in range(workers):
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(index), "--manifest", manifest_path,
+                 "--requests", str(requests)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=errors, text=True, cwd=APP_DIR, env=env))
+        try:
+            if not all(process.stdout.readline().strip() == "ready" for process in processes):
+                raise RuntimeError("a worker failed to start")
+            # Release every worker at once
+            for process in processes:
+                process.stdin.write("go\n")
+                process.stdin.flush()
+            outputs = [json.loads(process.communicate()[0]) for process in processes]
+        except (RuntimeError, ValueError) as e:
+            for process in processes:
+                process.kill()
+                process.wait()
+            errors.seek(0)
+            lines = errors.read().decode(errors="replace").strip().splitlines()
+            return {'error': lines[-1] if lines else str(e)}
+
+    latencies = [latency for output in outputs for latency in output['latencies']]
+    seconds = max(output['end'] for output in outputs) - min(output['start'] for output in outputs)
+    return {
+        'requests_per_second': len(latencies) / seconds,
+        'latency_ms': percentiles(latencies),
+        'runtime': outputs[0]['runtime'],
+    }
+
+
+def configurations(worker_counts, thread_counts, pin_options, cpus, max_oversubscription):
+    """(workers, CPU_THREADS) pairs to sweep, plus each worker count with unmanaged threading
+
+    Unmanaged means every worker sizes its pools to all CPUs, as the
+    libraries do by default; it is the baseline the others should beat.
+    """
+    sweep = []
+    for workers, threads, pin in itertools.product(worker_counts, thread_counts, pin_options):
+        if workers * threads > cpus * max_oversubscription or (pin and workers * threads > cpus):
+            continue
+        sweep.append((workers, cpu_runtime.CpuConfig(threads, 1, pin).spec()))
+    for workers in worker_counts:
+        if (workers, str(cpus)) not in sweep:
+            sweep.append((workers, str(cpus)))
+    return sweep
+
+
+def main():
+    cpus = len(cpu_runtime.usable_cpus())
+    parser = argparse.ArgumentParser(
+        description="Sweep worker counts, thread counts and CPU pinning (CPU_THREADS) on the benchmark corpus "
+                    "under concurrent load and recommend a configuration for throughput and for latency")
+    parser.add_argument("--workers", type=int, nargs='+', default=powers_of_two(cpus),
+                        help="Worker process counts to try (like prefork.py --workers)")
+    parser.add_argument("--threads", type=int, nargs='+', default=powers_of_two(cpus),
+                        help="Threads per worker to try")
+    parser.add_argument("--pin", choices=["off", "on", "both"], default="both" if hasattr(os, "sched_setaffinity") else "off",
+                        help="Try unpinned workers, pinned workers or both")
+    parser.add_argument("--max-oversubscription", type=float, default=1.0,
+                        help="Skip configurations with more than this many threads per CPU "
+                             "(the unmanaged baseline is always run)")
+    parser.add_argument("--requests", type=int, default=20, help="Requests each worker evaluates")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR, help="Where the synthetic corpus is written")
+    parser.add_argument("--durations", type=float, nargs='+', default=[1.0, 3.0, 10.0])
+    parser.add_argument("--sample-rates", type=int, nargs='+', default=[16000, 44100])
+    parser.add_argument("--channels", type=int, nargs='+', default=[1, 2])
+    parser.add_argument("--latency-slack", type=float, default=1.2,
+                        help="The balanced pick is the fastest configuration whose p95 latency is within "
+                             "this factor of the best")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--manifest", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        with open(args.manifest) as f:
+            run_worker(args.worker, json.load(f), args.requests)
+        return 0
+
+    # Not at the top: in worker mode numpy has to load after cpu_runtime.apply() exported the thread counts
+    import synthetic
+    manifest = synthetic.write_corpus(args.corpus_dir, args.durations, args.sample_rates, args.channels)
+    manifest_path = os.path.join(args.corpus_dir, "manifest.json")
+    pin_options = {'off': [False], 'on': [True], 'both': [False, True]}[args.pin]
+    sweep = configurations(args.workers, args.threads, pin_options, cpus, args.max_oversubscription)
+    print(f"Corpus: {len(manifest)} files in {args.corpus_dir}; {cpus} usable CPUs; "
+          f"{len(sweep)} configurations", file=sys.stderr)
+    print(f"{'workers':>7} {'CPU_THREADS':>12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}",
+          file=sys.stderr)
+
+    results = []
+    for workers, spec in sweep:
+        result = dict(measure(workers, spec, manifest_path, args.requests), workers=workers, cpu_threads=spec)
+        results.append(result)
+        if 'error' in result:
+            print(f"{workers:>7} {spec:>12} failed: {result['error']}", file=sys.stderr)
+            continue
+        latency = result['latency_ms']
+        print(f"{workers:>7} {spec:>12} {result['requests_per_second']:8.2f} {latency['p50']:8.1f} "
+              f"{latency['p95']:8.1f} {latency['max']:8.1f}", file=sys.stderr)
+
+    measured = [result for result in results if 'error' not in result]
+    if not measured:
+        print("Every configuration failed", file=sys.stderr)
+        return 1
+    best_latency = min(measured, key=lambda result: result['latency_ms']['p95'])
+    best_throughput = max(measured, key=lambda result: result['requests_per_second'])
+    balanced = max((result for result in measured
+                    if result['latency_ms']['p95'] <= args.latency_slack * best_latency['latency_ms']['p95']),
+                   key=lambda result: result['requests_per_second'])
+    recommendations = {'throughput': best_throughput, 'latency': best_latency, 'balanced': balanced}
+    for goal, result in recommendations.items():
+        print(f"Best for {goal:<10}: WORKERS={result['workers']} CPU_THREADS={result['cpu_threads']} "
+              f"({result['requests_per_second']:.2f} req/s, p95 {result['latency_ms']['p95']:.1f} ms)",
+              file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'cpus': cpus, 'requests_per_worker': args.requests, 'results': results,
+                       'recommended': {goal: {'workers': result['workers'], 'cpu_threads': result['cpu_threads']}
+                                       for goal, result in recommendations.items()}}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
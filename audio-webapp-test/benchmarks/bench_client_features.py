@@ -0,0 +1,120 @@
+import io
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+import soundfile as sf
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import feature_pipeline
+from synthetic import synthetic_recording
+
+EXTRACTOR_PATH = os.path.join(APP_DIR, "static", "js", "featureExtractor.js")
+
+# Reads one JSON case per line ({channels, sample_rate}) and prints the client's
+# request payload plus its extraction time for each
+_NODE_RUNNER = """
+const extractor = require(process.argv[1]);
+const lines = require('fs').readFileSync(0, 'utf8').split('\\n').filter(Boolean);
+for (const line of lines) {
+  const recording = JSON.parse(line);
+  const channels = recording.channels.map((channel) => Float32Array.from(channel));
+  const start = process.hrtime.bigint();
+  const payload = extractor.extractFeatures(channels, recording.sample_rate);
+  payload.ms = Number(process.hrtime.bigint() - start) / 1e6;
+  console.log(JSON.stringify(payload));
+}
+"""
+
+# Same input; prints the client's downmixed, 16 kHz waveform for each case
+_NODE_RESAMPLER = """
+const extractor = require(process.argv[1]);
+const lines = require('fs').readFileSync(0, 'utf8').split('\\n').filter(Boolean);
+for (const line of lines) {
+  const recording = JSON.parse(line);
+  const channels = recording.channels.map((channel) => Float32Array.from(channel));
+  const samples = extractor.resample(extractor.toMono(channels), recording.sample_rate, extractor.SAMPLE_RATE);
+  console.log(JSON.stringify(Array.from(samples)));
+}
+"""
+
+
+def server_resample(recording, sample_rate):
+    """The 16 kHz mono waveform the server decodes the same recording to"""
+    upload = io.BytesIO()
+    sf.write(upload, recording, sample_rate, format="WAV", subtype="FLOAT")
+    return feature_pipeline.load_audio(upload.getvalue())[0]
+
+
+def resample_snr_db(reference, samples):
+    """Signal-to-noise ratio of samples against the reference waveform, in dB"""
+    length = min(len(reference), len(samples))
+    error = np.sum((reference[:length] - samples[:length]) ** 2.0)
+    return float(10 * np.log10(np.sum(reference[:length] ** 2.0) / max(error, 1e-30)))
+
+
+def _run_node(runner, cases):
+    lines = [json.dumps({"channels": recording.reshape(len(recording), -1).T.tolist(), "sample_rate": sample_rate})
+             for recording, sample_rate in cases]
+    completed = subprocess.run(["node", "-e", runner, EXTRACTOR_PATH], input="\n".join(lines),
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    return [json.loads(line) for line in completed.stdout.splitlines()]
+
+
+def client_features(cases):
+    """Run featureExtractor.js under node on every (recording, sample_rate) case"""
+    return _run_node(_NODE_RUNNER, cases)
+
+
+def client_resample(cases):
+    """The 16 kHz mono waveform featureExtractor.js extracts its features from, for every case"""
+    return [np.asarray(samples, dtype=np.float32) for samples in _run_node(_NODE_RESAMPLER, cases)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check browser-side MFCC features against the server's librosa path")
+    parser.add_argument("--durations", type=float, nargs='+', default=[1.0, 5.0], help="Clip lengths in seconds")
+    parser.add_argument("--sample-rates", type=int, nargs='+', default=[16000, 44100, 48000],
+                        help="Recording sample rates (anything but 16 kHz is resampled)")
+    parser.add_argument("--channels", type=int, nargs='+', default=[1, 2])
+    parser.add_argument("--atol", type=float, default=1e-3,
+                        help="Maximum absolute feature difference, given the same 16 kHz waveform")
+    parser.add_argument("--min-snr-db", type=float, default=25.0,
+                        help="Minimum agreement of the client's resampler with the server's, in dB")
+    args = parser.parse_args()
+
+    grid = [(seconds, sample_rate, channels) for seconds in args.durations
+            for sample_rate in args.sample_rates for channels in args.channels]
+    recordings = [(synthetic_recording(seconds, sample_rate, channels, seed=index), sample_rate)
+                  for index, (seconds, sample_rate, channels) in enumerate(grid)]
+    results = client_features(recordings)
+    resampled = client_resample(recordings)
+
+    # The features are compared on the client's own 16 kHz waveform, so that resampler
+    # differences (checked separately, as an SNR) can't hide a mismatch in the MFCC code
+    print(f"{'seconds':>8} {'rate':>6} {'ch':>3} {'client ms':>10} {'max abs diff':>13} {'resample dB':>12}")
+    failed = False
+    for (seconds, sample_rate, channels), (recording, _), result, samples in zip(grid, recordings, results, resampled):
+        reference = feature_pipeline.extract_mfcc(samples, feature_pipeline.TARGET_SAMPLE_RATE)
+        difference = float(np.max(np.abs(reference - np.asarray(result["features"]))))
+        snr = resample_snr_db(server_resample(recording, sample_rate), samples)
+        failed |= difference > args.atol or snr < args.min_snr_db
+        print(f"{seconds:8.1f} {sample_rate:6d} {channels:3d} {result['ms']:10.1f} {difference:13.2e} {snr:12.1f}")
+
+    if failed:
+        print(f"Parity check FAILED: features differ by more than {args.atol} "
+              f"or the resampler is below {args.min_snr_db} dB")
+        return 1
+    print("Parity check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import warnings
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import audio_ingest
+import feature_pipeline
+import synthetic
+
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "audio-biomarkers-decode-corpus")
+
+# Formats libsndfile writes itself; the others are transcoded from the WAV corpus with ffmpeg
+SOUNDFILE_FORMATS = {'wav': 'WAV', 'flac': 'FLAC', 'ogg': 'OGG', 'mp3': 'MP3'}
+FFMPEG_CODECS = {'m4a': 'aac', 'webm': 'libopus'}
+
+
+def best_time(function, repeats):
+    """Best wall-clock time of repeats calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cold_start_time(setup, path):
+    """Seconds to import a decoder and decode path once in a fresh interpreter"""
+    code = f"import time; t = time.perf_counter(); path = {path!r}; {setup}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, cwd=APP_DIR)
+    return float(output.stdout.strip()) if output.returncode == 0 else float('nan')
+
+
+def corpus(directory, extension, durations, sample_rates, channels):
+    """Write (or reuse) the synthetic corpus in one format; None if it can't be produced here"""
+    if extension in SOUNDFILE_FORMATS:
+        return synthetic.write_corpus(os.path.join(directory, extension), durations, sample_rates, channels,
+                                      file_format=SOUNDFILE_FORMATS[extension])
+    binary = audio_ingest.ffmpeg_binary()
+    if binary is None:
+        return None
+    manifest = []
+    # Opus only encodes at 8/12/16/24/48 kHz, so ffmpeg may store webm at another rate than the source
+    for entry in corpus(directory, 'wav', durations, sample_rates, channels):
+        path = os.path.join(directory, extension, os.path.basename(entry['path'])[:-len('wav')] + extension)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            subprocess.run([binary, '-v', 'error', '-y', '-i', entry['path'], '-c:a', FFMPEG_CODECS[extension],
+                            path], check=True)
+        manifest.append(dict(entry, path=path))
+    return manifest
+
+
+def librosa_load(source):
+    """The previous decode path: librosa.load (libsndfile or audioread, then soxr_hq)"""
+    import librosa
+    with warnings.catch_warnings():
+        # librosa warns on every audioread fallback
+        warnings.simplefilter("ignore")
+        return librosa.load(source, sr=feature_pipeline.TARGET_SAMPLE_RATE, mono=True)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-format decode benchmark: audio_ingest against librosa.load")
+    parser.add_argument("--formats", nargs='+', default=list(SOUNDFILE_FORMATS) + list(FFMPEG_CODECS),
+                        choices=list(SOUNDFILE_FORMATS) + list(FFMPEG_CODECS))
+    parser.add_argument("--durations", type=float, nargs='+', default=[1.0, 10.0])
+    parser.add_argument("--sample-rates", type=int, nargs='+', default=[16000, 44100, 48000])
+    parser.add_argument("--channels", type=int, nargs='+', default=[1, 2])
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats per file (best is reported)")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--atol", type=float, default=1e-6,
+                        help="Maximum absolute difference from librosa.load for the libsndfile formats "
+                             "(ffmpeg formats are only reported: audioread decodes to clipped 16-bit PCM, "
+                             "audio_ingest to float32)")
+    args = parser.parse_args()
+
+    wav = corpus(args.corpus_dir, 'wav', [max(args.durations)], [44100], [2])[0]['path']
+    ingest_cold = cold_start_time("import feature_pipeline; feature_pipeline.load_audio(path)", wav)
+    librosa_cold = cold_start_time("import librosa; librosa.load(path, sr=16000, mono=True)", wav)
+    print(f"Cold start (import + first 44.1 kHz stereo decode): audio_ingest {ingest_cold:.3f}s, "
+          f"librosa {librosa_cold:.3f}s")
+
+    print(f"{'format':>6} {'file':<28} {'librosa ms':>11} {'path ms':>8} {'bytes ms':>9} {'speedup':>8} "
+          f"{'max abs diff':>13}")
+    failed = False
+    for extension in args.formats:
+        manifest = corpus(args.corpus_dir, extension, args.durations, args.sample_rates, args.channels)
+        if manifest is None:
+            print(f"{extension:>6} skipped: ffmpeg not found (install it or set FFMPEG_BINARY)")
+            continue
+        totals = [0.0, 0.0]
+        for entry in manifest:
+            path = entry['path']
+            with open(path, 'rb') as f:
+                data = f.read()
+            reference = librosa_load(path)
+            decoded, _ = feature_pipeline.load_audio(data)
+            difference = (float(np.max(np.abs(reference - decoded))) if len(reference) == len(decoded)
+                          else float('inf'))
+            failed |= extension in SOUNDFILE_FORMATS and difference > args.atol
+
+            librosa_seconds = best_time(lambda: librosa_load(path), args.repeats)
+            path_seconds = best_time(lambda: feature_pipeline.load_audio(path), args.repeats)
+            bytes_seconds = best_time(lambda: feature_pipeline.load_audio(data), args.repeats)
+            totals[0] += librosa_seconds
+            totals[1] += bytes_seconds
+            print(f"{extension:>6} {os.path.basename(path):<28} {1000 * librosa_seconds:11.2f} "
+                  f"{1000 * path_seconds:8.2f} {1000 * bytes_seconds:9.2f} "
+                  f"{librosa_seconds / bytes_seconds:7.1f}x {difference:13.2e}")
+        print(f"{extension:>6} {'total':<28} {1000 * totals[0]:11.2f} {'':>8} {1000 * totals[1]:9.2f} "
+              f"{totals[0] / totals[1]:7.1f}x")
+
+    if failed:
+        print(f"Parity check FAILED: libsndfile formats differ from librosa.load by more than {args.atol}")
+        return 1
+    print("Parity check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
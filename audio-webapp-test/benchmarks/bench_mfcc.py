@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mfcc_numpy
+from synthetic import synthetic_cough
+
+SAMPLE_RATE = 16000
+N_MFCC = 40
+
+
+def librosa_summary(y, sr):
+    """Reference implementation: the librosa path in feature_pipeline.extract_mfcc()"""
+    import librosa
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC)
+    return np.concatenate([
+        mfccs.mean(axis=1),
+        librosa.feature.delta(mfccs).mean(axis=1),
+        librosa.feature.delta(mfccs, order=2).mean(axis=1),
+    ])
+
+
+def best_time(function, repeats):
+    """Best wall-clock time of repeats calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cold_start_time(setup):
+    """Seconds to import an engine and compute its first summary in a fresh interpreter"""
+    code = ("import time; t = time.perf_counter(); import numpy as np; y = np.zeros(16000, dtype=np.float32); "
+            f"{setup}; print(time.perf_counter() - t)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return float(output.stdout.strip()) if output.returncode == 0 else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the NumPy MFCC engine against librosa (speed and parity)")
+    parser.add_argument("--durations", type=float, nargs='+', default=[1.0, 5.0, 30.0],
+                        help="Clip lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=10, help="Timing repeats per clip (best is reported)")
+    parser.add_argument("--atol", type=float, default=1e-3, help="Maximum allowed absolute difference")
+    args = parser.parse_args()
+
+    numpy_cold = cold_start_time("import mfcc_numpy; mfcc_numpy.extract_mfcc_summary(y, 16000)")
+    librosa_cold = cold_start_time("import librosa; librosa.feature.delta(librosa.feature.mfcc(y=y, sr=16000))")
+    print(f"Cold start (import + first clip): mfcc_numpy {numpy_cold:.3f}s, librosa {librosa_cold:.3f}s")
+
+    print(f"{'seconds':>8} {'librosa ms':>11} {'numpy ms':>9} {'speedup':>8} {'max abs diff':>13}")
+    failed = False
+    for seconds in args.durations:
+        y = synthetic_cough(seconds)
+        reference = librosa_summary(y, SAMPLE_RATE)
+        fast = mfcc_numpy.extract_mfcc_summary(y, SAMPLE_RATE, N_MFCC)
+        difference = float(np.max(np.abs(reference - fast)))
+        failed |= difference > args.atol
+
+        librosa_seconds = best_time(lambda: librosa_summary(y, SAMPLE_RATE), args.repeats)
+        numpy_seconds = best_time(lambda: mfcc_numpy.extract_mfcc_summary(y, SAMPLE_RATE, N_MFCC), args.repeats)
+        print(f"{seconds:8.1f} {1000 * librosa_seconds:11.2f} {1000 * numpy_seconds:9.2f} "
+              f"{librosa_seconds / numpy_seconds:7.1f}x {difference:13.2e}")
+
+    if failed:
+        print(f"Parity check FAILED: difference above {args.atol}")
+        return 1
+    print("Parity check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
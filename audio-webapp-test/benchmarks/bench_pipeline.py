@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+
+# Taken before any heavy import so the worker's cold start includes them
+_PROCESS_START = time.perf_counter()
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import numpy as np
+
+import synthetic
+
+FEATURE_TYPES = ["mfcc", "mfcc_numpy", "wav2vec2"]
+# Each with silence trimming first (feature_pipeline.TRIM_SUFFIX)
+FEATURE_TYPES += [feature_type + "+trim" for feature_type in FEATURE_TYPES]
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "audio-biomarkers-bench-corpus")
+
+# Metrics compared against a baseline, and whether lower values are better
+COMPARED_METRICS = {
+    'cold_start_seconds': True,
+    'warm_latency_ms.p50': True,
+    'warm_latency_ms.p95': True,
+    'batch_files_per_second': False,
+    'peak_rss_mb': True,
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+
+
+def run_worker(feature_type, manifest, repeats, batch_size):
+    """Measure one feature type in this (fresh) process and return the results dict"""
+    # Thread pools sized from CPU_THREADS, as in a serving process
+    import cpu_runtime
+    cpu_runtime.apply()
+    # Recompute every time: the benchmark is about the pipeline, not the cache
+    import feature_cache
+    feature_cache.configure(enabled=False)
+    import feature_pipeline
+    import predict_covid
+    import predict_age
+    # Predictors whose model files are missing are reported instead of failing the run
+    predictors, skipped = [], {}
+    for predictor in (predict_covid, predict_age):
+        try:
+            predictor.load_model()
+            predictors.append(predictor)
+        except Exception as e:
+            skipped[predictor.PREDICTOR_NAME] = str(e)
+    paths = [entry['path'] for entry in manifest]
+
+    def evaluate(path):
+        y, sr = feature_pipeline.load_audio(path)
+        features = feature_pipeline.extract(y, sr, feature_type)
+        return [predictor.predict_from_features(features) for predictor in predictors]
+
+    def evaluate_batch(batch):
+        waveforms, _ = feature_pipeline.decode_many(batch)
+        matrix = feature_pipeline.extract_batch(waveforms, feature_pipeline.TARGET_SAMPLE_RATE, feature_type)
+        return [predictor.predict_batch(matrix) for predictor in predictors]
+
+    # Predictors print warnings (e.g. feature shape padding in MFCC mode); keep them out of the timings
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        evaluate(paths[0])
+        cold_start = time.perf_counter() - _PROCESS_START
+        resolved = feature_pipeline._resolve_feature_type(feature_type)[0]
+
+        # One untimed pass so lazy imports (e.g. librosa for resampling) don't count as warm latency
+        for path in paths:
+            evaluate(path)
+
+        per_file = {}
+        latencies = []
+        for entry in manifest:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                evaluate(entry['path'])
+                times.append(time.perf_counter() - start)
+            latencies.extend(times)
+            per_file[os.path.basename(entry['path'])] = 1000 * float(np.median(times))
+
+        start = time.perf_counter()
+        for i in range(0, len(paths), batch_size):
+            evaluate_batch(paths[i:i + batch_size])
+        batch_seconds = time.perf_counter() - start
+
+    audio_seconds = sum(entry['seconds'] for entry in manifest)
+    return {
+        'feature_type': feature_type,
+        'resolved_feature_type': resolved,
+        'predictors': [predictor.PREDICTOR_NAME for predictor in predictors],
+        'skipped_predictors': skipped,
+        'cold_start_seconds': cold_start,
+        'warm_latency_ms': percentiles(latencies),
+        'warm_latency_ms_per_file': per_file,
+        'batch_size': batch_size,
+        'batch_seconds': batch_seconds,
+        'batch_files_per_second': len(paths) / batch_seconds,
+        'batch_realtime_factor': audio_seconds / batch_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def measure(feature_type, manifest_path, repeats, batch_size):
+    """Run the worker for one feature type in a fresh interpreter (clean cold start and peak RSS)"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        result_path = tmp.name
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", feature_type, "--manifest", manifest_path,
+             "--repeats", str(repeats), "--batch-size", str(batch_size), "--output", result_path],
+            capture_output=True, text=True, cwd=APP_DIR)
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            return {'feature_type': feature_type, 'error': lines[-1] if lines else f"exit code {completed.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+
+def lookup(result, dotted):
+    for part in dotted.split('.'):
+        if not isinstance(result, dict) or part not in result:
+            return None
+        result = result[part]
+    return result
+
+
+def compare(current, baseline, tolerance):
+    """Print current vs baseline for every compared metric; returns the list of regressions"""
+    regressions = []
+    print(f"{'feature type':<12} {'metric':<24} {'baseline':>10} {'current':>10} {'change':>8}", file=sys.stderr)
+    for feature_type, result in current['results'].items():
+        reference = baseline.get('results', {}).get(feature_type)
+        if reference is None or 'error' in result or 'error' in reference:
+            continue
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            old, new = lookup(reference, metric), lookup(result, metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = (new - old) / old
+            regressed = change > tolerance if lower_is_better else change < -tolerance
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{feature_type:<12} {metric:<24} {old:10.3f} {new:10.3f} {change:+7.1%}{flag}", file=sys.stderr)
+            if regressed:
+                regressions.append((feature_type, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inference pipeline on a synthetic cough corpus")
+    parser.add_argument("--feature-types", nargs='+', default=["mfcc", "wav2vec2"], choices=FEATURE_TYPES,
+                        help="Feature types to benchmark (each in its own process)")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR, help="Where the synthetic corpus is written")
+    parser.add_argument("--durations", type=float, nargs='+', default=list(synthetic.DEFAULT_DURATIONS))
+    parser.add_argument("--sample-rates", type=int, nargs='+', default=list(synthetic.DEFAULT_SAMPLE_RATES))
+    parser.add_argument("--channels", type=int, nargs='+', default=list(synthetic.DEFAULT_CHANNELS))
+    parser.add_argument("--silence-seconds", type=float, default=0.0,
+                        help="Quiet noise added before and after each recording (for comparing +trim types)")
+    parser.add_argument("--repeats", type=int, default=3, help="Warm single-request runs per file")
+    parser.add_argument("--batch-size", type=int, default=8, help="Files per batch in the throughput run")
+    parser.add_argument("--output", help="Write the results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON to compare against; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative change beyond which a metric counts as a regression")
+    parser.add_argument("--worker", choices=FEATURE_TYPES, help=argparse.SUPPRESS)
+    parser.add_argument("--manifest", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        result = run_worker(args.worker, manifest, args.repeats, args.batch_size)
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    manifest = synthetic.write_corpus(args.corpus_dir, args.durations, args.sample_rates, args.channels,
+                                      silence_seconds=args.silence_seconds)
+    manifest_path = os.path.join(args.corpus_dir, "manifest.json")
+    print(f"Corpus: {len(manifest)} files in {args.corpus_dir}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'corpus': {'files': len(manifest), 'durations': args.durations,
+                       'sample_rates': args.sample_rates, 'channels': args.channels},
+            'repeats': args.repeats,
+        },
+        'results': {},
+    }
+    for feature_type in args.feature_types:
+        print(f"Benchmarking {feature_type}...", file=sys.stderr)
+        report['results'][feature_type] = measure(feature_type, manifest_path, args.repeats, args.batch_size)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+        print("No regressions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
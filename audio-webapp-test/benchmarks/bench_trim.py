@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feature_cache
+import feature_pipeline
+import segmenter
+from synthetic import synthetic_cough, with_silence
+
+SAMPLE_RATE = feature_pipeline.TARGET_SAMPLE_RATE
+
+
+def best_time(function, repeats):
+    """Best wall-clock time of repeats calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Silence trimming: audio skipped, cough energy kept and "
+                                                 "feature latency with and without trimming")
+    parser.add_argument("--feature-types", nargs='+', default=["mfcc_numpy", "wav2vec2"],
+                        choices=list(feature_pipeline.FEATURE_TYPES))
+    parser.add_argument("--durations", type=float, nargs='+', default=[1.0, 3.0], help="Seconds of coughing")
+    parser.add_argument("--silence", type=float, nargs='+', default=[0.0, 2.0, 5.0],
+                        help="Seconds of quiet noise before and after the coughs")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats per clip (best is reported)")
+    parser.add_argument("--min-energy", type=float, default=0.98,
+                        help="Fail when trimming keeps less than this fraction of a clip's energy")
+    args = parser.parse_args()
+
+    # Recompute every time: the benchmark is about the extractors, not the cache
+    feature_cache.configure(enabled=False)
+    print(f"Segmenter settings: {segmenter.config_key()}")
+    print(f"{'type':>10} {'cough s':>8} {'silence s':>10} {'skipped':>8} {'energy':>7} {'trim ms':>8} "
+          f"{'full ms':>8} {'trimmed ms':>11} {'speedup':>8} {'cos full':>9} {'cos trim':>9}")
+    failed = False
+    for feature_type in args.feature_types:
+        resolved = feature_pipeline._resolve_feature_type(feature_type)[0]
+        for seed, seconds in enumerate(args.durations):
+            coughs = synthetic_cough(seconds, seed, SAMPLE_RATE)
+            reference = feature_pipeline.extract(coughs, SAMPLE_RATE, resolved)
+            for silence in args.silence:
+                y = with_silence(coughs, silence, seed, SAMPLE_RATE)
+                segments = segmenter.active_segments(y, SAMPLE_RATE)
+                kept = sum(end - start for start, end in segments)
+                energy = sum(float(np.sum(np.square(y[start:end], dtype=np.float64))) for start, end in segments)
+                energy /= float(np.sum(np.square(y, dtype=np.float64)))
+                failed |= energy < args.min_energy
+
+                full = feature_pipeline.extract(y, SAMPLE_RATE, resolved)
+                trimmed = feature_pipeline.extract(y, SAMPLE_RATE, resolved + feature_pipeline.TRIM_SUFFIX)
+                trim_seconds = best_time(lambda: segmenter.trim(y, SAMPLE_RATE), args.repeats)
+                full_seconds = best_time(lambda: feature_pipeline.extract(y, SAMPLE_RATE, resolved), args.repeats)
+                trimmed_seconds = best_time(lambda: feature_pipeline.extract(
+                    y, SAMPLE_RATE, resolved + feature_pipeline.TRIM_SUFFIX), args.repeats)
+                print(f"{resolved:>10} {seconds:8.1f} {silence:10.1f} {1 - kept / len(y):8.1%} {energy:7.1%} "
+                      f"{1000 * trim_seconds:8.2f} {1000 * full_seconds:8.2f} {1000 * trimmed_seconds:11.2f} "
+                      f"{full_seconds / trimmed_seconds:7.1f}x {cosine(reference, full):9.4f} "
+                      f"{cosine(reference, trimmed):9.4f}")
+
+    print("cos full / cos trim: similarity to the features of the coughs alone, without the added silence")
+    if failed:
+        print(f"Trim check FAILED: a clip kept less than {args.min_energy:.0%} of its energy")
+        return 1
+    print("Trim check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import os
+import json
+import itertools
+
+import numpy as np
+import soundfile as sf
+
+# Default corpus grid: every combination of these is written once
+DEFAULT_DURATIONS = (1.0, 3.0, 10.0)
+DEFAULT_SAMPLE_RATES = (8000, 16000, 44100, 48000)
+DEFAULT_CHANNELS = (1, 2)
+
+
+def synthetic_cough(seconds, seed=0, sample_rate=16000):
+    """Noise bursts with a decaying envelope on top of low-level background noise"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    y = 0.01 * rng.standard_normal(n)
+    for start in rng.uniform(0, max(seconds - 0.4, 0.01), size=max(1, int(seconds))):
+        begin = int(start * sample_rate)
+        length = min(int(0.3 * sample_rate), n - begin)
+        envelope = np.exp(-np.linspace(0, 6, length))
+        y[begin:begin + length] += 0.5 * envelope * rng.standard_normal(length)
+    return y.astype(np.float32)
+
+
+def with_silence(y, silence_seconds, seed=0, sample_rate=16000):
+    """y between silence_seconds of quiet room noise on each side, like a browser recording"""
+    rng = np.random.default_rng(seed + 2)
+    n = int(silence_seconds * sample_rate)
+    quiet = [(0.002 * rng.standard_normal(n)).astype(np.float32) for _ in range(2)]
+    return np.concatenate([quiet[0], y, quiet[1]])
+
+
+def synthetic_recording(seconds, sample_rate, channels, seed=0, silence_seconds=0.0):
+    """(samples, channels) cough recording; extra channels are attenuated, slightly noisier copies
+
+    silence_seconds of quiet noise are added before and after the coughs
+    (seconds is the length of the cough part).
+    """
+    y = synthetic_cough(seconds, seed, sample_rate)
+    if silence_seconds:
+        y = with_silence(y, silence_seconds, seed, sample_rate)
+    if channels == 1:
+        return y
+    rng = np.random.default_rng(seed + 1)
+    columns = [y] + [0.8 * y + 0.005 * rng.standard_normal(len(y)).astype(np.float32) for _ in range(channels - 1)]
+    return np.stack(columns, axis=1)
+
+
+def write_corpus(directory, durations=DEFAULT_DURATIONS, sample_rates=DEFAULT_SAMPLE_RATES,
+                 channels=DEFAULT_CHANNELS, file_format="WAV", seed=0, silence_seconds=0.0):
+    """Write one file per (duration, sample rate, channels) combination and a manifest.json
+
+    Files are deterministic for a given seed, so the same corpus can be
+    regenerated on another machine. Existing files are reused. Returns the
+    manifest: a list of {'path', 'seconds', 'sample_rate', 'channels'}, where
+    seconds excludes the silence_seconds added on each side.
+    """
+    os.makedirs(directory, exist_ok=True)
+    extension = file_format.lower()
+    manifest = []
+    for index, (seconds, sample_rate, n_channels) in enumerate(itertools.product(durations, sample_rates, channels)):
+        name = f"cough_{seconds:g}s_{sample_rate}hz_{n_channels}ch.{extension}"
+        if silence_seconds:
+            name = f"silence_{silence_seconds:g}s_{name}"
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            y = synthetic_recording(seconds, sample_rate, n_channels, seed + index, silence_seconds)
+            sf.write(path, y, sample_rate, format=file_format)
+        manifest.append({'path': path, 'seconds': seconds, 'sample_rate': sample_rate, 'channels': n_channels})
+
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,184 @@
+import os
+import sys
+import threading
+
+import metrics
+
+# One setting sizes every thread pool of a worker: CPU_THREADS="<threads>[/<inter-op threads>][:pin]"
+#   threads  torch intra-op, BLAS, OpenMP, numba and onnxruntime intra-op threads; "auto"
+#            splits the usable CPUs evenly between the WORKERS processes
+#   inter    torch and onnxruntime inter-op threads (default 1)
+#   :pin     pin each worker to its own `threads` CPUs
+DEFAULT_SPEC = "auto"
+
+# Read by each library when it loads (before that, only the environment reaches it);
+# the ones a user already set are left alone
+INTRA_OP_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS",
+                     "NUMEXPR_NUM_THREADS", "NUMBA_NUM_THREADS", "ORT_INTRA_OP_THREADS")
+INTER_OP_ENV_VARS = ("ORT_INTER_OP_THREADS",)
+
+
+class CpuConfig:
+    """Thread counts and CPU pinning of one worker process"""
+
+    def __init__(self, threads, inter_op_threads=1, pin=False):
+        self.threads = threads
+        self.inter_op_threads = inter_op_threads
+        self.pin = pin
+
+    def spec(self):
+        """This configuration as a CPU_THREADS value"""
+        spec = str(self.threads)
+        if self.inter_op_threads != 1:
+            spec += f"/{self.inter_op_threads}"
+        return spec + (":pin" if self.pin else "")
+
+    def __eq__(self, other):
+        return isinstance(other, CpuConfig) and self.spec() == other.spec()
+
+    def __repr__(self):
+        return f"CpuConfig({self.spec()!r})"
+
+
+def usable_cpus():
+    """CPUs this process may run on, in order"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+# Taken before any pinning, so forked workers split the machine rather than their parent's share
+_ALL_CPUS = usable_cpus()
+
+_lock = threading.Lock()
+_applied = None
+_env_owned = set()
+_torch_threads = None
+_torch_inter_op_set = False
+_pinned_cpus = []
+
+
+def parse(spec, workers=1):
+    """CpuConfig from a CPU_THREADS value such as "auto", "2" or "4/1:pin" """
+    text = spec.strip().lower()
+    pin = text.endswith(":pin")
+    if pin:
+        text = text[:-len(":pin")]
+    threads, _, inter_op_threads = text.partition("/")
+    try:
+        threads = max(1, len(_ALL_CPUS) // max(1, workers)) if threads == "auto" else int(threads)
+        inter_op_threads = int(inter_op_threads) if inter_op_threads else 1
+    except ValueError:
+        threads = inter_op_threads = 0
+    if threads < 1 or inter_op_threads < 1:
+        raise ValueError(f"Invalid CPU_THREADS {spec!r}, expected <threads>[/<inter-op threads>][:pin] "
+                         f"such as 'auto', '2' or '4/1:pin'")
+    return CpuConfig(threads, inter_op_threads, pin)
+
+
+def configured():
+    """CpuConfig from CPU_THREADS, with "auto" dividing the CPUs between WORKERS processes"""
+    return parse(os.environ.get("CPU_THREADS", DEFAULT_SPEC), int(os.environ.get("WORKERS", 1)))
+
+
+def worker_cpus(config, worker_index):
+    """The CPUs worker_index is pinned to: consecutive blocks of config.threads, wrapping around"""
+    count = min(config.threads, len(_ALL_CPUS))
+    start = worker_index * count
+    return [_ALL_CPUS[(start + i) % len(_ALL_CPUS)] for i in range(count)]
+
+
+def _set_environment(config):
+    """Export the thread counts for libraries that haven't loaded yet"""
+    for names, value in ((INTRA_OP_ENV_VARS, config.threads), (INTER_OP_ENV_VARS, config.inter_op_threads)):
+        for name in names:
+            if name in _env_owned or name not in os.environ:
+                os.environ[name] = str(value)
+                _env_owned.add(name)
+
+
+def _limit_loaded_pools(config):
+    """Resize the BLAS and OpenMP pools of libraries that are already loaded (numpy's, usually)"""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=config.threads)
+
+
+def configure_torch(torch=None):
+    """Apply the thread counts to torch; called again once torch is imported
+
+    Inter-op threads can only be set before torch's first parallel op, so
+    this should run before a model is loaded.
+    """
+    global _torch_threads, _torch_inter_op_set
+    if torch is None:
+        torch = sys.modules.get("torch")
+    if torch is None or _applied is None:
+        return
+    with _lock:
+        if _torch_threads != _applied.threads:
+            torch.set_num_threads(_applied.threads)
+            _torch_threads = _applied.threads
+        if not _torch_inter_op_set:
+            try:
+                torch.set_num_interop_threads(_applied.inter_op_threads)
+            except RuntimeError as e:
+                print(f"Could not set torch inter-op threads: {e}")
+            _torch_inter_op_set = True
+
+
+def apply(config=None, worker_index=None):
+    """Size this process's thread pools from config (default: CPU_THREADS) and pin it if asked
+
+    Safe to call more than once; a later call with a different config
+    resizes the pools. Pinning needs worker_index (prefork.py passes each
+    worker's), and only affects threads started after it.
+    """
+    global _applied, _pinned_cpus
+    config = config or _applied or configured()
+    with _lock:
+        if config != _applied:
+            _set_environment(config)
+            _limit_loaded_pools(config)
+            _applied = config
+        if config.pin and worker_index is not None and hasattr(os, "sched_setaffinity"):
+            _pinned_cpus = worker_cpus(config, worker_index)
+            os.sched_setaffinity(0, _pinned_cpus)
+    configure_torch()
+    return config
+
+
+def status():
+    """The applied configuration and the thread pools that are loaded"""
+    pools = []
+    try:
+        from threadpoolctl import threadpool_info
+        pools = [{'library': info['internal_api'], 'threads': info['num_threads']} for info in threadpool_info()]
+    except ImportError:
+        pass
+    torch = sys.modules.get("torch")
+    return {
+        'spec': _applied.spec() if _applied else None,
+        'usable_cpus': len(_ALL_CPUS),
+        'pinned_cpus': list(_pinned_cpus),
+        'torch_threads': torch.get_num_threads() if torch is not None else None,
+        'torch_inter_op_threads': torch.get_num_interop_threads() if torch is not None else None,
+        'thread_pools': pools,
+    }
+
+
+def _collect_metrics():
+    """Thread counts and pinning of this worker for /metrics"""
+    if _applied is None:
+        return []
+    return [
+        ('cpu_threads', 'gauge', 'Threads per pool configured by CPU_THREADS',
+         [({'pool': 'intra_op'}, _applied.threads), ({'pool': 'inter_op'}, _applied.inter_op_threads)]),
+        ('cpu_pinned_cpus', 'gauge', 'CPUs this worker is pinned to (0 when not pinned)',
+         [({}, len(_pinned_cpus))]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,159 @@
+import os
+import types
+import tempfile
+import threading
+
+import cpu_runtime
+
+# Backend used for wav2vec2 embeddings unless EMBEDDING_BACKEND says otherwise
+DEFAULT_BACKEND = "torch"
+BACKENDS = ("torch", "torch_int8", "onnx")
+
+# Where the one-time ONNX export is written
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx")
+
+_export_lock = threading.Lock()
+
+
+def configured_backend():
+    """Backend name from EMBEDDING_BACKEND (torch, torch_int8 or onnx)"""
+    backend = os.environ.get("EMBEDDING_BACKEND", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def onnx_path(model_name):
+    """Location of the exported ONNX graph for model_name"""
+    onnx_dir = os.environ.get("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+    return os.path.join(onnx_dir, model_name.replace("/", "--") + ".onnx")
+
+
+def load_torch(model_name):
+    """fp32 PyTorch processor and model"""
+    import torch
+    from transformers import Wav2Vec2Processor, Wav2Vec2Model
+
+    # Before the first op: torch's inter-op pool can't be resized after it
+    cpu_runtime.configure_torch(torch)
+
+    processor = Wav2Vec2Processor.from_pretrained(model_name)
+    model = Wav2Vec2Model.from_pretrained(model_name)
+    model.eval()
+    return processor, model
+
+
+def load_torch_int8(model_name):
+    """PyTorch model with dynamic int8 quantization of every Linear layer"""
+    import torch
+
+    processor, model = load_torch(model_name)
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    return processor, quantized
+
+
+def export_onnx(model, path):
+    """Export a Wav2Vec2Model to ONNX with dynamic batch and time axes"""
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dummy_input = torch.zeros(1, 16000)
+    dummy_mask = torch.ones(1, 16000, dtype=torch.long)
+
+    # Export to a temporary file first so concurrent workers never load a partial graph
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".onnx.tmp")
+    os.close(fd)
+    try:
+        torch.onnx.export(
+            model,
+            (dummy_input, dummy_mask),
+            tmp_path,
+            input_names=["input_values", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_values": {0: "batch", 1: "samples"},
+                "attention_mask": {0: "batch", 1: "samples"},
+                "last_hidden_state": {0: "batch", 1: "frames"},
+            },
+            opset_version=14,
+        )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class OnnxWav2Vec2:
+    """onnxruntime session that looks like a Wav2Vec2Model to feature_pipeline
+
+    Calling it with input_values (and optionally attention_mask) returns an
+    object with a torch last_hidden_state, and .config is the Hugging Face
+    config, so the extraction code does not need to know which backend runs.
+    """
+
+    def __init__(self, path, config, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # 0 lets onnxruntime pick based on the number of cores
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.config = config
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_values, attention_mask=None):
+        import numpy as np
+        import torch
+
+        input_values = input_values.numpy().astype(np.float32, copy=False)
+        if attention_mask is None:
+            attention_mask = np.ones(input_values.shape, dtype=np.int64)
+        else:
+            attention_mask = attention_mask.numpy().astype(np.int64, copy=False)
+        (hidden,) = self.session.run(["last_hidden_state"], {
+            "input_values": input_values,
+            "attention_mask": attention_mask,
+        })
+        return types.SimpleNamespace(last_hidden_state=torch.from_numpy(hidden))
+
+
+def load_onnx(model_name):
+    """onnxruntime backend, exporting the fp32 model on first use
+
+    The PyTorch weights are only loaded for that one-time export; later
+    starts read just the processor and config next to the ONNX graph.
+    """
+    from transformers import Wav2Vec2Config, Wav2Vec2Processor
+
+    path = onnx_path(model_name)
+    with _export_lock:
+        if not os.path.exists(path):
+            _, model = load_torch(model_name)
+            print(f"Exporting {model_name} to {path}...")
+            export_onnx(model, path)
+            del model
+
+    processor = Wav2Vec2Processor.from_pretrained(model_name)
+    config = Wav2Vec2Config.from_pretrained(model_name)
+    return processor, OnnxWav2Vec2(
+        path,
+        config,
+        intra_op_threads=int(os.environ.get("ORT_INTRA_OP_THREADS", 0)),
+        inter_op_threads=int(os.environ.get("ORT_INTER_OP_THREADS", 0)),
+    )
+
+
+def load_backend(model_name, backend=None):
+    """Load (processor, model) for the given or configured backend"""
+    backend = backend or configured_backend()
+    if backend == "torch_int8":
+        return load_torch_int8(model_name)
+    if backend == "onnx":
+        return load_onnx(model_name)
+    return load_torch(model_name)
@@ -0,0 +1,425 @@
+import os
+import csv
+import sys
+import json
+import time
+import fcntl
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+# Version of the layout below; bump when it changes incompatibly
+FORMAT_VERSION = 1
+HEADER_FILE = "store.json"
+VECTORS_FILE = "vectors.f32"
+NORMS_FILE = "norms.f32"
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = ".lock"
+
+# feature_pipeline.FEATURE_TYPES with and without TRIM_SUFFIX (listed here so the CLI doesn't import the audio stack)
+FEATURE_TYPES = ["mfcc", "mfcc_numpy", "wav2vec2", "mfcc+trim", "mfcc_numpy+trim", "wav2vec2+trim"]
+
+# Rows scored per matrix product in knn(); bounds memory at any store size
+DEFAULT_BLOCK_ROWS = 65536
+
+# An embedding store is a directory:
+#   store.json     format, vector width and the feature_config the vectors were computed with
+#   vectors.f32    row-major float32 matrix, one row per recording, only ever appended to
+#   norms.f32      L2 norm of each row (so cosine and euclidean k-NN need no pass over the matrix)
+#   index.jsonl    one JSON metadata record per row (path, audio digest, duration, labels)
+# A row's vector and norm are written before its index line, so the number of
+# index lines is the number of complete rows; readers map exactly that many.
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped float32 feature vectors with one metadata record per row
+
+    Opening an existing store needs only its path; creating one needs dim and
+    feature_config. Only one process appends at a time (an flock on the
+    store), while any number of processes can read it: vectors() is a
+    read-only memory map, so training scripts and k-NN queries share the
+    page cache instead of loading copies.
+    """
+
+    def __init__(self, path, dim=None, feature_config=None):
+        self.path = path
+        header_path = os.path.join(path, HEADER_FILE)
+        if os.path.exists(header_path):
+            with open(header_path) as f:
+                header = json.load(f)
+            if header.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported embedding store format {header.get('format')} in {path}")
+            if dim is not None and dim != header["dim"]:
+                raise ValueError(f"{path} holds {header['dim']}-dim vectors, not {dim}")
+            if feature_config is not None and feature_config != header["feature_config"]:
+                raise ValueError(f"{path} holds {header['feature_config']} features, not {feature_config}")
+        else:
+            if dim is None or feature_config is None:
+                raise FileNotFoundError(f"No embedding store at {path}")
+            os.makedirs(path, exist_ok=True)
+            header = {"format": FORMAT_VERSION, "dim": int(dim), "feature_config": feature_config,
+                      "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            for name in (VECTORS_FILE, NORMS_FILE, INDEX_FILE):
+                open(os.path.join(path, name), "ab").close()
+            tmp_path = f"{header_path}.tmp-{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                json.dump(header, f, indent=2)
+            os.rename(tmp_path, header_path)
+
+        self.dim = header["dim"]
+        self.feature_config = header["feature_config"]
+        self._lock = threading.Lock()
+        self._metadata = []
+        self._index_offset = 0
+        self._vectors = None
+        self._norms = None
+        self.refresh()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def refresh(self):
+        """Pick up rows appended (by any process) since the store was opened or last refreshed"""
+        with self._lock:
+            with open(self._file(INDEX_FILE), "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+            # A line without its newline is still being written; leave it for next time
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                self._metadata.append(json.loads(line))
+            self._index_offset += len(complete)
+
+    def __len__(self):
+        return len(self._metadata)
+
+    def _maps(self):
+        with self._lock:
+            rows = len(self._metadata)
+            if self._vectors is None or len(self._vectors) != rows:
+                if rows == 0:
+                    self._vectors = np.empty((0, self.dim), dtype=np.float32)
+                    self._norms = np.empty(0, dtype=np.float32)
+                else:
+                    self._vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r",
+                                              shape=(rows, self.dim))
+                    self._norms = np.memmap(self._file(NORMS_FILE), dtype=np.float32, mode="r", shape=(rows,))
+            return self._vectors, self._norms
+
+    def vectors(self):
+        """Read-only (rows, dim) memory map of every complete row"""
+        return self._maps()[0]
+
+    def norms(self):
+        """Read-only L2 norm of every row"""
+        return self._maps()[1]
+
+    def metadata(self, row):
+        return self._metadata[row]
+
+    def rows_where(self, **match):
+        """Indices of the rows whose metadata has every given key=value"""
+        return np.array([row for row, record in enumerate(self._metadata)
+                         if all(record.get(key) == value for key, value in match.items())], dtype=np.int64)
+
+    def paths(self):
+        """Paths already in the store (for resuming an extraction)"""
+        return {record.get("path") for record in self._metadata}
+
+    def labeled(self, label):
+        """(X, y, rows) for every row whose metadata has a non-empty label, ready for training"""
+        rows = np.array([row for row, record in enumerate(self._metadata)
+                         if record.get(label) not in (None, "")], dtype=np.int64)
+        X = np.asarray(self.vectors()[rows]) if len(rows) else np.empty((0, self.dim), dtype=np.float32)
+        y = np.array([self._metadata[row][label] for row in rows])
+        return X, y, rows
+
+    def append(self, vectors, metadata):
+        """Append rows of vectors with one metadata dict each; returns the new row indices"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(metadata) != len(vectors):
+            raise ValueError(f"Got {len(vectors)} vectors but {len(metadata)} metadata records")
+
+        with open(self._file(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.refresh()
+            first = len(self)
+            # Drop the bytes of rows whose index line was never written (an interrupted append)
+            os.truncate(self._file(VECTORS_FILE), first * self.dim * 4)
+            os.truncate(self._file(NORMS_FILE), first * 4)
+
+            with open(self._file(VECTORS_FILE), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._file(NORMS_FILE), "ab") as f:
+                f.write(np.linalg.norm(vectors, axis=1).astype(np.float32).tobytes())
+            with open(self._file(INDEX_FILE), "a") as f:
+                for offset, record in enumerate(metadata):
+                    f.write(json.dumps({**record, "row": first + offset}) + "\n")
+            self.refresh()
+        return range(first, first + len(vectors))
+
+    def knn(self, queries, k=10, metric="cosine", rows=None, block_rows=DEFAULT_BLOCK_ROWS):
+        """Nearest stored rows to each query vector; returns (row indices, scores), each (queries, k)
+
+        The matrix is scanned in blocks of block_rows with one matrix product
+        per block and a running top-k (argpartition), so memory stays bounded
+        at millions of rows. metric is 'cosine' (scores are similarities,
+        highest first) or 'euclidean' (distances, smallest first). rows
+        limits the search to a subset, e.g. from rows_where().
+        """
+        if metric not in ("cosine", "euclidean"):
+            raise ValueError(f"Unknown metric: {metric}")
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        vectors, norms = self._maps()
+        total = len(vectors) if rows is None else len(rows)
+        k = min(k, total)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        # Smaller is better for both metrics: negative cosine similarity, or squared
+        # euclidean distance without the constant |q|^2 term
+        best_keys = np.empty((len(queries), 0), dtype=np.float32)
+        if k == 0:
+            return best_rows, best_keys
+
+        query_norms = np.linalg.norm(queries, axis=1)
+        if metric == "cosine":
+            queries = queries / np.maximum(query_norms, 1e-12)[:, None]
+
+        for start in range(0, total, block_rows):
+            if rows is None:
+                block_index = np.arange(start, min(start + block_rows, total))
+                block = vectors[start:start + block_rows]
+            else:
+                block_index = np.asarray(rows[start:start + block_rows], dtype=np.int64)
+                block = vectors[block_index]
+            products = queries @ block.T
+            if metric == "cosine":
+                keys = -products / np.maximum(norms[block_index], 1e-12)
+            else:
+                keys = np.square(norms[block_index]) - 2 * products
+
+            candidate_keys = np.concatenate([best_keys, keys], axis=1)
+            candidate_rows = np.concatenate([best_rows, np.broadcast_to(block_index, keys.shape)], axis=1)
+            if candidate_keys.shape[1] > k:
+                keep = np.argpartition(candidate_keys, k - 1, axis=1)[:, :k]
+                candidate_keys = np.take_along_axis(candidate_keys, keep, axis=1)
+                candidate_rows = np.take_along_axis(candidate_rows, keep, axis=1)
+            best_keys, best_rows = candidate_keys, candidate_rows
+
+        order = np.argsort(best_keys, axis=1)
+        best_keys = np.take_along_axis(best_keys, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        if metric == "cosine":
+            return best_rows, -best_keys
+        return best_rows, np.sqrt(np.maximum(best_keys + np.square(query_norms)[:, None], 0))
+
+
+def read_labels(manifest_path):
+    """Label columns of a CSV manifest with a 'path' column, keyed by absolute path"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    labels = {}
+    with open(manifest_path, newline="") as f:
+        for row in csv.DictReader(f):
+            path = row.pop("path", None)
+            if path:
+                path = path if os.path.isabs(path) else os.path.join(base_dir, path)
+                labels[os.path.abspath(path)] = {key: value for key, value in row.items() if key}
+    return labels
+
+
+def _init_worker(threads_per_worker):
+    import cpu_runtime
+    cpu_runtime.apply(cpu_runtime.CpuConfig(threads_per_worker))
+
+
+def extract_chunk(audio_paths, feature_type):
+    """Decode and featurize one chunk in a worker; returns (feature_config, matrix, metadata, errors)"""
+    import feature_cache
+    import feature_pipeline
+    resolved = feature_pipeline._resolve_feature_type(feature_type)[0]
+    waveforms, decoded = feature_pipeline.decode_many(audio_paths)
+    decoded_set = set(decoded)
+    errors = [path for index, path in enumerate(audio_paths) if index not in decoded_set]
+    if not waveforms:
+        return feature_pipeline.feature_config(resolved), None, [], errors
+    digests = [feature_cache.audio_digest(y) for y in waveforms]
+    matrix = feature_pipeline.extract_batch(waveforms, feature_pipeline.TARGET_SAMPLE_RATE, feature_type, digests)
+    metadata = [{"path": audio_paths[index], "digest": digest,
+                 "seconds": len(y) / feature_pipeline.TARGET_SAMPLE_RATE}
+                for index, digest, y in zip(decoded, digests, waveforms)]
+    return feature_pipeline.feature_config(resolved), matrix, metadata, errors
+
+
+def fill(store_path, inputs, feature_type="wav2vec2", label_manifests=None, workers=None,
+         chunk_size=16, threads_per_worker=1):
+    """Featurize recordings into the store in parallel, skipping paths it already holds
+
+    Returns the store (None if nothing was ever extracted into it).
+    """
+    import batch_score
+    workers = workers or os.cpu_count() or 1
+    paths = [os.path.abspath(path) for path in batch_score.collect_inputs(inputs)]
+    labels = {}
+    for manifest in [entry for entry in inputs if entry.lower().endswith(".csv")] + list(label_manifests or []):
+        labels.update(read_labels(manifest))
+
+    store = EmbeddingStore(store_path) if os.path.exists(os.path.join(store_path, HEADER_FILE)) else None
+    if store is not None:
+        done = store.paths()
+        if done:
+            print(f"Resuming: skipping {sum(1 for path in paths if path in done)} files already in {store_path}")
+        paths = [path for path in paths if path not in done]
+    if not paths:
+        print("Nothing to extract")
+        return store
+
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    print(f"Extracting {feature_type} features from {len(paths)} files with {workers} workers")
+    added = 0
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(threads_per_worker,)) as executor:
+        # Bounded number of chunks in flight; this process is the store's only writer
+        pending = set()
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < workers * 2:
+                pending.add(executor.submit(extract_chunk, chunks[next_chunk], feature_type))
+                next_chunk += 1
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                config, matrix, metadata, errors = future.result()
+                failed += len(errors)
+                if matrix is None:
+                    continue
+                if store is None:
+                    store = EmbeddingStore(store_path, dim=matrix.shape[1], feature_config=config)
+                elif config != store.feature_config:
+                    raise ValueError(f"Extracted {config} features but {store_path} holds {store.feature_config}")
+                for record in metadata:
+                    record.update(labels.get(record["path"], {}))
+                store.append(matrix, metadata)
+                added += len(metadata)
+
+            elapsed = time.perf_counter() - start
+            print(f"{added + failed}/{len(paths)} files, {(added + failed) / elapsed:.1f} files/s", flush=True)
+
+    print(f"Added {added} rows ({failed} files failed) in {time.perf_counter() - start:.1f}s; "
+          f"{store_path} now holds {len(store) if store else 0} rows")
+    return store
+
+
+def extract(args):
+    fill(args.store, args.inputs, args.feature_type, args.labels, args.workers,
+         args.chunk_size, args.threads_per_worker)
+    return 0
+
+
+def query(args):
+    """Print the stored recordings most similar to each query recording"""
+    import feature_pipeline
+    store = EmbeddingStore(args.store)
+    feature_type = store.feature_config.split(":", 1)[0]
+    config = feature_pipeline.feature_config(feature_pipeline._resolve_feature_type(feature_type)[0])
+    if config != store.feature_config:
+        print(f"Warning: queries use {config} features but the store holds {store.feature_config}")
+
+    waveforms, decoded = feature_pipeline.decode_many(args.audio)
+    if not waveforms:
+        print("No query recording could be decoded")
+        return 1
+    matrix = feature_pipeline.extract_batch(waveforms, feature_pipeline.TARGET_SAMPLE_RATE, feature_type)
+
+    start = time.perf_counter()
+    rows, scores = store.knn(matrix, k=args.k, metric=args.metric)
+    print(f"Searched {len(store)} rows in {1000 * (time.perf_counter() - start):.1f} ms")
+    for index, query_rows, query_scores in zip(decoded, rows, scores):
+        print(f"{args.audio[index]}:")
+        for row, score in zip(query_rows, query_scores):
+            record = store.metadata(row)
+            extra = {key: value for key, value in record.items() if key not in ("path", "digest", "row")}
+            print(f"  {score:9.4f}  {record['path']}  {extra}")
+    return 0
+
+
+def score(args):
+    """Re-score every stored row with the predictors, straight from the stored vectors"""
+    import batch_score
+    import feature_pipeline
+    store = EmbeddingStore(args.store)
+    for predictor in batch_score.PREDICTORS:
+        config = feature_pipeline.feature_config(
+            feature_pipeline._resolve_feature_type(predictor.get_feature_type())[0])
+        if config != store.feature_config:
+            print(f"{predictor.PREDICTOR_NAME} needs {config} features but {args.store} holds {store.feature_config}")
+            return 1
+
+    writer = (batch_score.ParquetResultWriter if args.output.endswith(".parquet")
+              else batch_score.CsvResultWriter)(args.output)
+    vectors = store.vectors()
+    start = time.perf_counter()
+    try:
+        for first in range(0, len(vectors), args.block_rows):
+            block = np.asarray(vectors[first:first + args.block_rows])
+            predictions = {predictor.PREDICTOR_NAME: predictor.predict_batch(block)
+                           for predictor in batch_score.PREDICTORS}
+            writer.write([batch_score._row(store.metadata(first + offset)["path"],
+                                           {name: results[offset] for name, results in predictions.items()})
+                          for offset in range(len(block))])
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(vectors)} rows in {elapsed:.2f}s ({len(vectors) / max(elapsed, 1e-9):.0f} rows/s)")
+    return 0
+
+
+def info(args):
+    store = EmbeddingStore(args.store)
+    size = sum(os.path.getsize(os.path.join(args.store, name)) for name in (VECTORS_FILE, NORMS_FILE, INDEX_FILE))
+    print(f"{args.store}: {len(store)} rows x {store.dim} float32 ({store.feature_config}), {size / 1e6:.1f} MB")
+    counts = {}
+    for row in range(len(store)):
+        for key in store.metadata(row):
+            counts[key] = counts.get(key, 0) + 1
+    for key, count in sorted(counts.items()):
+        if key not in ("path", "digest", "row", "seconds"):
+            print(f"  label {key}: {count} rows")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precomputed feature vectors for training, re-scoring and k-NN search")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fill = commands.add_parser("extract", help="Featurize recordings into a store (resumes where it stopped)")
+    fill.add_argument("inputs", nargs="+", help="Audio directories, glob patterns or CSV manifests")
+    fill.add_argument("--store", required=True, help="Embedding store directory")
+    fill.add_argument("--feature-type", default="wav2vec2", choices=FEATURE_TYPES)
+    fill.add_argument("--labels", nargs="+", help="CSV manifests whose non-path columns are stored as labels")
+    fill.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    fill.add_argument("--chunk-size", type=int, default=16, help="Files per task (also the wav2vec2 batch size)")
+    fill.add_argument("--threads-per-worker", type=int, default=1, help="Torch, BLAS and OpenMP threads in each worker process")
+
+    search = commands.add_parser("query", help="Find the stored recordings most similar to some recordings")
+    search.add_argument("audio", nargs="+", help="Query recordings")
+    search.add_argument("--store", required=True)
+    search.add_argument("-k", type=int, default=5, help="Neighbours per query")
+    search.add_argument("--metric", default="cosine", choices=["cosine", "euclidean"])
+
+    rescore = commands.add_parser("score", help="Run the predictors on every stored row without decoding audio")
+    rescore.add_argument("--store", required=True)
+    rescore.add_argument("--output", required=True, help=".csv or .parquet output, as for batch_score.py")
+    rescore.add_argument("--block-rows", type=int, default=4096, help="Rows per predict call")
+
+    describe = commands.add_parser("info", help="Size, feature config and label counts of a store")
+    describe.add_argument("--store", required=True)
+
+    args = parser.parse_args()
+    return {"extract": extract, "query": query, "score": score, "info": info}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+# Defaults, overridable through the environment
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024
+
+# Evict down to this fraction of max_disk_bytes so we don't scan on every write
+_DISK_LOW_WATERMARK = 0.9
+
+# Other processes sharing cache_dir write too; rescan it at least this often so
+# their files count against max_disk_bytes
+_DISK_RESCAN_SECONDS = 30.0
+
+
+def audio_digest(y):
+    """Hash the decoded float32 samples of a waveform"""
+    return hashlib.sha256(np.ascontiguousarray(y, dtype=np.float32).tobytes()).hexdigest()
+
+
+def cache_key(digest, sr, feature_config):
+    """Combine an audio_digest() with everything else that changes the features
+
+    feature_config is a string such as "mfcc:n_mfcc=40" or
+    "wav2vec2:facebook/wav2vec2-base-960h" (see feature_pipeline.feature_config).
+    """
+    return hashlib.sha256(f"{digest}|sr={sr}|{feature_config}".encode("utf-8")).hexdigest()
+
+
+class FeatureCache:
+    """In-memory LRU of feature vectors backed by an optional on-disk store
+
+    Disk entries are written to a temporary file and renamed into place, so
+    several processes can share one cache_dir. max_disk_bytes bounds the
+    whole directory, not this process's writes: it is rescanned when this
+    process's estimate crosses the limit and every _DISK_RESCAN_SECONDS,
+    and trimmed by deleting the least recently used files. The cache is
+    best effort: disk errors are logged and never fail the caller.
+    """
+
+    def __init__(self, cache_dir=None, max_memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_errors = 0
+
+        self._disk_bytes = 0
+        self._last_scan = time.monotonic()
+        self._evict_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        """Return the cached feature vector for key, or None"""
+        with self._lock:
+            features = self._memory.get(key)
+            if features is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return features
+
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                features = np.load(path, allow_pickle=False)
+                features.setflags(write=False)
+            except (ValueError, OSError):
+                features = None
+            if features is not None:
+                try:
+                    # Touch the file so disk eviction sees it as recently used
+                    os.utime(path, None)
+                except OSError:
+                    pass
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, features)
+                return features
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, features):
+        """Store a feature vector in memory and, if configured, on disk"""
+        features = np.array(features)
+        # Cached vectors are shared between callers, so make them read-only
+        features.setflags(write=False)
+        with self._lock:
+            self._remember(key, features)
+
+        if self.cache_dir:
+            path = self._path(key)
+            if os.path.exists(path):
+                return
+            tmp_path = None
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, features, allow_pickle=False)
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+            except OSError as e:
+                # Full disk, no permission, read-only cache_dir: the features are still returned
+                print(f"Feature cache write to {self.cache_dir} failed: {e}")
+                if tmp_path is not None:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                with self._lock:
+                    self.write_errors += 1
+                return
+            with self._lock:
+                self._disk_bytes += size
+                rescan = (self._disk_bytes > self.max_disk_bytes
+                          or time.monotonic() - self._last_scan >= _DISK_RESCAN_SECONDS)
+            if rescan:
+                self._evict_disk()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached vector for key, calling compute() and storing the result on a miss"""
+        features = self.get(key)
+        if features is None:
+            features = compute()
+            if features is not None:
+                self.put(key, features)
+        return features
+
+    def _remember(self, key, features):
+        """Insert into the in-memory LRU (caller holds the lock)"""
+        self._memory[key] = features
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_entries(self):
+        """(path, size, mtime) for every entry currently on disk"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Removed by another process
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        """Measure the whole directory and, above max_disk_bytes, delete the least recently used files
+
+        Deletes down to the low watermark, whichever process wrote them.
+        """
+        # One scan at a time per process; a write racing an ongoing scan skips its own
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = self._disk_entries()
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            if total > self.max_disk_bytes:
+                target = self.max_disk_bytes * _DISK_LOW_WATERMARK
+                for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        evicted += 1
+                    except FileNotFoundError:
+                        # Evicted by another process
+                        pass
+                    except OSError as e:
+                        print(f"Feature cache eviction of {path} failed: {e}")
+                        continue
+                    total -= size
+            with self._lock:
+                self._disk_bytes = total
+                self._last_scan = time.monotonic()
+                self.evictions += evicted
+        finally:
+            self._evict_lock.release()
+
+    def stats(self):
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'write_errors': self.write_errors,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+_default_cache = None
+_configured = False
+_default_lock = threading.Lock()
+
+
+def configure(enabled=True, cache_dir=None, max_memory_entries=DEFAULT_MEMORY_ENTRIES,
+              max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+    """Replace the process-wide cache used by feature_pipeline"""
+    global _default_cache, _configured
+    with _default_lock:
+        _default_cache = FeatureCache(cache_dir, max_memory_entries, max_disk_bytes) if enabled else None
+        _configured = True
+        return _default_cache
+
+
+def get_cache():
+    """Return the process-wide cache, creating it from the environment on first use
+
+    FEATURE_CACHE=0 disables caching, FEATURE_CACHE_DIR adds the on-disk
+    store, FEATURE_CACHE_MEMORY_ENTRIES and FEATURE_CACHE_MAX_BYTES bound it.
+    """
+    global _default_cache, _configured
+    if not _configured:
+        with _default_lock:
+            if not _configured and os.environ.get("FEATURE_CACHE", "1") == "1":
+                _default_cache = FeatureCache(
+                    cache_dir=os.environ.get("FEATURE_CACHE_DIR") or None,
+                    max_memory_entries=int(os.environ.get("FEATURE_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)),
+                    max_disk_bytes=int(os.environ.get("FEATURE_CACHE_MAX_BYTES", DEFAULT_MAX_DISK_BYTES)),
+                )
+            _configured = True
+    return _default_cache
+
+
+def _collect_metrics():
+    """Hit/miss counters of the process-wide cache for /metrics"""
+    if _default_cache is None:
+        return []
+    stats = _default_cache.stats()
+    return [
+        ('feature_cache_lookups_total', 'counter', 'Feature cache lookups by outcome',
+         [({'result': 'memory_hit'}, stats['memory_hits']), ({'result': 'disk_hit'}, stats['disk_hits']),
+          ({'result': 'miss'}, stats['misses'])]),
+        ('feature_cache_hit_ratio', 'gauge', 'Fraction of feature cache lookups that were hits',
+         [({}, stats['hit_ratio'])]),
+        ('feature_cache_evictions_total', 'counter', 'Feature cache entries evicted', [({}, stats['evictions'])]),
+        ('feature_cache_memory_entries', 'gauge', 'Entries held in memory', [({}, stats['memory_entries'])]),
+        ('feature_cache_disk_bytes', 'gauge', 'Bytes held in the cache directory (all processes, as of the last scan)',
+         [({}, stats['disk_bytes'])]),
+        ('feature_cache_write_errors_total', 'counter', 'Failed feature cache disk writes',
+         [({}, stats['write_errors'])]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,445 @@
+import io
+import os
+import time
+import numpy as np
+
+import audio_ingest
+import model_registry
+import feature_cache
+import embedding_backends
+import mfcc_numpy
+import segmenter
+import metrics
+
+# torch/transformers and librosa are imported inside the functions that use them,
+# so MFCC-only deployments never load torch and mfcc_numpy ones never load librosa
+# (audio_ingest decodes and resamples without it)
+
+# All feature extractors work on 16 kHz mono audio
+TARGET_SAMPLE_RATE = 16000
+N_MFCC = 40
+
+# Feature types extract() computes; any of them + TRIM_SUFFIX (e.g. 'wav2vec2+trim')
+# first cuts the recording down to its cough events with segmenter.trim()
+FEATURE_TYPES = ('mfcc', 'mfcc_numpy', 'wav2vec2')
+TRIM_SUFFIX = '+trim'
+
+metrics.describe('trim_input_seconds_total', 'Seconds of audio given to the silence trimmer, by feature type')
+metrics.describe('trim_kept_seconds_total', 'Seconds of audio the silence trimmer passed on to feature extraction')
+
+# Feature types the browser can compute itself (static/js/featureExtractor.js ports mfcc_numpy)
+CLIENT_FEATURE_TYPES = ('mfcc', 'mfcc_numpy')
+
+
+def as_audio_source(source):
+    """Wrap raw bytes in a file-like object; paths and file-like objects pass through"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def describe_source(source):
+    """Short description of an audio source for log messages"""
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<{len(source)} bytes in memory>"
+    return f"<{getattr(source, 'name', type(source).__name__)}>"
+
+
+def source_exists(source):
+    """False only for a path that does not exist (in-memory sources always exist)"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.exists(source)
+    return True
+
+
+def load_audio(source, sample_rate=TARGET_SAMPLE_RATE):
+    """Decode a path, raw bytes or file-like object once into a mono float32 waveform at sample_rate"""
+    with metrics.span('decode'):
+        return audio_ingest.decode(as_audio_source(source), sample_rate)
+
+
+def extract_mfcc(y, sr, n_mfcc=N_MFCC):
+    """Summarise a waveform as mean MFCC, delta and delta-delta coefficients"""
+    import librosa
+    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
+    mfcc_features = np.mean(mfccs, axis=1)
+
+    # Add delta features
+    delta_mfccs = librosa.feature.delta(mfccs)
+    delta_mfcc_features = np.mean(delta_mfccs, axis=1)
+
+    # Add delta-delta features
+    delta2_mfccs = librosa.feature.delta(mfccs, order=2)
+    delta2_mfcc_features = np.mean(delta2_mfccs, axis=1)
+
+    # Combine features
+    return np.concatenate([mfcc_features, delta_mfcc_features, delta2_mfcc_features])
+
+
+def extract_wav2vec2(y, sr, processor, model):
+    """Mean-pool the last wav2vec2 hidden state over time"""
+    import torch
+    inputs = processor(y, sampling_rate=sr, return_tensors="pt")
+    with torch.no_grad():
+        outputs = model(**inputs)
+    return outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
+
+
+def _wav2vec2_frame_lengths(model, sample_lengths):
+    """Number of wav2vec2 output frames produced for each input length"""
+    import torch
+    lengths = sample_lengths
+    for kernel, stride in zip(model.config.conv_kernel, model.config.conv_stride):
+        lengths = torch.div(lengths - kernel, stride, rounding_mode='floor') + 1
+    return lengths
+
+
+def _wav2vec2_uses_attention_mask(processor):
+    """Whether the checkpoint was trained to ignore padding (the feature extractor returns a mask)
+
+    Group-norm checkpoints such as wav2vec2-base-960h weren't: padding a
+    clip, even with a mask, changes its embedding.
+    """
+    feature_extractor = getattr(processor, 'feature_extractor', processor)
+    return bool(getattr(feature_extractor, 'return_attention_mask', False))
+
+
+def extract_wav2vec2_batch(waveforms, sr, processor, model):
+    """Run several waveforms through wav2vec2 in as few forward passes as possible
+
+    Returns a (len(waveforms), hidden_size) matrix of mean-pooled embeddings
+    equal (up to float rounding) to extract_wav2vec2() on each waveform, so
+    both paths can share feature cache entries. Checkpoints that take an
+    attention mask get one padded pass with padded frames masked out of the
+    attention and the pooling; the others get one unpadded pass per length.
+    """
+    import torch
+    if not _wav2vec2_uses_attention_mask(processor):
+        by_length = {}
+        for index, y in enumerate(waveforms):
+            by_length.setdefault(len(y), []).append(index)
+        pooled = [None] * len(waveforms)
+        for indices in by_length.values():
+            inputs = processor([waveforms[index] for index in indices], sampling_rate=sr, return_tensors="pt")
+            with torch.no_grad():
+                outputs = model(**inputs)
+            for index, row in zip(indices, outputs.last_hidden_state.mean(dim=1).numpy()):
+                pooled[index] = row
+        return np.stack(pooled)
+
+    inputs = processor(waveforms, sampling_rate=sr, padding=True,
+                       return_attention_mask=True, return_tensors="pt")
+    with torch.no_grad():
+        outputs = model(inputs.input_values, attention_mask=inputs.attention_mask)
+
+    hidden = outputs.last_hidden_state
+    frame_lengths = _wav2vec2_frame_lengths(model, inputs.attention_mask.sum(dim=1))
+    frame_mask = torch.arange(hidden.shape[1])[None, :] < frame_lengths[:, None]
+    frame_mask = frame_mask.unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * frame_mask).sum(dim=1) / frame_mask.sum(dim=1).clamp(min=1)
+    return pooled.numpy()
+
+
+def micro_batching_helps(predictors):
+    """Whether evaluating concurrent requests as one batch saves wav2vec2 work for these predictors
+
+    Only checkpoints that take an attention mask run a batch in one padded
+    pass. The others, such as the default wav2vec2-base-960h, need one pass
+    per distinct clip length (see extract_wav2vec2_batch), and uploads
+    almost never share a length, so batching would only add the wait.
+    """
+    for predictor in predictors:
+        try:
+            base, _ = split_feature_type(predictor.get_feature_type())
+        except Exception:
+            # An unloadable head extracts nothing
+            continue
+        if base == 'wav2vec2':
+            processor, _ = model_registry.get_audio_model()
+            if processor is not None and not _wav2vec2_uses_attention_mask(processor):
+                return False
+    return True
+
+
+def split_feature_type(feature_type):
+    """(base feature type, whether silence is trimmed first), e.g. ('wav2vec2', True) for 'wav2vec2+trim'"""
+    if feature_type.endswith(TRIM_SUFFIX):
+        return feature_type[:-len(TRIM_SUFFIX)], True
+    return feature_type, False
+
+
+def predictor_feature_type(name, feature_info):
+    """Feature type a predictor is served: its model's, unless TRIM_<NAME> switches trimming on (1) or off (0)"""
+    feature_type = feature_info.get('feature_type', 'mfcc')
+    override = os.environ.get(f"TRIM_{name.upper()}")
+    if override is None:
+        return feature_type
+    base, _ = split_feature_type(feature_type)
+    return base + TRIM_SUFFIX if override == '1' else base
+
+
+def feature_config(feature_type):
+    """Everything besides the audio that determines a feature vector (part of the cache key)"""
+    base, trimmed = split_feature_type(feature_type)
+    if base == 'wav2vec2':
+        config = f"{feature_type}:{model_registry.AUDIO_MODEL_NAME}:{embedding_backends.configured_backend()}"
+    else:
+        config = f"{feature_type}:n_mfcc={N_MFCC}"
+    return f"{config}:{segmenter.config_key()}" if trimmed else config
+
+
+def feature_width(feature_type):
+    """Length of the feature vector extract() produces for feature_type (None if unknown)"""
+    base, _ = split_feature_type(feature_type)
+    if base == 'wav2vec2':
+        return model_registry.AUDIO_MODEL_HIDDEN_SIZE
+    if base in ('mfcc', 'mfcc_numpy'):
+        return 3 * N_MFCC
+    return None
+
+
+def client_feature_config():
+    """Settings a browser-side extractor must use for its features to be accepted"""
+    return {
+        'feature_type': 'mfcc',
+        'n_mfcc': N_MFCC,
+        'sample_rate': TARGET_SAMPLE_RATE,
+        'width': feature_width('mfcc'),
+        'n_fft': mfcc_numpy.N_FFT,
+        'hop_length': mfcc_numpy.HOP_LENGTH,
+        'n_mels': mfcc_numpy.N_MELS,
+        'top_db': mfcc_numpy.TOP_DB,
+    }
+
+
+def parse_client_features(payload):
+    """Validate a browser-computed feature upload; returns the float32 feature vector
+
+    payload is {'feature_type', 'n_mfcc', 'sample_rate', 'features'} as sent
+    by featureExtractor.js; raises ValueError if it doesn't match
+    client_feature_config().
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    expected = client_feature_config()
+    if payload.get('feature_type') not in CLIENT_FEATURE_TYPES:
+        raise ValueError(f"feature_type must be one of {list(CLIENT_FEATURE_TYPES)}")
+    for key in ('n_mfcc', 'sample_rate'):
+        if payload.get(key) != expected[key]:
+            raise ValueError(f"{key} must be {expected[key]}, got {payload.get(key)}")
+    try:
+        features = np.asarray(payload.get('features'), dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("features must be a list of numbers")
+    if features.shape != (expected['width'],):
+        raise ValueError(f"Expected {expected['width']} features, got shape {features.shape}")
+    if not np.all(np.isfinite(features)):
+        raise ValueError("features must be finite")
+    return features
+
+
+def _resolve_feature_type(feature_type, processor=None, model=None):
+    """Return the feature type that will actually be computed, with its audio model
+
+    wav2vec2 falls back to MFCC when the audio model could not be loaded;
+    mfcc_numpy selects the librosa-free engine in mfcc_numpy. The trim
+    suffix is kept either way.
+    """
+    base, trimmed = split_feature_type(feature_type)
+    suffix = TRIM_SUFFIX if trimmed else ''
+    if base == 'wav2vec2':
+        if processor is None or model is None:
+            processor, model = model_registry.get_audio_model()
+        if processor is not None and model is not None:
+            return 'wav2vec2' + suffix, processor, model
+    if base == 'mfcc_numpy':
+        return 'mfcc_numpy' + suffix, None, None
+    return 'mfcc' + suffix, None, None
+
+
+def trim_silence(y, sr, feature_type=None):
+    """Cut y down to its cough events, counting input and kept seconds per feature type
+
+    1 - trim_kept_seconds_total / trim_input_seconds_total is the fraction of
+    audio the feature extractors skipped.
+    """
+    trimmed = segmenter.trim(y, sr)
+    metrics.inc('trim_input_seconds_total', len(y) / sr, feature_type=feature_type)
+    metrics.inc('trim_kept_seconds_total', len(trimmed) / sr, feature_type=feature_type)
+    return trimmed
+
+
+def extract(y, sr, feature_type, processor=None, model=None, digest=None):
+    """Compute one feature type from an already decoded waveform
+
+    Results go through the feature cache; pass digest (feature_cache.audio_digest)
+    to avoid rehashing the waveform for every feature type. Trimmed feature
+    types are keyed by the untrimmed audio, so a cache hit skips the
+    segmenter too.
+    """
+    feature_type, processor, model = _resolve_feature_type(feature_type, processor, model)
+    base, trimmed = split_feature_type(feature_type)
+
+    def compute():
+        audio = trim_silence(y, sr, feature_type) if trimmed else y
+        with metrics.span('features', feature_type=feature_type):
+            if base == 'wav2vec2':
+                return extract_wav2vec2(audio, sr, processor, model)
+            if base == 'mfcc_numpy':
+                return mfcc_numpy.extract_mfcc_summary(audio, sr, N_MFCC)
+            return extract_mfcc(audio, sr)
+
+    cache = feature_cache.get_cache()
+    if cache is None:
+        return compute()
+    if digest is None:
+        digest = feature_cache.audio_digest(y)
+    return cache.get_or_compute(feature_cache.cache_key(digest, sr, feature_config(feature_type)), compute)
+
+
+def extract_batch(waveforms, sr, feature_type, digests=None):
+    """Compute one feature type for several decoded waveforms as a stacked matrix
+
+    Cached rows are reused; only the misses go through the model.
+    """
+    feature_type, processor, model = _resolve_feature_type(feature_type)
+    base, trimmed = split_feature_type(feature_type)
+
+    cache = feature_cache.get_cache()
+    keys = [None] * len(waveforms)
+    rows = [None] * len(waveforms)
+    if cache is not None:
+        if digests is None:
+            digests = [feature_cache.audio_digest(y) for y in waveforms]
+        config = feature_config(feature_type)
+        keys = [feature_cache.cache_key(digest, sr, config) for digest in digests]
+        rows = [cache.get(key) for key in keys]
+
+    missing = [index for index, row in enumerate(rows) if row is None]
+    if missing:
+        missing_waveforms = [waveforms[index] for index in missing]
+        if trimmed:
+            missing_waveforms = [trim_silence(y, sr, feature_type) for y in missing_waveforms]
+        with metrics.span('features_batch', feature_type=feature_type):
+            if base == 'wav2vec2':
+                computed = extract_wav2vec2_batch(missing_waveforms, sr, processor, model)
+            elif base == 'mfcc_numpy':
+                computed = [mfcc_numpy.extract_mfcc_summary(y, sr, N_MFCC) for y in missing_waveforms]
+            else:
+                computed = [extract_mfcc(y, sr) for y in missing_waveforms]
+        for index, row in zip(missing, computed):
+            rows[index] = row
+            if cache is not None:
+                cache.put(keys[index], row)
+    return np.stack(rows)
+
+
+def compute_features(source, feature_types):
+    """Decode source (path, bytes or file-like) once and compute each requested feature type once
+
+    Returns a dict mapping feature_type to its feature vector, or None if the
+    audio could not be read.
+    """
+    if not source_exists(source):
+        print(f"File not found: {source}")
+        return None
+
+    try:
+        y, sr = load_audio(source)
+        digest = feature_cache.audio_digest(y) if feature_cache.get_cache() is not None else None
+        features = {}
+        for feature_type in set(feature_types):
+            features[feature_type] = extract(y, sr, feature_type, digest=digest)
+        return features
+    except Exception as e:
+        print(f"Error processing {describe_source(source)}: {e}")
+        return None
+
+
+def run_predictors(source, predictors):
+    """Extract the features every predictor needs in one pass and run each of them
+
+    Each predictor is a module exposing PREDICTOR_NAME, get_feature_type() and
+    predict_from_features(). Returns a dict mapping PREDICTOR_NAME to the
+    predictor's result (None when it failed).
+    """
+    feature_types = {predictor.PREDICTOR_NAME: predictor.get_feature_type() for predictor in predictors}
+    print(f"Using feature types: {feature_types}")
+
+    features = compute_features(source, feature_types.values())
+
+    results = {}
+    for predictor in predictors:
+        if features is None:
+            print(f"Failed to extract features from {describe_source(source)}")
+            results[predictor.PREDICTOR_NAME] = None
+            continue
+        results[predictor.PREDICTOR_NAME] = predictor.predict_from_features(
+            features[feature_types[predictor.PREDICTOR_NAME]])
+    return results
+
+
+def _add_timing(timings, stage, start):
+    """Accumulate the seconds since start under stage (no-op when timings is None)"""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start)
+
+
+def decode_many(sources):
+    """Decode several paths/bytes/streams; returns the waveforms and the indices that decoded"""
+    waveforms = []
+    decoded = []
+    for index, source in enumerate(sources):
+        if not source_exists(source):
+            print(f"File not found: {source}")
+            continue
+        try:
+            y, sr = load_audio(source)
+        except Exception as e:
+            print(f"Error processing {describe_source(source)}: {e}")
+            continue
+        waveforms.append(y)
+        decoded.append(index)
+    return waveforms, decoded
+
+
+def run_predictors_batch(audio_paths, predictors, timings=None):
+    """Batched run_predictors(): one result dict per path (or in-memory source), in the same order
+
+    Every file is decoded separately, but each feature type is computed for
+    the whole batch at once (see extract_wav2vec2_batch) and each
+    predictor sees the stacked feature matrix. If a timings dict is given,
+    seconds spent per stage ("decode", "features:<type>", "predict:<name>")
+    are added to it.
+    """
+    feature_types = {predictor.PREDICTOR_NAME: predictor.get_feature_type() for predictor in predictors}
+
+    # Decode every file; unreadable ones get None results
+    start = time.perf_counter()
+    waveforms, decoded = decode_many(audio_paths)
+    _add_timing(timings, "decode", start)
+
+    results = [{predictor.PREDICTOR_NAME: None for predictor in predictors} for _ in audio_paths]
+    if not waveforms:
+        return results
+
+    print(f"Running batch of {len(waveforms)} recordings with feature types: {feature_types}")
+    digests = None
+    if feature_cache.get_cache() is not None:
+        digests = [feature_cache.audio_digest(y) for y in waveforms]
+
+    matrices = {}
+    for feature_type in set(feature_types.values()):
+        start = time.perf_counter()
+        matrices[feature_type] = extract_batch(waveforms, TARGET_SAMPLE_RATE, feature_type, digests)
+        _add_timing(timings, f"features:{feature_type}", start)
+
+    for predictor in predictors:
+        start = time.perf_counter()
+        batch_results = predictor.predict_batch(matrices[feature_types[predictor.PREDICTOR_NAME]])
+        _add_timing(timings, f"predict:{predictor.PREDICTOR_NAME}", start)
+        for index, result in zip(decoded, batch_results):
+            results[index][predictor.PREDICTOR_NAME] = result
+    return results
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+import feature_pipeline
+
+# Rows the per-thread input buffer holds before it first has to grow
+DEFAULT_BATCH_CAPACITY = 32
+
+# Classifier input dtype; sklearn's tree ensembles compare in float32, so
+# float32 rows reach them without another conversion
+INPUT_DTYPE = np.float32
+
+
+class FeatureSchemaError(ValueError):
+    """Features and model don't agree on feature type or width"""
+
+
+class FeatureSchema:
+    """A model's input contract, checked once when the model is loaded
+
+    compile() reconciles feature_info with the estimator and with the width
+    feature_pipeline produces for the feature type, and raises
+    FeatureSchemaError on any disagreement instead of letting requests pad
+    or truncate. prepare() then only checks the width of each batch and
+    gathers the rows into a reusable per-thread buffer.
+    """
+
+    def __init__(self, name, feature_type, width, batch_capacity=DEFAULT_BATCH_CAPACITY):
+        self.name = name
+        self.feature_type = feature_type
+        self.width = width
+        self._batch_capacity = batch_capacity
+        self._local = threading.local()
+
+    @classmethod
+    def compile(cls, name, model, feature_info, batch_capacity=DEFAULT_BATCH_CAPACITY):
+        feature_type = feature_info.get('feature_type', 'mfcc')
+        produced = feature_pipeline.feature_width(feature_type)
+        if produced is None:
+            raise FeatureSchemaError(f"{name}: unknown feature_type {feature_type!r}")
+
+        declared = feature_info.get('input_shape')
+        if declared is not None:
+            if len(declared) != 1:
+                raise FeatureSchemaError(f"{name}: input_shape must be one-dimensional, got {tuple(declared)}")
+            declared = int(declared[0])
+        fitted = getattr(model, 'n_features_in_', None)
+        if declared is not None and fitted is not None and declared != fitted:
+            raise FeatureSchemaError(f"{name}: feature_info says input_shape ({declared},) "
+                                     f"but the model was fitted on {fitted} features")
+
+        width = declared or fitted or produced
+        if width != produced:
+            raise FeatureSchemaError(f"{name}: model takes {width} features but {feature_type} "
+                                     f"produces {produced}")
+        return cls(name, feature_type, width, batch_capacity)
+
+    def key(self):
+        """What two versions must share to be served the same feature matrix"""
+        return self.feature_type, self.width
+
+    def _buffer(self, n):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or len(buffer) < n:
+            capacity = max(self._batch_capacity, 1 << (n - 1).bit_length())
+            buffer = np.empty((capacity, self.width), dtype=INPUT_DTYPE)
+            self._local.buffer = buffer
+        return buffer[:n]
+
+    def prepare(self, feature_matrix, rows=None):
+        """The given rows of feature_matrix as model input; raises FeatureSchemaError on a width mismatch
+
+        A whole float32 matrix is passed through as is; otherwise the rows
+        are gathered into this thread's buffer, which stays valid until the
+        thread's next prepare() call.
+        """
+        if feature_matrix.ndim != 2 or feature_matrix.shape[1] != self.width:
+            raise FeatureSchemaError(f"{self.name} expects {self.width} {self.feature_type} features per row, "
+                                     f"got shape {feature_matrix.shape}")
+        # rows are sorted and unique (ModelManager.route), so all of them means the identity
+        whole = rows is None or len(rows) == len(feature_matrix)
+        if whole and feature_matrix.dtype == INPUT_DTYPE and feature_matrix.flags.c_contiguous:
+            return feature_matrix
+
+        n = len(feature_matrix) if rows is None else len(rows)
+        buffer = self._buffer(n)
+        if whole:
+            np.copyto(buffer, feature_matrix)
+        elif feature_matrix.dtype == INPUT_DTYPE:
+            np.take(feature_matrix, rows, axis=0, out=buffer)
+        else:
+            np.copyto(buffer, feature_matrix[rows])
+        return buffer
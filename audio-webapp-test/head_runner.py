@@ -0,0 +1,167 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+import feature_cache
+import feature_pipeline
+
+# Threads running predictor heads; torch and NumPy release the GIL while they work
+DEFAULT_HEAD_WORKERS = 4
+DEFAULT_HEAD_TIMEOUT_SECONDS = 30.0
+
+
+def create_executor(max_workers=DEFAULT_HEAD_WORKERS):
+    """Bounded thread pool shared by all evaluations"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="predictor-head")
+
+
+class InlineExecutor:
+    """Executor stand-in that runs work on the calling thread (used while profiling a request)"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class _ComputeOnce:
+    """Compute each feature type once even when several heads ask for it at the same time"""
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+        if owner:
+            try:
+                future.set_result(self._compute(key))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+def run_heads(predictors, features_for, predict, executor, timeout=DEFAULT_HEAD_TIMEOUT_SECONDS):
+    """Run every predictor head concurrently and collect a structured result per head
+
+    features_for(feature_type) returns the (shared) features for a type and
+    predict(predictor, features) runs one head on them. A predictor module
+    may set TIMEOUT_SECONDS to override timeout. Returns
+    {name: {'status': 'ok' | 'error' | 'timeout', 'result', 'error', 'seconds'}}.
+    A head that times out keeps its worker thread until it finishes, but its
+    result is discarded.
+    """
+    def run_head(predictor):
+        start = time.perf_counter()
+        features = features_for(predictor.get_feature_type())
+        result = predict(predictor, features)
+        return result, time.perf_counter() - start
+
+    submitted = time.monotonic()
+    futures = [(predictor, executor.submit(run_head, predictor)) for predictor in predictors]
+
+    heads = {}
+    for predictor, future in futures:
+        name = predictor.PREDICTOR_NAME
+        head_timeout = getattr(predictor, 'TIMEOUT_SECONDS', timeout)
+        remaining = None if head_timeout is None else max(0.0, submitted + head_timeout - time.monotonic())
+        try:
+            result, seconds = future.result(timeout=remaining)
+            if result is None:
+                heads[name] = {'status': 'error', 'result': None, 'error': f"{name} prediction failed",
+                               'seconds': seconds}
+            else:
+                heads[name] = {'status': 'ok', 'result': result, 'error': None, 'seconds': seconds}
+        except TimeoutError:
+            future.cancel()
+            print(f"{name} head timed out after {head_timeout}s")
+            heads[name] = {'status': 'timeout', 'result': None,
+                           'error': f"{name} prediction timed out after {head_timeout}s",
+                           'seconds': time.monotonic() - submitted}
+        except Exception as e:
+            print(f"{name} head failed: {e}")
+            heads[name] = {'status': 'error', 'result': None, 'error': str(e),
+                           'seconds': time.monotonic() - submitted}
+    return heads
+
+
+def evaluate_file(audio_path, predictors, executor, timeout=DEFAULT_HEAD_TIMEOUT_SECONDS):
+    """Decode one recording, then run all heads concurrently on shared features
+
+    audio_path may also be raw bytes or a file-like object. Returns {'heads': {...}, 'timings': {'decode': s, 'total': s}}; raises if
+    the file can't be decoded.
+    """
+    start = time.perf_counter()
+    y, sr = feature_pipeline.load_audio(audio_path)
+    decode_seconds = time.perf_counter() - start
+
+    digest = feature_cache.audio_digest(y) if feature_cache.get_cache() is not None else None
+    features_for = _ComputeOnce(lambda feature_type: feature_pipeline.extract(y, sr, feature_type, digest=digest))
+    heads = run_heads(predictors, features_for,
+                      lambda predictor, features: predictor.predict_from_features(features),
+                      executor, timeout)
+    return {'heads': heads, 'timings': {'decode': decode_seconds, 'total': time.perf_counter() - start}}
+
+
+def evaluate_batch(audio_paths, predictors, executor, timeout=DEFAULT_HEAD_TIMEOUT_SECONDS):
+    """Batched evaluate_file(): one batched feature pass per type, heads run concurrently
+
+    Returns one {'heads', 'timings'} dict per path, or an exception instance
+    for paths that could not be decoded.
+    """
+    start = time.perf_counter()
+    waveforms, decoded = feature_pipeline.decode_many(audio_paths)
+    decode_seconds = time.perf_counter() - start
+
+    outcomes = [FileNotFoundError(f"Could not decode {feature_pipeline.describe_source(path)}") for path in audio_paths]
+    if not waveforms:
+        return outcomes
+
+    digests = None
+    if feature_cache.get_cache() is not None:
+        digests = [feature_cache.audio_digest(y) for y in waveforms]
+    features_for = _ComputeOnce(lambda feature_type: feature_pipeline.extract_batch(
+        waveforms, feature_pipeline.TARGET_SAMPLE_RATE, feature_type, digests))
+    heads = run_heads(predictors, features_for,
+                      lambda predictor, matrix: predictor.predict_batch(matrix),
+                      executor, timeout)
+
+    timings = {'decode': decode_seconds, 'total': time.perf_counter() - start, 'batch_size': len(waveforms)}
+    for row, index in enumerate(decoded):
+        per_item = {}
+        for name, head in heads.items():
+            item = dict(head)
+            if head['status'] == 'ok':
+                item['result'] = head['result'][row]
+                if item['result'] is None:
+                    item.update(status='error', error=f"{name} prediction failed")
+            per_item[name] = item
+        outcomes[index] = {'heads': per_item, 'timings': timings}
+    return outcomes
+
+
+def evaluate_features(features, predictors, executor, timeout=DEFAULT_HEAD_TIMEOUT_SECONDS):
+    """evaluate_file() for a feature vector computed by the client: no decode, no extraction
+
+    Heads whose model takes a feature type the client can't compute fail
+    with an error asking for the audio instead.
+    """
+    start = time.perf_counter()
+
+    def features_for(feature_type):
+        if feature_type not in feature_pipeline.CLIENT_FEATURE_TYPES:
+            raise ValueError(f"Model needs {feature_type} features; upload the audio instead")
+        return features
+
+    heads = run_heads(predictors, features_for,
+                      lambda predictor, features: predictor.predict_from_features(features),
+                      executor, timeout)
+    return {'heads': heads, 'timings': {'total': time.perf_counter() - start}}
@@ -0,0 +1,159 @@
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict, deque
+
+# Defaults for the /api/jobs queue
+DEFAULT_MAX_QUEUE_SIZE = 64
+DEFAULT_JOB_WORKERS = 4
+# Finished jobs are kept this long for polling, then dropped
+DEFAULT_RESULT_TTL_SECONDS = 600
+# Number of recent jobs the wait/run time metrics are computed over
+METRICS_WINDOW = 500
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the queue is at capacity (the route answers 429)"""
+
+
+class JobQueue:
+    """Bounded in-process queue feeding a pool of inference worker threads
+
+    process(item) is called on a worker thread for every submitted item; its
+    return value becomes the job's result and an exception marks the job as
+    failed. Jobs move through 'queued' -> 'running' -> 'done' | 'error' and
+    stay available to get()/wait() until result_ttl seconds after finishing.
+    """
+
+    def __init__(self, process, max_queue_size=DEFAULT_MAX_QUEUE_SIZE, workers=DEFAULT_JOB_WORKERS,
+                 result_ttl=DEFAULT_RESULT_TTL_SECONDS, name="job-worker"):
+        self.process = process
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._wait_times = deque(maxlen=METRICS_WINDOW)
+        self._run_times = deque(maxlen=METRICS_WINDOW)
+        self._counts = {'submitted': 0, 'rejected': 0, 'done': 0, 'error': 0}
+        self._running = 0
+        self._workers = []
+        for i in range(max(1, int(workers))):
+            thread = threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, item):
+        """Queue item and return its job id; raises QueueFull instead of blocking"""
+        job_id = uuid.uuid4().hex
+        job = {'id': job_id, 'status': 'queued', 'result': None, 'error': None,
+               'submitted': time.time(), 'started': None, 'finished': None}
+        with self._lock:
+            self._expire()
+            # Register before queueing so a worker never sees an unknown id
+            self._jobs[job_id] = job
+            try:
+                self._queue.put_nowait((job_id, item))
+            except queue.Full:
+                del self._jobs[job_id]
+                self._counts['rejected'] += 1
+                raise QueueFull(f"Job queue is full ({self.max_queue_size} jobs waiting)")
+            self._counts['submitted'] += 1
+        return job_id
+
+    def get(self, job_id):
+        """Snapshot of a job's state, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else self._describe(job)
+
+    def wait(self, job_id, timeout=None, last_status=None):
+        """Block until the job's status differs from last_status (or timeout); returns get()"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != last_status:
+                    return None if job is None else self._describe(job)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return self._describe(job)
+                self._changed.wait(remaining)
+
+    def metrics(self):
+        """Queue depth, worker usage and wait/run time statistics over recent jobs"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_size': self.max_queue_size,
+                'running': self._running,
+                'workers': len(self._workers),
+                'jobs_tracked': len(self._jobs),
+                **self._counts,
+                'wait_seconds': _summarize(self._wait_times),
+                'run_seconds': _summarize(self._run_times),
+            }
+
+    def _describe(self, job):
+        described = dict(job)
+        if job['status'] == 'queued':
+            described['queue_position'] = self._queue_position(job['id'])
+        return described
+
+    def _queue_position(self, job_id):
+        queued = [jid for jid, job in self._jobs.items() if job['status'] == 'queued']
+        return queued.index(job_id) + 1 if job_id in queued else None
+
+    def _expire(self):
+        """Drop finished jobs older than result_ttl (called with the lock held)"""
+        if self.result_ttl is None:
+            return
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _update(self, job_id, **fields):
+        with self._changed:
+            self._jobs[job_id].update(fields)
+            self._changed.notify_all()
+
+    def _run(self):
+        while True:
+            job_id, item = self._queue.get()
+            started = time.time()
+            with self._lock:
+                self._running += 1
+                self._wait_times.append(started - self._jobs[job_id]['submitted'])
+            self._update(job_id, status='running', started=started)
+
+            try:
+                result = self.process(item)
+                status, error = 'done', None
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                result, status, error = None, 'error', str(e)
+
+            finished = time.time()
+            with self._lock:
+                self._running -= 1
+                self._run_times.append(finished - started)
+                self._counts[status] += 1
+            self._update(job_id, status=status, result=result, error=error, finished=finished)
+
+
+def _summarize(values):
+    """Mean, p50, p95 and max of a sequence of seconds"""
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max': ordered[-1],
+    }
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Latency buckets (seconds) shared by every histogram
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Set METRICS_LOG_SPANS=1 to also print every span as a JSON line
+LOG_SPANS = os.environ.get('METRICS_LOG_SPANS', '0') == '1'
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_help = {}
+_collectors = []
+_started = time.time()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram for one label set"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def describe(name, help_text):
+    """Set the # HELP line for a metric"""
+    _help[name] = help_text
+
+
+def observe(name, value, **labels):
+    """Add one observation to the histogram name{labels}"""
+    key = _label_key(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+
+def inc(name, amount=1, **labels):
+    """Increment the counter name{labels}"""
+    key = _label_key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def register_collector(collect):
+    """Add a callable returning [(name, type, help, [(labels, value), ...]), ...] read at scrape time"""
+    _collectors.append(collect)
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a pipeline stage into audio_stage_seconds{stage, ...labels}
+
+    Typical labels are predictor and feature_type. Spans are recorded even
+    when the block raises, so failing stages still show up in the latency.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        observe('audio_stage_seconds', seconds, stage=stage, **labels)
+        if LOG_SPANS:
+            print(json.dumps({'span': stage, 'seconds': round(seconds, 6),
+                              'thread': threading.current_thread().name, **labels}))
+
+
+describe('audio_stage_seconds', 'Time spent in each pipeline stage')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        histograms = {name: {key: (list(h.counts), h.count, h.sum, h.buckets) for key, h in series.items()}
+                      for name, series in _histograms.items()}
+        counters = {name: dict(series) for name, series in _counters.items()}
+
+    for name, series in sorted(histograms.items()):
+        lines.append(f"# HELP {name} {_help.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, (counts, count, total, buckets) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+    for name, series in sorted(counters.items()):
+        lines.append(f"# HELP {name} {_help.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(series.items()):
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+    collected = [('process_uptime_seconds', 'gauge', 'Seconds since this process started',
+                  [({}, time.time() - _started)])]
+    for collect in _collectors:
+        try:
+            collected.extend(collect())
+        except Exception as e:
+            print(f"Error collecting metrics: {e}")
+    for name, metric_type, help_text, samples in collected:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if value is not None:
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,135 @@
+# Vectorized NumPy MFCC engine ("mfcc_numpy" feature type).
+# Produces the same 120-dim summary as feature_pipeline.extract_mfcc() without
+# importing librosa (only numpy and scipy.fft). Defaults mirror
+# librosa.feature.mfcc: 2048-point periodic Hann STFT, hop 512, zero-padded
+# centring, 128 Slaney mel bands, power_to_db with top_db=80, orthonormal
+# DCT-II. Filterbanks, windows and DCT matrices are built once per
+# configuration and reused.
+import math
+from functools import lru_cache
+
+import numpy as np
+from scipy import fft as sp_fft
+
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+TOP_DB = 80.0
+AMIN = 1e-10
+DELTA_WIDTH = 9
+
+
+def hz_to_mel(frequencies):
+    """Slaney mel scale (linear below 1 kHz, logarithmic above), as in librosa"""
+    frequencies = np.asanyarray(frequencies, dtype=np.float64)
+    f_sp = 200.0 / 3
+    mels = frequencies / f_sp
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    log_region = frequencies >= min_log_hz
+    mels = np.where(log_region, min_log_mel + np.log(np.maximum(frequencies, min_log_hz) / min_log_hz) / logstep, mels)
+    return mels
+
+
+def mel_to_hz(mels):
+    """Inverse of hz_to_mel()"""
+    mels = np.asanyarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    freqs = f_sp * mels
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    log_region = mels >= min_log_mel
+    return np.where(log_region, min_log_hz * np.exp(logstep * (mels - min_log_mel)), freqs)
+
+
+@lru_cache(maxsize=None)
+def mel_filterbank(sr, n_fft=N_FFT, n_mels=N_MELS):
+    """(n_mels, 1 + n_fft // 2) Slaney-normalised triangular filterbank"""
+    fftfreqs = np.fft.rfftfreq(n=n_fft, d=1.0 / sr)
+    mel_f = mel_to_hz(np.linspace(hz_to_mel(0.0), hz_to_mel(sr / 2.0), n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fftfreqs)
+
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+
+    # Slaney-style area normalisation
+    weights *= (2.0 / (mel_f[2:n_mels + 2] - mel_f[:n_mels]))[:, None]
+    weights = weights.astype(np.float32)
+    weights.setflags(write=False)
+    return weights
+
+
+@lru_cache(maxsize=None)
+def hann_window(n_fft=N_FFT):
+    """Periodic Hann window (scipy.signal.get_window('hann', n_fft, fftbins=True))"""
+    window = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+@lru_cache(maxsize=None)
+def dct_matrix(n_mfcc, n_mels=N_MELS):
+    """(n_mfcc, n_mels) orthonormal DCT-II matrix"""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2.0 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    basis = basis.astype(np.float32)
+    basis.setflags(write=False)
+    return basis
+
+
+def power_spectrogram(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """|STFT|^2 with centred, zero-padded frames; shape (1 + n_fft // 2, n_frames)"""
+    y = np.asarray(y, dtype=np.float32)
+    y = np.pad(y, n_fft // 2, mode='constant')
+    frames = np.lib.stride_tricks.sliding_window_view(y, n_fft)[::hop_length]
+    spectrum = sp_fft.rfft(frames * hann_window(n_fft), axis=1)
+    return (spectrum.real ** 2 + spectrum.imag ** 2).T
+
+
+def mfcc(y, sr, n_mfcc=40, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS):
+    """MFCC matrix of shape (n_mfcc, n_frames), matching librosa.feature.mfcc defaults"""
+    mel_power = mel_filterbank(sr, n_fft, n_mels) @ power_spectrogram(y, n_fft, hop_length)
+    log_mel = 10.0 * np.log10(np.maximum(AMIN, mel_power))
+    log_mel = np.maximum(log_mel, log_mel.max() - TOP_DB)
+    return dct_matrix(n_mfcc, n_mels) @ log_mel
+
+
+@lru_cache(maxsize=None)
+def savgol_coefficients(width, order):
+    """Savitzky-Golay weights for the order-th derivative of a degree-order local fit"""
+    offsets = np.arange(width, dtype=np.float64) - width // 2
+    vandermonde = np.vander(offsets, order + 1, increasing=True)
+    coefficients = (np.linalg.pinv(vandermonde)[order] * math.factorial(order)).astype(np.float32)
+    coefficients.setflags(write=False)
+    return coefficients
+
+
+def delta(data, order=1, width=DELTA_WIDTH):
+    """Savitzky-Golay derivative along time, as librosa.feature.delta(mode='interp')
+
+    With polyorder equal to the derivative order the fitted derivative is
+    constant over a window, so scipy's 'interp' edge handling reduces to
+    repeating the first and last full-window values.
+    """
+    if data.shape[-1] < width:
+        raise ValueError(f"Need at least {width} frames to compute deltas, got {data.shape[-1]}")
+    windows = np.lib.stride_tricks.sliding_window_view(data, width, axis=-1)
+    valid = windows @ savgol_coefficients(width, order)
+    half = width // 2
+    return np.pad(valid, [(0, 0)] * (data.ndim - 1) + [(half, half)], mode='edge')
+
+
+def extract_mfcc_summary(y, sr, n_mfcc=40):
+    """Mean MFCC, delta and delta-delta coefficients (3 * n_mfcc values)"""
+    mfccs = mfcc(y, sr, n_mfcc=n_mfcc)
+    return np.concatenate([
+        mfccs.mean(axis=1),
+        delta(mfccs).mean(axis=1),
+        delta(mfccs, order=2).mean(axis=1),
+    ])
@@ -0,0 +1,224 @@
+import os
+import time
+import threading
+
+import numpy as np
+
+import model_registry
+import model_package
+import feature_schema
+import metrics
+
+# Seconds between checks of the packages directory for new versions (0 disables the watcher)
+DEFAULT_WATCH_SECONDS = float(os.environ.get("MODEL_WATCH_SECONDS", 0))
+
+# Label of the version loaded from the legacy pickles when no package exists
+PICKLE_LABEL = "pickle"
+
+metrics.describe('model_swaps_total', 'Model version routing changes (deploys, A/B splits)')
+
+
+class ModelVersion:
+    """One loaded model version; never modified after it is created"""
+
+    def __init__(self, name, label, model, feature_info, manifest=None):
+        self.name = name
+        self.label = label
+        self.model = model
+        self.feature_info = feature_info
+        self.manifest = manifest
+        # Raises FeatureSchemaError if feature_info, the model and the feature type disagree
+        self.schema = feature_schema.FeatureSchema.compile(f"{name} {label}", model, feature_info)
+        self.loaded_at = time.time()
+
+
+def canary(version):
+    """Run one prediction on a zero vector of the expected width; raises if the model is unusable"""
+    sample = version.schema.prepare(np.zeros((1, version.schema.width), dtype=feature_schema.INPUT_DTYPE))
+    outputs = [version.model.predict(sample)]
+    if hasattr(version.model, 'predict_proba'):
+        outputs.append(version.model.predict_proba(sample))
+    for output in outputs:
+        if not np.all(np.isfinite(np.asarray(output, dtype=np.float64))):
+            raise ValueError(f"{version.name} {version.label}: canary prediction is not finite")
+
+
+class ModelManager:
+    """Serve one predictor's model versions with background loading and atomic swaps
+
+    Versions are loaded (and checked with a canary prediction) off the
+    request path, then swapped in by replacing the routing table under a
+    lock. Requests get their ModelVersion from route() and keep that
+    reference, so anything already in flight finishes on the old version;
+    the old model is freed once the last such request drops it. Several
+    versions can serve side by side with percentage weights for A/B tests.
+    """
+
+    def __init__(self, name, package_root, legacy_loader=None):
+        self.name = name
+        self.package_root = package_root
+        self.legacy_loader = legacy_loader
+        self._lock = threading.Lock()
+        self._first_load_lock = threading.Lock()
+        self._loaded = {}
+        self._weights = {}
+        self._status = {}
+        self._last_change = None
+        self._watcher = None
+
+    def _load(self, label):
+        self._set_status(label, 'loading')
+        try:
+            with metrics.span('model_load', model=f"{self.name}:{label}"):
+                if label == PICKLE_LABEL:
+                    model, feature_info = self.legacy_loader()
+                    manifest = None
+                else:
+                    model, feature_info, manifest = model_package.load(os.path.join(self.package_root, label))
+            version = ModelVersion(self.name, label, model, feature_info, manifest)
+            canary(version)
+        except Exception as e:
+            self._set_status(label, f"failed: {e}")
+            raise
+        self._set_status(label, 'ready')
+        print(f"Loaded {self.name} model {label}")
+        return version
+
+    def _set_status(self, label, status):
+        with self._lock:
+            self._status[label] = status
+
+    def available(self):
+        """Labels of the versions on disk, oldest first"""
+        return [f"v{number}" for number in model_package.versions(self.package_root)]
+
+    def ensure_loaded(self):
+        """Load the newest package (or the legacy pickle) if nothing is serving yet"""
+        with self._lock:
+            if self._weights:
+                return
+        with self._first_load_lock:
+            with self._lock:
+                if self._weights:
+                    return
+            available = self.available()
+            self.set_weights({available[-1] if available else PICKLE_LABEL: 100})
+
+    def set_weights(self, weights):
+        """Route traffic between versions by percentage, e.g. {'v3': 90, 'v4': 10}
+
+        Versions that aren't loaded yet are loaded and canaried first; the
+        routing table is only replaced once all of them are ready, and
+        versions that no longer get traffic are dropped.
+        """
+        weights = {label: float(weight) for label, weight in weights.items() if float(weight) > 0}
+        if not weights or abs(sum(weights.values()) - 100) > 1e-6:
+            raise ValueError("Weights must be positive and add up to 100")
+
+        with self._lock:
+            missing = [label for label in weights if label not in self._loaded]
+        loaded = {label: self._load(label) for label in missing}
+
+        with self._lock:
+            # Every routed version is fed the same feature matrix
+            schemas = {(loaded.get(label) or self._loaded[label]).schema.key() for label in weights}
+            if len(schemas) > 1:
+                raise feature_schema.FeatureSchemaError(
+                    f"{self.name}: versions {sorted(weights)} take different features {sorted(schemas)}")
+            self._loaded.update(loaded)
+            self._weights = weights
+            self._loaded = {label: version for label, version in self._loaded.items() if label in weights}
+            self._last_change = time.time()
+        metrics.inc('model_swaps_total', predictor=self.name)
+        print(f"{self.name} model routing: {weights}")
+
+    def deploy(self, label, background=True):
+        """Load label and send it all traffic; in a background thread unless background=False"""
+        if not background:
+            self.set_weights({label: 100})
+            return None
+
+        def run():
+            try:
+                self.set_weights({label: 100})
+            except Exception as e:
+                print(f"Deploying {self.name} model {label} failed: {e}")
+
+        thread = threading.Thread(target=run, name=f"deploy-{self.name}-{label}", daemon=True)
+        thread.start()
+        return thread
+
+    def primary(self):
+        """The version with the largest share of traffic (its feature type decides what is extracted)"""
+        self.ensure_loaded()
+        with self._lock:
+            label = max(self._weights, key=self._weights.get)
+            return self._loaded[label]
+
+    def weights(self):
+        """The current routing table, {label: percent}"""
+        self.ensure_loaded()
+        with self._lock:
+            return dict(self._weights)
+
+    def route(self, n):
+        """Assign n rows to versions by weight; returns [(ModelVersion, row indices), ...]"""
+        self.ensure_loaded()
+        with self._lock:
+            labels = list(self._weights)
+            versions = [self._loaded[label] for label in labels]
+            weights = np.array([self._weights[label] for label in labels]) / 100.0
+        if len(versions) == 1:
+            return [(versions[0], np.arange(n))]
+        choices = np.random.choice(len(versions), size=n, p=weights)
+        return [(version, np.flatnonzero(choices == i)) for i, version in enumerate(versions)
+                if np.any(choices == i)]
+
+    def status(self):
+        with self._lock:
+            return {
+                'weights': dict(self._weights),
+                'loaded': {label: {'loaded_at': version.loaded_at,
+                                   'feature_type': version.schema.feature_type,
+                                   'input_width': version.schema.width,
+                                   'created': (version.manifest or {}).get('created')}
+                           for label, version in self._loaded.items()},
+                'status': dict(self._status),
+                'available': self.available(),
+                'last_change': self._last_change,
+                'watching': self._watcher is not None,
+            }
+
+    def watch(self, interval=DEFAULT_WATCH_SECONDS):
+        """Poll the packages directory and deploy each new version as it appears"""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                available = self.available()
+                with self._lock:
+                    newest_serving = max((int(label[1:]) for label in self._weights if label != PICKLE_LABEL),
+                                         default=0)
+                    seen = set(self._status)
+                if available and int(available[-1][1:]) > newest_serving and available[-1] not in seen:
+                    print(f"New {self.name} model package {available[-1]} found")
+                    try:
+                        self.set_weights({available[-1]: 100})
+                    except Exception as e:
+                        print(f"Deploying {self.name} model {available[-1]} failed: {e}")
+
+        self._watcher = threading.Thread(target=run, name=f"model-watcher-{self.name}", daemon=True)
+        self._watcher.start()
+
+
+def get_manager(name, package_root, legacy_loader=None):
+    """Process-wide manager for one predictor's models"""
+    return model_registry.get(f"model_manager:{name}", lambda: ModelManager(name, package_root, legacy_loader))
+
+
+def start_watchers(predictors, interval=DEFAULT_WATCH_SECONDS):
+    """Start the directory watcher of every predictor's manager (no-op when interval is 0)"""
+    for predictor in predictors:
+        predictor.get_manager().watch(interval)
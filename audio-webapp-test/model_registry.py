@@ -0,0 +1,93 @@
+import threading
+
+import embedding_backends
+import metrics
+
+# Pretrained audio model shared by every predictor
+AUDIO_MODEL_NAME = "facebook/wav2vec2-base-960h"
+# Width of its mean-pooled embeddings (config.hidden_size), known without loading it
+AUDIO_MODEL_HIDDEN_SIZE = 768
+
+# Cached objects keyed by name, plus one lock per key so that two slow loads
+# (e.g. a pickle and wav2vec2) never block each other
+_models = {}
+_key_locks = {}
+_registry_lock = threading.Lock()
+
+# Number of times each key was actually loaded (should stay at 1 per process)
+load_counts = {}
+
+
+def _lock_for(key):
+    """Return the lock guarding the load of a single registry key"""
+    with _registry_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _key_locks[key] = lock
+        return lock
+
+
+def get(key, loader):
+    """Return the object registered under key, calling loader() once per process"""
+    if key in _models:
+        return _models[key]
+
+    with _lock_for(key):
+        # Another thread may have finished loading while we waited
+        if key not in _models:
+            with metrics.span('model_load', model=key):
+                _models[key] = loader()
+            load_counts[key] = load_counts.get(key, 0) + 1
+        return _models[key]
+
+
+def is_loaded(key):
+    """Check whether key has already been loaded in this process"""
+    return key in _models
+
+
+def clear(key=None):
+    """Drop one cached object (or all of them) so the next get() reloads it"""
+    with _registry_lock:
+        if key is None:
+            _models.clear()
+        else:
+            _models.pop(key, None)
+
+
+def _collect_metrics():
+    """Per-key load counts for /metrics"""
+    return [('model_loads_total', 'counter', 'Number of times each model was loaded',
+             [({'model': key}, count) for key, count in sorted(load_counts.items())])]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def _load_audio_model():
+    """Load the wav2vec2 processor and model with the configured embedding backend"""
+    backend = embedding_backends.configured_backend()
+    print(f"Loading audio model ({backend} backend)...")
+    try:
+        processor, model = embedding_backends.load_backend(AUDIO_MODEL_NAME, backend)
+        print("Loaded wav2vec2 model successfully")
+        return processor, model
+    except Exception as e:
+        print(f"Error loading wav2vec2 model: {e}")
+        print("Falling back to MFCC features")
+        return None, None
+
+
+def get_audio_model():
+    """Return the process-wide (processor, model) pair for wav2vec2"""
+    return get(f"audio_model:{AUDIO_MODEL_NAME}:{embedding_backends.configured_backend()}", _load_audio_model)
+
+
+def warm_up(predictors):
+    """Load every predictor's classifier (and wav2vec2 if needed) ahead of the first request"""
+    for predictor in predictors:
+        try:
+            predictor.warm_up()
+        except Exception as e:
+            print(f"Warning: Could not warm up {predictor.__name__}: {e}")
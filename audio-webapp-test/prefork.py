@@ -0,0 +1,105 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+
+DEFAULT_WORKERS = 2
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5001
+
+
+def serve(sock, app_module, host, port, index):
+    """Worker: start this process's threads and serve on the shared listening socket"""
+    from werkzeug.serving import make_server
+    # Pin before any thread starts so they all inherit this worker's CPUs (CPU_THREADS=...:pin)
+    import cpu_runtime
+    cpu_runtime.apply(worker_index=index)
+    app_module.start_background_workers()
+    server = make_server(host, port, app_module.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def spawn(sock, app_module, host, port, index):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            serve(sock, app_module, host, port, index)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the Flask app from pre-forked workers that share the parent's loaded models")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WORKERS", DEFAULT_WORKERS)),
+                        help="Number of worker processes")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Report import, model load and first-request times of the app and exit")
+    args = parser.parse_args()
+
+    if args.startup_profile:
+        import profiling
+        return 0 if profiling.startup_profile("app") else 1
+
+    # Load every model once in the parent, without starting any threads (they don't survive fork)
+    start = time.perf_counter()
+    os.environ['PREFORK_PARENT'] = '1'
+    # CPU_THREADS=auto divides the CPUs between this many workers
+    os.environ['WORKERS'] = str(max(1, args.workers))
+    os.environ['WARM_UP_MODELS'] = '1'
+    import app as app_module
+    print(f"Parent loaded the app and models in {time.perf_counter() - start:.2f}s")
+
+    # Keep the loaded objects out of the garbage collector so that collections in
+    # the workers don't write to (and so copy) the pages shared with the parent
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # pid -> worker index; a replacement takes over the index (and pinned CPUs) of the worker it replaces
+    workers = {spawn(sock, app_module, args.host, args.port, index): index for index in range(max(1, args.workers))}
+    print(f"Serving on http://{args.host}:{args.port} with {len(workers)} pre-forked workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Replace workers that die until asked to stop
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if not stopping and index is not None:
+            print(f"Worker {pid} exited with status {status}; starting a replacement")
+            workers[spawn(sock, app_module, args.host, args.port, index)] = index
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import metrics
+
+# Defaults, overridable through the environment
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# model_state() entry of a predictor whose model can't be loaded
+UNAVAILABLE = "unavailable"
+
+
+def content_digest(audio_bytes):
+    """Hash an upload's bytes as received (no decoding, so a hit skips the decode too)"""
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+def model_state(predictors):
+    """Feature type and routing table of every predictor, e.g. "covid=wav2vec2:v3@90,v4@10;age=unavailable"
+
+    Part of every key, so a deploy or A/B change stops serving results of
+    the versions it replaced. A predictor whose model can't be loaded is
+    UNAVAILABLE rather than an error: results missing that head are keyed
+    apart and stop being served once the model appears.
+    """
+    parts = []
+    for predictor in predictors:
+        try:
+            weights = predictor.get_manager().weights()
+            feature_type = predictor.get_feature_type()
+        except Exception:
+            parts.append(f"{predictor.PREDICTOR_NAME}={UNAVAILABLE}")
+            continue
+        routing = ",".join(f"{label}@{weight:g}" for label, weight in sorted(weights.items()))
+        parts.append(f"{predictor.PREDICTOR_NAME}={feature_type}:{routing}")
+    return ";".join(parts)
+
+
+def unavailable(state):
+    """Names of the predictors a model_state() string marks UNAVAILABLE"""
+    return {part.partition("=")[0] for part in state.split(";") if part.partition("=")[2] == UNAVAILABLE}
+
+
+def request_key(audio_bytes, mode, state):
+    """Key of one evaluation request: upload content, evaluation mode and model_state()"""
+    return hashlib.sha256(f"{content_digest(audio_bytes)}|{mode}|{state}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """TTL-bounded LRU of whole evaluation results with single-flight computation
+
+    get_or_compute() returns a stored result while it is fresh; otherwise
+    the first caller computes it and every identical request that arrives
+    meanwhile waits on that computation instead of starting its own. Only
+    results passing cacheable() are stored (failed or partial evaluations
+    are shared with the callers already waiting, then recomputed on the
+    next request). Callers get their own deep copy, so they may modify it.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, size, value), least recently used first
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return (result, outcome) where outcome is 'hit', 'coalesced' or 'miss'"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[2]), 'hit'
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return copy.deepcopy(future.result()), 'coalesced'
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if cacheable is None or cacheable(result):
+                self._store(key, copy.deepcopy(result))
+        future.set_result(result)
+        return result, 'miss'
+
+    def _store(self, key, value):
+        """Insert and evict least recently used entries past the limits (caller holds the lock)"""
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Lookup counters, evictions and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'in_flight': len(self._in_flight),
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_default_cache = None
+_configured = False
+_default_lock = threading.Lock()
+
+
+def configure(enabled=True, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+              max_bytes=DEFAULT_MAX_BYTES):
+    """Replace the process-wide result cache"""
+    global _default_cache, _configured
+    with _default_lock:
+        _default_cache = ResultCache(ttl_seconds, max_entries, max_bytes) if enabled else None
+        _configured = True
+        return _default_cache
+
+
+def get_cache():
+    """Return the process-wide result cache, creating it from the environment on first use
+
+    RESULT_CACHE=0 disables it; RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES
+    and RESULT_CACHE_MAX_BYTES bound it.
+    """
+    global _default_cache, _configured
+    if not _configured:
+        with _default_lock:
+            if not _configured and os.environ.get("RESULT_CACHE", "1") == "1":
+                _default_cache = ResultCache(
+                    ttl_seconds=float(os.environ.get("RESULT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                    max_entries=int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                )
+            _configured = True
+    return _default_cache
+
+
+def _collect_metrics():
+    """Lookup counters and size of the process-wide result cache for /metrics"""
+    if _default_cache is None:
+        return []
+    stats = _default_cache.stats()
+    return [
+        ('result_cache_lookups_total', 'counter', 'Evaluation result cache lookups by outcome',
+         [({'result': 'hit'}, stats['hits']), ({'result': 'coalesced'}, stats['coalesced']),
+          ({'result': 'miss'}, stats['misses'])]),
+        ('result_cache_hit_ratio', 'gauge', 'Fraction of evaluations answered without a new computation',
+         [({}, stats['hit_ratio'])]),
+        ('result_cache_evictions_total', 'counter', 'Result cache entries removed by reason',
+         [({'reason': 'expired'}, stats['expired']), ({'reason': 'size'}, stats['evictions'])]),
+        ('result_cache_entries', 'gauge', 'Results held', [({}, stats['entries'])]),
+        ('result_cache_bytes', 'gauge', 'Approximate size of the held results (JSON bytes)', [({}, stats['bytes'])]),
+        ('result_cache_in_flight', 'gauge', 'Evaluations being computed that identical requests can join',
+         [({}, stats['in_flight'])]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+
+import metrics
+
+# Analysis frames: 25 ms windows every 10 ms
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+
+# Frames quieter than this (dBFS) are digital silence and never set the noise floor
+SILENCE_DB = -80.0
+
+# The noise floor is this percentile of the audible frames' energies
+FLOOR_PERCENTILE = 10
+
+# A frame is active when it is TRIM_MARGIN_DB above the noise floor and within
+# TRIM_RANGE_DB of the loudest frame; quieter frames down to half the margin still
+# count when they are noise-like (a cough's decaying tail), i.e. their zero-crossing
+# rate is above TRIM_ZCR_THRESHOLD
+MARGIN_DB = float(os.environ.get("TRIM_MARGIN_DB", 10.0))
+RANGE_DB = float(os.environ.get("TRIM_RANGE_DB", 50.0))
+ZCR_THRESHOLD = float(os.environ.get("TRIM_ZCR_THRESHOLD", 0.25))
+
+# Active runs shorter than MIN_EVENT are clicks and dropped; the rest are padded by
+# TRIM_PAD_SECONDS on both sides and merged when less than MIN_GAP apart
+MIN_EVENT_SECONDS = 0.03
+MIN_GAP_SECONDS = 0.2
+PAD_SECONDS = float(os.environ.get("TRIM_PAD_SECONDS", 0.05))
+
+# Trimmed audio is never shorter than this (MFCC deltas need 9 frames of 512 samples);
+# shorter results are widened at both ends
+MIN_KEPT_SECONDS = 0.5
+
+
+def config_key():
+    """Every setting that changes what trim() keeps (part of the feature cache key)"""
+    return (f"trim=margin{MARGIN_DB:g}dB,range{RANGE_DB:g}dB,zcr{ZCR_THRESHOLD:g},"
+            f"pad{PAD_SECONDS:g}s,event{MIN_EVENT_SECONDS:g}s,gap{MIN_GAP_SECONDS:g}s,min{MIN_KEPT_SECONDS:g}s")
+
+
+def frame_features(y, sr):
+    """Per-frame energy (dBFS) and zero-crossing rate, from running sums in one pass over y"""
+    frame = int(FRAME_SECONDS * sr)
+    hop = int(HOP_SECONDS * sr)
+    starts = np.arange(0, len(y) - frame + 1, hop)
+
+    power = np.concatenate(([0.0], np.cumsum(np.square(y, dtype=np.float64))))
+    energy_db = 10 * np.log10((power[starts + frame] - power[starts]) / frame + 1e-12)
+
+    signs = np.signbit(y)
+    crossings = np.concatenate(([0], np.cumsum(signs[1:] != signs[:-1])))
+    zcr = (crossings[starts + frame - 1] - crossings[starts]) / (frame - 1)
+    return energy_db, zcr
+
+
+def _runs(mask):
+    """(starts, ends) of the runs of True in mask, ends exclusive"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
+
+def active_segments(y, sr):
+    """(start, end) sample ranges of the cough events in y, in order
+
+    Falls back to the whole clip when it is too short to frame or nothing
+    stands out from the noise floor, so callers never get empty audio.
+    """
+    frame = int(FRAME_SECONDS * sr)
+    hop = int(HOP_SECONDS * sr)
+    whole = [(0, len(y))]
+    if len(y) < frame:
+        return whole
+
+    energy_db, zcr = frame_features(y, sr)
+    audible = energy_db > SILENCE_DB
+    if not audible.any():
+        return whole
+    floor = np.percentile(energy_db[audible], FLOOR_PERCENTILE)
+    peak = energy_db.max()
+    if peak - floor < MARGIN_DB:
+        return whole
+
+    threshold = max(floor + MARGIN_DB, peak - RANGE_DB)
+    active = (energy_db > threshold) | ((energy_db > floor + MARGIN_DB / 2) & (zcr > ZCR_THRESHOLD))
+    starts, ends = _runs(active)
+    keep = ends - starts >= max(1, round(MIN_EVENT_SECONDS / HOP_SECONDS))
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return whole
+
+    pad = round(PAD_SECONDS / HOP_SECONDS)
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, len(energy_db))
+    split = np.flatnonzero(starts[1:] - ends[:-1] >= round(MIN_GAP_SECONDS / HOP_SECONDS))
+    starts = starts[np.concatenate(([0], split + 1))]
+    ends = ends[np.concatenate((split, [len(ends) - 1]))]
+
+    # Frame runs to samples; a run reaching the last frame keeps the tail that no frame covers
+    starts = starts * hop
+    ends = np.where(ends == len(energy_db), len(y), (ends - 1) * hop + frame)
+
+    missing = int(MIN_KEPT_SECONDS * sr) - int(np.sum(ends - starts))
+    if missing > 0:
+        # Grow the outer edges evenly; one side takes what the other can't (the clip ends there)
+        grow_start = min(int(starts[0]), missing // 2)
+        grow_end = min(len(y) - int(ends[-1]), missing - grow_start)
+        grow_start = min(int(starts[0]), missing - grow_end)
+        if grow_start + grow_end < missing:
+            return whole
+        starts[0] -= grow_start
+        ends[-1] += grow_end
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def trim(y, sr):
+    """y with everything outside active_segments() cut out"""
+    with metrics.span('trim'):
+        segments = active_segments(y, sr)
+        if segments == [(0, len(y))]:
+            return y
+        return np.concatenate([y[start:end] for start, end in segments])
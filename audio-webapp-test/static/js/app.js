@@ -19,6 +19,20 @@ document.addEventListener('DOMContentLoaded', function() {
     let timerInterval;
     let recordingSeconds = 0;
 
+    // Client feature mode: when the server's models take MFCC features, the page
+    // computes them itself and uploads ~120 numbers instead of the recording
+    const WORKER_PATH = '/static/js/recorderWorker.js';
+    let clientFeatures = false;
+    fetch('/api/features/config')
+        .then(response => response.ok ? response.json() : null)
+        .then(config => {
+            clientFeatures = Boolean(config && config.enabled && window.Worker &&
+                                     config.n_mfcc === 40 && config.sample_rate === 16000);
+        })
+        .catch(() => {
+            clientFeatures = false;
+        });
+
     // Initialize audio context
     function initAudio() {
         try {
@@ -128,6 +142,60 @@ document.addEventListener('DOMContentLoaded', function() {
         timerElement.textContent = `${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
     }
 
+    function showLoading() {
+        loadingContainer.classList.remove('d-none');
+        resultContainer.classList.add('d-none');
+    }
+
+    function showResult(text) {
+        loadingContainer.classList.add('d-none');
+        resultText.textContent = text;
+        resultContainer.classList.remove('d-none');
+    }
+
+    // Compute the MFCC summary in a worker; resolves with the /api/evaluate/features body
+    function computeFeatures() {
+        if (recorder && !(recorder instanceof MediaRecorder)) {
+            return new Promise((resolve, reject) => {
+                recorder.exportFeatures((payload, error) => error ? reject(error) : resolve(payload));
+            });
+        }
+        return audioBlob.arrayBuffer()
+            .then(data => audioContext.decodeAudioData(data))
+            .then(decoded => new Promise((resolve, reject) => {
+                const channels = [];
+                for (let channel = 0; channel < decoded.numberOfChannels; channel++) {
+                    channels.push(decoded.getChannelData(channel));
+                }
+                const worker = new Worker(WORKER_PATH);
+                worker.onmessage = function(e) {
+                    worker.terminate();
+                    if (e.data.command === 'features') {
+                        resolve(e.data.payload);
+                    } else {
+                        reject(new Error(e.data.error));
+                    }
+                };
+                worker.postMessage({ command: 'extractFeatures', channels: channels, sampleRate: decoded.sampleRate },
+                                   channels.map(channel => channel.buffer));
+            }));
+    }
+
+    // Evaluate the uploaded features; nothing is decoded on the server
+    function sendFeaturesToServer(payload) {
+        return fetch('/api/evaluate/features', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        })
+        .then(response => response.json().then(data => {
+            if (!response.ok) {
+                throw new Error(data.error || 'Server error: ' + response.status);
+            }
+            return data;
+        }));
+    }
+
     // Send audio to server
     function sendAudioToServer() {
         if (!audioBlob) {
@@ -135,43 +203,89 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
-        // Show loading indicator
-        loadingContainer.classList.remove('d-none');
-        resultContainer.classList.add('d-none');
-        
+        showLoading();
+
+        if (clientFeatures) {
+            computeFeatures()
+                .then(sendFeaturesToServer)
+                .then(data => showResult(data.result))
+                .catch(error => {
+                    // Anything unexpected (decode support, model mismatch): upload the audio instead
+                    console.warn('Client feature mode failed, uploading audio', error);
+                    uploadAudio();
+                });
+        } else {
+            uploadAudio();
+        }
+    }
+
+    function uploadAudio() {
         // Create form data
         const formData = new FormData();
         formData.append('audio', audioBlob, 'recording.mp3');
         
-        // Send to server
-        fetch('/api/evaluate', {
+        // Queue the evaluation; the server answers straight away with a job id
+        fetch('/api/jobs', {
             method: 'POST',
             body: formData
         })
         .then(response => {
+            if (response.status === 429) {
+                throw new Error('Server is busy, please try again in a moment');
+            }
             if (!response.ok) {
                 throw new Error('Server error: ' + response.status);
             }
             return response.json();
         })
-        .then(data => {
-            // Hide loading indicator
-            loadingContainer.classList.add('d-none');
-            
-            // Show result
-            resultText.textContent = data.result;
-            resultContainer.classList.remove('d-none');
-        })
-        .catch(error => {
-            // Hide loading indicator
-            loadingContainer.classList.add('d-none');
-            
-            // Show error
-            resultText.textContent = 'Error: ' + error.message;
-            resultContainer.classList.remove('d-none');
+        .then(job => waitForJob(job))
+        .then(data => showResult(data.result))
+        .catch(error => showResult('Error: ' + error.message));
+    }
+
+    // Resolve with the evaluation once the job finishes (server-sent events, polling as a fallback)
+    function waitForJob(job) {
+        if (!window.EventSource) {
+            return pollJob(job.status_url);
+        }
+        return new Promise((resolve, reject) => {
+            const events = new EventSource(job.events_url);
+            events.addEventListener('done', function(e) {
+                events.close();
+                resolve(JSON.parse(e.data).result);
+            });
+            events.addEventListener('error', function(e) {
+                events.close();
+                // A connection error has no data; fall back to polling
+                if (!e.data) {
+                    pollJob(job.status_url).then(resolve, reject);
+                    return;
+                }
+                reject(new Error(JSON.parse(e.data).error));
+            });
         });
     }
 
+    // Poll the job status until it is done or failed
+    function pollJob(statusUrl) {
+        return fetch(statusUrl)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Server error: ' + response.status);
+                }
+                return response.json();
+            })
+            .then(job => {
+                if (job.status === 'done') {
+                    return job.result;
+                }
+                if (job.status === 'error') {
+                    throw new Error(job.error);
+                }
+                return new Promise(resolve => setTimeout(resolve, 1000)).then(() => pollJob(statusUrl));
+            });
+    }
+
     // Event listeners
     recordButton.addEventListener('click', function() {
         if (recorder && (recorder.state === 'recording' || recorder.recording)) {
@@ -0,0 +1,442 @@
+/**
+ * Browser-side port of mfcc_numpy.extract_mfcc_summary().
+ *
+ * Turns a recording into the 120-value mean MFCC / delta / delta-delta
+ * summary that feature_pipeline computes for the 'mfcc' feature type, so
+ * the page can upload the features instead of the audio. The constants
+ * below must match mfcc_numpy.py and feature_pipeline.py; the server
+ * checks them (GET /api/features/config) before the page uses this mode.
+ * Loaded with importScripts() by static/js/recorderWorker.js (Flask app) and
+ * public/featureWorker.js (Next.js app), and with require() by the parity
+ * check in audio-webapp-test/benchmarks/bench_client_features.py.
+ */
+(function(root) {
+  'use strict';
+
+  const SAMPLE_RATE = 16000;
+  const N_MFCC = 40;
+  const N_FFT = 2048;
+  const HOP_LENGTH = 512;
+  const N_MELS = 128;
+  const TOP_DB = 80.0;
+  const AMIN = 1e-10;
+  const DELTA_WIDTH = 9;
+
+  // Kaiser-windowed sinc low-pass used for resampling (resampy's kaiser_best window); the
+  // rolloff is tuned so the top mel bands match librosa's default soxr_hq resampler
+  const RESAMPLE_ZEROS = 64;
+  const RESAMPLE_ROLLOFF = 0.955;
+  const RESAMPLE_BETA = 14.769656459379492;
+  const RESAMPLE_PRECISION = 512;
+
+  // Tables are built once per configuration and reused, as in mfcc_numpy
+  const cache = {};
+
+  function cached(key, build) {
+    if (!(key in cache)) {
+      cache[key] = build();
+    }
+    return cache[key];
+  }
+
+  /** Average the channels into one, as librosa.to_mono() does */
+  function toMono(channels) {
+    if (channels.length === 1) {
+      return Float32Array.from(channels[0]);
+    }
+    const length = channels[0].length;
+    const mono = new Float32Array(length);
+    for (let channel = 0; channel < channels.length; channel++) {
+      const data = channels[channel];
+      for (let i = 0; i < length; i++) {
+        mono[i] += data[i];
+      }
+    }
+    for (let i = 0; i < length; i++) {
+      mono[i] /= channels.length;
+    }
+    return mono;
+  }
+
+  // Zeroth-order modified Bessel function of the first kind (for the Kaiser window)
+  function besselI0(x) {
+    let sum = 1;
+    let term = 1;
+    for (let k = 1; k < 64; k++) {
+      term *= (x / (2 * k)) * (x / (2 * k));
+      sum += term;
+      if (term < sum * 1e-17) {
+        break;
+      }
+    }
+    return sum;
+  }
+
+  // One side of the windowed sinc, sampled RESAMPLE_PRECISION times per zero crossing
+  function resampleFilter() {
+    return cached('resample-filter', () => {
+      const length = RESAMPLE_ZEROS * RESAMPLE_PRECISION + 1;
+      const filter = new Float64Array(length);
+      const norm = besselI0(RESAMPLE_BETA);
+      for (let i = 0; i < length; i++) {
+        const x = i / RESAMPLE_PRECISION;
+        const sinc = i === 0 ? 1 : Math.sin(Math.PI * x * RESAMPLE_ROLLOFF) / (Math.PI * x * RESAMPLE_ROLLOFF);
+        const ratio = (i / (length - 1));
+        const window = besselI0(RESAMPLE_BETA * Math.sqrt(Math.max(0, 1 - ratio * ratio))) / norm;
+        filter[i] = RESAMPLE_ROLLOFF * sinc * window;
+      }
+      return filter;
+    });
+  }
+
+  /** Band-limited resampling to targetRate; the output has ceil(length * ratio) samples */
+  function resample(samples, sourceRate, targetRate) {
+    targetRate = targetRate || SAMPLE_RATE;
+    if (sourceRate === targetRate) {
+      return Float32Array.from(samples);
+    }
+    const ratio = targetRate / sourceRate;
+    const filter = resampleFilter();
+    const scale = Math.min(1, ratio);
+    // Filter taps per input sample: the sinc is stretched when downsampling
+    const step = scale * RESAMPLE_PRECISION;
+    const halfWidth = RESAMPLE_ZEROS / scale;
+    const output = new Float32Array(Math.ceil(samples.length * ratio));
+
+    for (let n = 0; n < output.length; n++) {
+      const time = n / ratio;
+      const first = Math.max(0, Math.ceil(time - halfWidth));
+      const last = Math.min(samples.length - 1, Math.floor(time + halfWidth));
+      let sum = 0;
+      for (let i = first; i <= last; i++) {
+        const position = Math.abs(time - i) * step;
+        const index = Math.floor(position);
+        if (index + 1 >= filter.length) {
+          continue;
+        }
+        const fraction = position - index;
+        sum += samples[i] * (filter[index] + fraction * (filter[index + 1] - filter[index]));
+      }
+      output[n] = scale * sum;
+    }
+    return output;
+  }
+
+  // Slaney mel scale (linear below 1 kHz, logarithmic above), as in librosa
+  function hzToMel(frequency) {
+    const fSp = 200.0 / 3;
+    const minLogHz = 1000.0;
+    const minLogMel = minLogHz / fSp;
+    const logStep = Math.log(6.4) / 27.0;
+    return frequency >= minLogHz ? minLogMel + Math.log(frequency / minLogHz) / logStep : frequency / fSp;
+  }
+
+  function melToHz(mel) {
+    const fSp = 200.0 / 3;
+    const minLogHz = 1000.0;
+    const minLogMel = minLogHz / fSp;
+    const logStep = Math.log(6.4) / 27.0;
+    return mel >= minLogMel ? minLogHz * Math.exp(logStep * (mel - minLogMel)) : fSp * mel;
+  }
+
+  // Slaney-normalised triangular filters, kept as (first bin, weights) to skip the zeros
+  function melFilterbank(sampleRate) {
+    return cached(`mel-${sampleRate}`, () => {
+      const nBins = 1 + N_FFT / 2;
+      const minMel = hzToMel(0);
+      const maxMel = hzToMel(sampleRate / 2);
+      const melF = [];
+      for (let i = 0; i < N_MELS + 2; i++) {
+        melF.push(melToHz(minMel + (maxMel - minMel) * i / (N_MELS + 1)));
+      }
+      const filters = [];
+      for (let m = 0; m < N_MELS; m++) {
+        const norm = 2.0 / (melF[m + 2] - melF[m]);
+        const weights = new Float64Array(nBins);
+        let first = nBins;
+        let last = -1;
+        for (let bin = 0; bin < nBins; bin++) {
+          const frequency = bin * sampleRate / N_FFT;
+          const lower = (frequency - melF[m]) / (melF[m + 1] - melF[m]);
+          const upper = (melF[m + 2] - frequency) / (melF[m + 2] - melF[m + 1]);
+          weights[bin] = Math.max(0, Math.min(lower, upper)) * norm;
+          if (weights[bin] > 0) {
+            first = Math.min(first, bin);
+            last = bin;
+          }
+        }
+        filters.push(last < 0 ? { first: 0, weights: new Float64Array(0) }
+                              : { first, weights: weights.slice(first, last + 1) });
+      }
+      return filters;
+    });
+  }
+
+  // Periodic Hann window
+  function hannWindow() {
+    return cached('hann', () => {
+      const window = new Float64Array(N_FFT);
+      for (let i = 0; i < N_FFT; i++) {
+        window[i] = 0.5 - 0.5 * Math.cos(2 * Math.PI * i / N_FFT);
+      }
+      return window;
+    });
+  }
+
+  // Bit-reversal permutation and twiddle factors of the radix-2 FFT
+  function fftTables() {
+    return cached('fft', () => {
+      const bits = Math.log2(N_FFT);
+      const reversed = new Uint32Array(N_FFT);
+      for (let i = 0; i < N_FFT; i++) {
+        let r = 0;
+        for (let b = 0; b < bits; b++) {
+          r = (r << 1) | ((i >> b) & 1);
+        }
+        reversed[i] = r;
+      }
+      const cos = new Float64Array(N_FFT / 2);
+      const sin = new Float64Array(N_FFT / 2);
+      for (let i = 0; i < N_FFT / 2; i++) {
+        cos[i] = Math.cos(2 * Math.PI * i / N_FFT);
+        sin[i] = -Math.sin(2 * Math.PI * i / N_FFT);
+      }
+      return { reversed, cos, sin };
+    });
+  }
+
+  // In-place iterative radix-2 FFT of N_FFT points
+  function fft(re, im) {
+    const { reversed, cos, sin } = fftTables();
+    for (let i = 0; i < N_FFT; i++) {
+      const j = reversed[i];
+      if (j > i) {
+        let t = re[i]; re[i] = re[j]; re[j] = t;
+        t = im[i]; im[i] = im[j]; im[j] = t;
+      }
+    }
+    for (let size = 2; size <= N_FFT; size <<= 1) {
+      const half = size >> 1;
+      const stride = N_FFT / size;
+      for (let start = 0; start < N_FFT; start += size) {
+        for (let k = 0; k < half; k++) {
+          const wr = cos[k * stride];
+          const wi = sin[k * stride];
+          const a = start + k;
+          const b = a + half;
+          const tr = re[b] * wr - im[b] * wi;
+          const ti = re[b] * wi + im[b] * wr;
+          re[b] = re[a] - tr;
+          im[b] = im[a] - ti;
+          re[a] += tr;
+          im[a] += ti;
+        }
+      }
+    }
+  }
+
+  // Orthonormal DCT-II basis, (N_MFCC, N_MELS) row-major
+  function dctMatrix() {
+    return cached('dct', () => {
+      const basis = new Float64Array(N_MFCC * N_MELS);
+      for (let k = 0; k < N_MFCC; k++) {
+        for (let n = 0; n < N_MELS; n++) {
+          let value = Math.cos(Math.PI * k * (2 * n + 1) / (2 * N_MELS)) * Math.sqrt(2 / N_MELS);
+          if (k === 0) {
+            value /= Math.sqrt(2);
+          }
+          basis[k * N_MELS + n] = value;
+        }
+      }
+      return basis;
+    });
+  }
+
+  /** MFCC matrix as N_MFCC arrays of frame values, matching librosa.feature.mfcc defaults */
+  function mfcc(samples, sampleRate) {
+    const pad = N_FFT / 2;
+    const padded = new Float64Array(samples.length + 2 * pad);
+    padded.set(samples, pad);
+    const nFrames = 1 + Math.floor((padded.length - N_FFT) / HOP_LENGTH);
+
+    const filters = melFilterbank(sampleRate);
+    const window = hannWindow();
+    const re = new Float64Array(N_FFT);
+    const im = new Float64Array(N_FFT);
+    const power = new Float64Array(1 + N_FFT / 2);
+    const logMel = new Float64Array(N_MELS * nFrames);
+    let maxDb = -Infinity;
+
+    for (let frame = 0; frame < nFrames; frame++) {
+      const offset = frame * HOP_LENGTH;
+      for (let i = 0; i < N_FFT; i++) {
+        re[i] = padded[offset + i] * window[i];
+        im[i] = 0;
+      }
+      fft(re, im);
+      for (let bin = 0; bin < power.length; bin++) {
+        power[bin] = re[bin] * re[bin] + im[bin] * im[bin];
+      }
+      for (let m = 0; m < N_MELS; m++) {
+        const { first, weights } = filters[m];
+        let energy = 0;
+        for (let i = 0; i < weights.length; i++) {
+          energy += weights[i] * power[first + i];
+        }
+        const db = 10 * Math.log10(Math.max(AMIN, energy));
+        logMel[m * nFrames + frame] = db;
+        maxDb = Math.max(maxDb, db);
+      }
+    }
+
+    const floor = maxDb - TOP_DB;
+    for (let i = 0; i < logMel.length; i++) {
+      logMel[i] = Math.max(logMel[i], floor);
+    }
+
+    const basis = dctMatrix();
+    const coefficients = [];
+    for (let k = 0; k < N_MFCC; k++) {
+      const row = new Float64Array(nFrames);
+      for (let m = 0; m < N_MELS; m++) {
+        const weight = basis[k * N_MELS + m];
+        const band = m * nFrames;
+        for (let frame = 0; frame < nFrames; frame++) {
+          row[frame] += weight * logMel[band + frame];
+        }
+      }
+      coefficients.push(row);
+    }
+    return coefficients;
+  }
+
+  // Savitzky-Golay weights for the order-th derivative: row `order` of pinv(Vandermonde) * order!
+  function savgolCoefficients(order) {
+    return cached(`savgol-${order}`, () => {
+      const half = Math.floor(DELTA_WIDTH / 2);
+      const size = order + 1;
+      // Normal equations (V^T V) c = V^T e_j, solved once by Gauss-Jordan elimination
+      const gram = [];
+      for (let r = 0; r < size; r++) {
+        gram.push([]);
+        for (let c = 0; c < size; c++) {
+          let sum = 0;
+          for (let x = -half; x <= half; x++) {
+            sum += Math.pow(x, r + c);
+          }
+          gram[r].push(sum);
+        }
+        for (let c = 0; c < size; c++) {
+          gram[r].push(r === c ? 1 : 0);
+        }
+      }
+      for (let col = 0; col < size; col++) {
+        const pivot = gram[col][col];
+        for (let c = 0; c < 2 * size; c++) {
+          gram[col][c] /= pivot;
+        }
+        for (let r = 0; r < size; r++) {
+          if (r !== col) {
+            const factor = gram[r][col];
+            for (let c = 0; c < 2 * size; c++) {
+              gram[r][c] -= factor * gram[col][c];
+            }
+          }
+        }
+      }
+      let factorial = 1;
+      for (let i = 2; i <= order; i++) {
+        factorial *= i;
+      }
+      const weights = new Float64Array(DELTA_WIDTH);
+      for (let x = -half; x <= half; x++) {
+        let sum = 0;
+        for (let c = 0; c < size; c++) {
+          sum += gram[order][size + c] * Math.pow(x, c);
+        }
+        weights[x + half] = sum * factorial;
+      }
+      return weights;
+    });
+  }
+
+  // Mean over time of librosa.feature.delta(row, order) (edge-repeated full-window values)
+  function deltaMean(row, order) {
+    if (row.length < DELTA_WIDTH) {
+      throw new Error(`Need at least ${DELTA_WIDTH} frames to compute deltas, got ${row.length}`);
+    }
+    const weights = savgolCoefficients(order);
+    const half = Math.floor(DELTA_WIDTH / 2);
+    const valid = row.length - DELTA_WIDTH + 1;
+    let sum = 0;
+    let firstValue = 0;
+    let lastValue = 0;
+    for (let start = 0; start < valid; start++) {
+      let value = 0;
+      for (let i = 0; i < DELTA_WIDTH; i++) {
+        value += weights[i] * row[start + i];
+      }
+      if (start === 0) {
+        firstValue = value;
+      }
+      lastValue = value;
+      sum += value;
+    }
+    return (sum + half * (firstValue + lastValue)) / row.length;
+  }
+
+  function mean(row) {
+    let sum = 0;
+    for (let i = 0; i < row.length; i++) {
+      sum += row[i];
+    }
+    return sum / row.length;
+  }
+
+  /** 3 * N_MFCC summary (mean MFCC, delta, delta-delta) of samples already at sampleRate */
+  function extractMfccSummary(samples, sampleRate) {
+    const coefficients = mfcc(samples, sampleRate || SAMPLE_RATE);
+    const summary = new Float32Array(3 * N_MFCC);
+    for (let k = 0; k < N_MFCC; k++) {
+      summary[k] = mean(coefficients[k]);
+      summary[N_MFCC + k] = deltaMean(coefficients[k], 1);
+      summary[2 * N_MFCC + k] = deltaMean(coefficients[k], 2);
+    }
+    return summary;
+  }
+
+  /**
+   * Channels at sourceRate -> the request body for /api/evaluate/features:
+   * downmixed, resampled to SAMPLE_RATE and summarised
+   */
+  function extractFeatures(channels, sourceRate) {
+    const samples = resample(toMono(channels), sourceRate, SAMPLE_RATE);
+    return {
+      feature_type: 'mfcc',
+      n_mfcc: N_MFCC,
+      sample_rate: SAMPLE_RATE,
+      seconds: samples.length / SAMPLE_RATE,
+      features: Array.from(extractMfccSummary(samples, SAMPLE_RATE)),
+    };
+  }
+
+  const api = {
+    SAMPLE_RATE,
+    N_MFCC,
+    N_FFT,
+    HOP_LENGTH,
+    N_MELS,
+    TOP_DB,
+    toMono,
+    resample,
+    mfcc,
+    extractMfccSummary,
+    extractFeatures,
+  };
+
+  if (typeof module !== 'undefined' && module.exports) {
+    module.exports = api;
+  } else {
+    root.CoughFeatures = api;
+  }
+})(typeof self !== 'undefined' ? self : this);
@@ -18,7 +18,8 @@
       this.callbacks = {
         getBuffer: [],
         exportWAV: [],
-        exportMP3: []
+        exportMP3: [],
+        exportFeatures: []
       };
       
       this.context = source.context;
@@ -31,8 +32,14 @@
       this.worker = new Worker(WORKER_PATH);
       
       this.worker.onmessage = (e) => {
-        const blob = e.data;
-        this._fireCallbacks('exportMP3', [blob]);
+        if (e.data && e.data.command === 'features') {
+          this._fireCallbacks('exportFeatures', [e.data.payload, null]);
+        } else if (e.data && e.data.command === 'featuresError') {
+          this._fireCallbacks('exportFeatures', [null, new Error(e.data.error)]);
+        } else {
+          const blob = e.data;
+          this._fireCallbacks('exportMP3', [blob]);
+        }
       };
       
       this.worker.postMessage({
@@ -78,6 +85,15 @@
       });
     }
     
+    // Callback gets (payload for /api/evaluate/features, error)
+    exportFeatures(cb) {
+      cb = cb || this.config.callback;
+      if (!cb) return;
+      
+      this.callbacks.exportFeatures.push(cb);
+      this.worker.postMessage({ command: 'exportFeatures' });
+    }
+    
     configure(cfg) {
       for (const prop in cfg) {
         if (cfg.hasOwnProperty(prop)) {
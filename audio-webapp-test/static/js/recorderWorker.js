@@ -1,5 +1,8 @@
 'use strict';
 
+// CoughFeatures: the browser-side MFCC summary (client feature mode)
+importScripts('featureExtractor.js');
+
 let recLength = 0;
 let recBuffers = [];
 let sampleRate;
@@ -19,6 +22,12 @@ self.onmessage = function(e) {
     case 'getBuffer':
       getBuffer();
       break;
+    case 'exportFeatures':
+      exportFeatures();
+      break;
+    case 'extractFeatures':
+      extractFeatures(e.data.channels, e.data.sampleRate);
+      break;
     case 'clear':
       clear();
       break;
@@ -50,6 +59,24 @@ function exportMP3() {
   self.postMessage(audioBlob);
 }
 
+// Features of the recorded buffers, downsampled to 16 kHz mono
+function exportFeatures() {
+  let buffers = [];
+  for (let channel = 0; channel < numChannels; channel++) {
+    buffers.push(mergeBuffers(recBuffers[channel], recLength));
+  }
+  extractFeatures(buffers, sampleRate);
+}
+
+// Features of already decoded audio (e.g. a MediaRecorder blob decoded on the page)
+function extractFeatures(channels, rate) {
+  try {
+    self.postMessage({ command: 'features', payload: CoughFeatures.extractFeatures(channels, rate) });
+  } catch (error) {
+    self.postMessage({ command: 'featuresError', error: error.message });
+  }
+}
+
 function getBuffer() {
   let buffers = [];
   for (let channel = 0; channel < numChannels; channel++) {
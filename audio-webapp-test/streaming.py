@@ -0,0 +1,170 @@
+import numpy as np
+import soundfile as sf
+
+import audio_ingest
+import feature_pipeline
+
+# Default analysis window and overlap
+DEFAULT_WINDOW_SECONDS = 5.0
+DEFAULT_OVERLAP_SECONDS = 1.0
+
+# A trailing window shorter than this is merged into the one before it (too few frames for MFCC deltas)
+MIN_WINDOW_SECONDS = 0.5
+
+
+class RunningMean:
+    """Weighted running mean of feature vectors, kept in constant memory"""
+
+    def __init__(self):
+        self.total = None
+        self.weight = 0.0
+
+    def add(self, vector, weight):
+        vector = np.asarray(vector, dtype=np.float64)
+        if self.total is None:
+            self.total = np.zeros_like(vector)
+        self.total += vector * weight
+        self.weight += weight
+
+    def value(self):
+        if self.total is None or self.weight == 0:
+            return None
+        return self.total / self.weight
+
+
+def iter_windows(audio_path, window_seconds=DEFAULT_WINDOW_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                 sample_rate=feature_pipeline.TARGET_SAMPLE_RATE):
+    """Yield (start_seconds, mono float32 window at sample_rate) without reading the whole file
+
+    audio_path may also be raw bytes or a file-like object. Formats libsndfile
+    can't stream (e.g. webm from the browser recorder) are decoded in full and
+    then sliced, so they still work but don't get the memory bound.
+    """
+    if overlap_seconds >= window_seconds:
+        raise ValueError("overlap_seconds must be smaller than window_seconds")
+
+    source = feature_pipeline.as_audio_source(audio_path)
+    try:
+        info = sf.info(source)
+    except Exception:
+        info = None
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+    if info is None:
+        y, sr = feature_pipeline.load_audio(source, sample_rate)
+        window = int(window_seconds * sr)
+        hop = window - int(overlap_seconds * sr)
+        for start in range(0, max(len(y) - int(overlap_seconds * sr), 1), hop):
+            yield start / sr, y[start:start + window]
+        return
+
+    orig_sr = info.samplerate
+    window = int(window_seconds * orig_sr)
+    overlap = int(overlap_seconds * orig_sr)
+    hop = window - overlap
+    blocks = sf.blocks(source, blocksize=window, overlap=overlap, dtype='float32', always_2d=True)
+    for index, block in enumerate(blocks):
+        # Downmix before resampling so we only resample one channel
+        yield index * hop / orig_sr, audio_ingest.resample(audio_ingest.downmix(block), orig_sr, sample_rate)
+
+
+def merge_short_tail(windows, min_samples, sample_rate):
+    """Fold a last window shorter than min_samples into the window before it
+
+    Only the last window can be short, so this holds back one window at a
+    time. A recording shorter than min_samples is still one window.
+    """
+    previous = None
+    for start, y in windows:
+        if len(y) == 0:
+            continue
+        if previous is not None and len(y) < min_samples:
+            previous_start, previous_y = previous
+            # Append only the samples the previous window doesn't already cover
+            covered = len(previous_y) - int(round((start - previous_start) * sample_rate))
+            previous = (previous_start, np.concatenate([previous_y, y[max(covered, 0):]]))
+            continue
+        if previous is not None:
+            yield previous
+        previous = (start, y)
+    if previous is not None:
+        yield previous
+
+
+def run_predictors_streaming(audio_path, predictors, window_seconds=DEFAULT_WINDOW_SECONDS,
+                             overlap_seconds=DEFAULT_OVERLAP_SECONDS):
+    """Score a recording window by window with bounded memory
+
+    Each window's features are scored by every predictor and folded into a
+    running mean; the clip-level prediction is made from that mean. Windows
+    overlap, so each one is weighted by the audio it adds (from its start to
+    the next window's, or to the end for the last one) rather than by its
+    length. Returns {'clip': {name: result}, 'windows': [...], 'errors': {name: message}},
+    where every window entry has 'start', 'end' and one result per
+    predictor. A head whose model or features fail is left out from then
+    on (None in 'clip' and the later windows) with its error in 'errors',
+    and the other heads carry on.
+    """
+    sr = feature_pipeline.TARGET_SAMPLE_RATE
+    feature_types = {}
+    errors = {}
+
+    def fail(name, error):
+        print(f"{name} head failed: {error}")
+        errors[name] = str(error)
+        feature_types.pop(name, None)
+        # Stop extracting features no remaining head needs
+        for feature_type in set(running) - set(feature_types.values()):
+            del running[feature_type]
+
+    running = {}
+    for predictor in predictors:
+        try:
+            feature_types[predictor.PREDICTOR_NAME] = predictor.get_feature_type()
+        except Exception as e:
+            fail(predictor.PREDICTOR_NAME, e)
+    running.update((feature_type, RunningMean()) for feature_type in set(feature_types.values()))
+
+    def fold(features, weight):
+        for feature_type, vector in features.items():
+            if feature_type in running:
+                running[feature_type].add(vector, weight)
+
+    def predict(predictor, features):
+        """One head's result on a feature vector, or None once it has failed"""
+        name = predictor.PREDICTOR_NAME
+        if name not in feature_types or feature_types[name] not in features:
+            return None
+        try:
+            return predictor.predict_from_features(features[feature_types[name]])
+        except Exception as e:
+            fail(name, e)
+            return None
+
+    windows = []
+    # The previous window's (start, end, features), weighted once the next start is known
+    pending = None
+    for start, y in merge_short_tail(iter_windows(audio_path, window_seconds, overlap_seconds, sr),
+                                     int(MIN_WINDOW_SECONDS * sr), sr):
+        features = {}
+        for feature_type in list(running):
+            try:
+                features[feature_type] = feature_pipeline.extract(y, sr, feature_type)
+            except Exception as e:
+                for name in [name for name, used in feature_types.items() if used == feature_type]:
+                    fail(name, e)
+        if pending is not None:
+            fold(pending[2], start - pending[0])
+        pending = (start, start + len(y) / sr, features)
+
+        window_result = {'start': round(start, 3), 'end': round(start + len(y) / sr, 3)}
+        for predictor in predictors:
+            window_result[predictor.PREDICTOR_NAME] = predict(predictor, features)
+        windows.append(window_result)
+    if pending is not None:
+        fold(pending[2], pending[1] - pending[0])
+
+    pooled = {feature_type: mean.value() for feature_type, mean in running.items() if mean.weight > 0}
+    clip = {predictor.PREDICTOR_NAME: predict(predictor, pooled) for predictor in predictors}
+    return {'clip': clip, 'windows': windows, 'errors': errors}
@@ -0,0 +1,38 @@
+import pytest
+
+import batch_score
+
+
+def _result(prediction, confidence, age):
+    return {batch_score.predict_covid.PREDICTOR_NAME: {'prediction': prediction, 'confidence': confidence},
+            batch_score.predict_age.PREDICTOR_NAME: {'age': age}}
+
+
+def _rows():
+    return [
+        batch_score._row('ok.wav', _result('negative', 0.9, 40)),
+        batch_score._row('broken.wav', None, error='Could not decode'),
+    ]
+
+
+def test_csv_resume_retries_failed_rows(tmp_path):
+    output = str(tmp_path / "scores.csv")
+    writer = batch_score.CsvResultWriter(output)
+    writer.write(_rows())
+    writer.close()
+    assert batch_score.CsvResultWriter.completed_paths(output) == {'ok.wav'}
+
+    # The retry appends a second row; one success is enough to count the path as done
+    writer = batch_score.CsvResultWriter(output)
+    writer.write([batch_score._row('broken.wav', _result('positive', 0.7, 30))])
+    writer.close()
+    assert batch_score.CsvResultWriter.completed_paths(output) == {'ok.wav', 'broken.wav'}
+
+
+def test_parquet_resume_retries_failed_rows(tmp_path):
+    pytest.importorskip("pyarrow")
+    output = str(tmp_path / "scores.parquet")
+    writer = batch_score.ParquetResultWriter(output)
+    writer.write(_rows())
+    writer.close()
+    assert batch_score.ParquetResultWriter.completed_paths(output) == {'ok.wav'}
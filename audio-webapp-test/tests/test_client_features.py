@@ -0,0 +1,63 @@
+import os
+import sys
+import shutil
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import feature_pipeline
+from bench_client_features import client_features, client_resample, server_resample, resample_snr_db
+from synthetic import synthetic_recording
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="needs node to run featureExtractor.js")
+
+# (seconds, sample rate, channels); everything but 16 kHz goes through the client's own resampler
+CASES = [
+    (1.0, 16000, 1),
+    (2.0, 16000, 2),
+    (1.0, 44100, 1),
+    (1.5, 48000, 2),
+    (1.0, 8000, 1),
+]
+
+# Given the same 16 kHz waveform, the JS MFCC code agrees with librosa to float32 rounding
+# (~3e-5 on coefficients of up to a few hundred), so anything above this is a real mismatch
+FEATURE_ATOL = 1e-3
+
+# The client's Kaiser-sinc resampler and the server's differ only near the 8 kHz band edge:
+# 29-34 dB on these broadband coughs, where being one sample late gives ~2 dB and a 10% gain error ~20 dB
+MIN_RESAMPLE_SNR_DB = 25.0
+
+
+@pytest.fixture(scope="module")
+def recordings():
+    return [(synthetic_recording(seconds, sample_rate, channels, seed=index), sample_rate)
+            for index, (seconds, sample_rate, channels) in enumerate(CASES)]
+
+
+def test_client_features_match_server_features(recordings):
+    payloads = client_features(recordings)
+    resampled = client_resample(recordings)
+    assert len(payloads) == len(resampled) == len(CASES)
+    config = feature_pipeline.client_feature_config()
+    for case, payload, samples in zip(CASES, payloads, resampled):
+        # The payload is exactly what /api/evaluate/features accepts
+        client = feature_pipeline.parse_client_features({key: value for key, value in payload.items() if key != "ms"})
+        assert client.shape == (config["width"],)
+        # Compared on the client's own 16 kHz waveform so that resampling differences can't mask
+        # a mismatch in the feature code; the resampler is checked on its own below
+        reference = feature_pipeline.extract_mfcc(samples, feature_pipeline.TARGET_SAMPLE_RATE)
+        np.testing.assert_allclose(client, reference, rtol=0, atol=FEATURE_ATOL, err_msg=f"case {case}")
+
+
+def test_client_resampler_matches_server_decode(recordings):
+    for case, (recording, sample_rate), samples in zip(CASES, recordings, client_resample(recordings)):
+        reference = server_resample(recording, sample_rate)
+        assert len(samples) == len(reference), case
+        if sample_rate == feature_pipeline.TARGET_SAMPLE_RATE:
+            # Only the downmix, which must be exact
+            np.testing.assert_allclose(samples, reference, rtol=0, atol=1e-6, err_msg=f"case {case}")
+        else:
+            assert resample_snr_db(reference, samples) >= MIN_RESAMPLE_SNR_DB, case
@@ -0,0 +1,54 @@
+import os
+import stat
+
+import numpy as np
+import pytest
+
+import feature_cache
+
+
+def test_write_failure_does_not_fail_the_caller(tmp_path, monkeypatch):
+    cache = feature_cache.FeatureCache(cache_dir=str(tmp_path))
+
+    def no_space(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(np, "save", no_space)
+    features = cache.get_or_compute("ab" + "0" * 62, lambda: np.ones(3))
+    np.testing.assert_array_equal(features, np.ones(3))
+    assert cache.stats()['write_errors'] == 1
+    # The temporary file is cleaned up and the vector is still served from memory
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files]
+    np.testing.assert_array_equal(cache.get("ab" + "0" * 62), np.ones(3))
+
+
+@pytest.mark.skipif(os.name != "posix" or os.geteuid() == 0, reason="needs a non-root POSIX user")
+def test_read_only_cache_dir(tmp_path):
+    cache = feature_cache.FeatureCache(cache_dir=str(tmp_path))
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        np.testing.assert_array_equal(cache.get_or_compute("cd" + "0" * 62, lambda: np.zeros(2)), np.zeros(2))
+        assert cache.stats()['write_errors'] == 1
+    finally:
+        os.chmod(tmp_path, stat.S_IRWXU)
+
+
+def test_limit_covers_files_written_by_other_processes(tmp_path, monkeypatch):
+    vector = np.zeros(100)
+    probe = feature_cache.FeatureCache(cache_dir=str(tmp_path / "probe"))
+    probe.put("00" + "0" * 62, vector)
+    entry_bytes = probe.stats()['disk_bytes']
+
+    shared = tmp_path / "shared"
+    cache = feature_cache.FeatureCache(cache_dir=str(shared), max_disk_bytes=10 * entry_bytes)
+    # Another process sharing the directory fills it past the limit after this one started
+    other = feature_cache.FeatureCache(cache_dir=str(shared), max_disk_bytes=10 ** 9)
+    for i in range(20):
+        other.put(f"{i:02d}" + "0" * 62, vector)
+
+    # The periodic rescan notices them on this process's next write
+    monkeypatch.setattr(feature_cache, "_DISK_RESCAN_SECONDS", 0.0)
+    cache.put("ff" + "0" * 62, vector)
+    on_disk = sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(shared) for name in files)
+    assert on_disk <= 10 * entry_bytes
+    assert cache.stats()['disk_bytes'] == on_disk
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import feature_pipeline
+import mfcc_numpy
+
+librosa = pytest.importorskip("librosa")
+
+SR = 16000
+
+# Both compute in float32, so "about 2e-6" is relative to the size of the coefficients
+RTOL = 2e-6
+
+
+def _signal(n_samples):
+    """A decaying tone plus noise, the same on every run"""
+    t = np.arange(n_samples) / SR
+    noise = np.random.default_rng(0).standard_normal(n_samples)
+    return (0.3 * np.sin(2 * np.pi * 440 * t) * np.exp(-t) + 0.05 * noise).astype(np.float32)
+
+
+def _assert_close(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=RTOL, atol=RTOL * np.abs(expected).max())
+
+
+# From several seconds down to clips shorter than one n_fft frame, and a single sample
+@pytest.mark.filterwarnings("ignore:n_fft=.* is too large")
+@pytest.mark.parametrize("n_samples", [3 * SR, mfcc_numpy.N_FFT + 1, mfcc_numpy.N_FFT - 1, 300, 1])
+def test_mfcc_matches_librosa(n_samples):
+    y = _signal(n_samples)
+    expected = librosa.feature.mfcc(y=y, sr=SR, n_mfcc=40)
+    actual = mfcc_numpy.mfcc(y, SR, n_mfcc=40)
+    assert actual.shape == expected.shape
+    _assert_close(actual, expected)
+
+
+# The shortest clip with enough frames for deltas, and a longer one
+@pytest.mark.parametrize("n_samples", [(mfcc_numpy.DELTA_WIDTH - 1) * mfcc_numpy.HOP_LENGTH, 2 * SR])
+def test_summary_matches_librosa(n_samples):
+    y = _signal(n_samples)
+    _assert_close(mfcc_numpy.extract_mfcc_summary(y, SR), feature_pipeline.extract_mfcc(y, SR))
+
+
+@pytest.mark.filterwarnings("ignore:n_fft=.* is too large")
+def test_too_few_frames_for_deltas_is_rejected_like_librosa():
+    y = _signal(mfcc_numpy.N_FFT - 1)
+    with pytest.raises(librosa.util.exceptions.ParameterError):
+        feature_pipeline.extract_mfcc(y, SR)
+    with pytest.raises(ValueError, match="at least 9 frames"):
+        mfcc_numpy.extract_mfcc_summary(y, SR)
@@ -0,0 +1,57 @@
+import threading
+import time
+import types
+
+import result_cache
+
+
+def predictor(name, feature_type="mfcc", weights=None):
+    manager = types.SimpleNamespace(weights=lambda: dict(weights or {'v1': 100}))
+    return types.SimpleNamespace(PREDICTOR_NAME=name, get_manager=lambda: manager,
+                                 get_feature_type=lambda: feature_type)
+
+
+def unloadable(name):
+    def missing():
+        raise FileNotFoundError(f"Model file not found at models/{name}_prediction_model.pkl")
+    return types.SimpleNamespace(PREDICTOR_NAME=name, get_manager=missing, get_feature_type=missing)
+
+
+def test_model_state_marks_unloadable_predictors():
+    state = result_cache.model_state([predictor("covid", "wav2vec2", {'v3': 90, 'v4': 10}), unloadable("age")])
+    assert state == "covid=wav2vec2:v3@90,v4@10;age=unavailable"
+    assert result_cache.unavailable(state) == {"age"}
+    assert result_cache.unavailable(result_cache.model_state([predictor("covid")])) == set()
+
+
+def test_key_changes_once_the_model_loads():
+    missing = result_cache.model_state([predictor("covid"), unloadable("age")])
+    loaded = result_cache.model_state([predictor("covid"), predictor("age")])
+    assert result_cache.request_key(b"audio", "clip", missing) != result_cache.request_key(b"audio", "clip", loaded)
+
+
+def test_identical_requests_are_coalesced_while_a_model_is_unavailable():
+    cache = result_cache.ResultCache()
+    key = result_cache.request_key(b"audio", "clip", result_cache.model_state([predictor("covid"), unloadable("age")]))
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {'covid': 'Negative', 'age': None}
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(cache.get_or_compute(key, compute)[1]))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['in_flight'] == 0 or cache.stats()['coalesced'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(outcomes) == ['coalesced'] * 3 + ['miss']
+    assert cache.get_or_compute(key, compute)[1] == 'hit'
@@ -0,0 +1,84 @@
+import types
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import feature_pipeline
+import streaming
+
+
+def _write(tmp_path, y, sr=feature_pipeline.TARGET_SAMPLE_RATE):
+    path = str(tmp_path / "recording.wav")
+    sf.write(path, y, sr, subtype='FLOAT')
+    return path
+
+
+def _noise(seconds, sr=feature_pipeline.TARGET_SAMPLE_RATE):
+    return (0.1 * np.random.default_rng(0).standard_normal(int(seconds * sr))).astype(np.float32)
+
+
+def _predictor(name, predict=lambda features: {'width': len(features)}):
+    return types.SimpleNamespace(PREDICTOR_NAME=name, get_feature_type=lambda: 'mfcc', predict_from_features=predict)
+
+
+def test_clip_mean_does_not_count_overlap_twice(tmp_path, monkeypatch):
+    sr = feature_pipeline.TARGET_SAMPLE_RATE
+    # Each sample holds its own time, so a window's "feature" is its start time
+    y = np.arange(11 * sr, dtype=np.float32) / sr
+    path = str(tmp_path / "ramp.wav")
+    sf.write(path, y, sr, subtype='FLOAT')
+    monkeypatch.setattr(feature_pipeline, "extract", lambda y, sr, feature_type: np.array([y[0]]))
+    predictor = types.SimpleNamespace(PREDICTOR_NAME='start', get_feature_type=lambda: 'mfcc',
+                                      predict_from_features=lambda features: float(features[0]))
+
+    result = streaming.run_predictors_streaming(path, [predictor], window_seconds=5.0, overlap_seconds=1.0)
+
+    assert [(w['start'], w['end']) for w in result['windows']] == [(0.0, 5.0), (4.0, 9.0), (8.0, 11.0)]
+    # Weighted 4 s, 4 s and 3 s (the audio each window adds), not 5 s, 5 s and 3 s
+    assert abs(result['clip']['start'] - (0 * 4 + 4 * 4 + 8 * 3) / 11) < 1e-6
+
+
+def test_broken_head_does_not_fail_the_others(tmp_path):
+    def missing():
+        raise FileNotFoundError("Model file not found at models/age_prediction_model.pkl")
+
+    age = types.SimpleNamespace(PREDICTOR_NAME='age', get_feature_type=missing)
+    result = streaming.run_predictors_streaming(_write(tmp_path, _noise(7)), [_predictor('covid'), age])
+
+    assert result['clip']['covid'] == {'width': 120}
+    assert result['clip']['age'] is None
+    assert "Model file not found" in result['errors']['age']
+    assert all(window['covid'] is not None and window['age'] is None for window in result['windows'])
+
+
+def test_failing_prediction_is_reported_per_head(tmp_path):
+    def broken(features):
+        raise ValueError("covid v2 takes 768 features, got 120")
+
+    result = streaming.run_predictors_streaming(_write(tmp_path, _noise(7)),
+                                                [_predictor('covid', broken), _predictor('age')])
+    assert result['clip'] == {'covid': None, 'age': {'width': 120}}
+    assert result['errors'] == {'covid': "covid v2 takes 768 features, got 120"}
+
+
+@pytest.mark.parametrize("tail_seconds", [0.05, 0.2, 0.45])
+def test_short_tail_without_overlap_is_merged(tmp_path, tail_seconds):
+    # Without overlap the last window is just the tail, fewer than the 9 frames MFCC deltas need
+    path = _write(tmp_path, _noise(10 + tail_seconds))
+    result = streaming.run_predictors_streaming(path, [_predictor('covid')], window_seconds=5.0, overlap_seconds=0.0)
+
+    assert result['errors'] == {}
+    assert [(w['start'], w['end']) for w in result['windows']] == [(0.0, 5.0), (5.0, round(10 + tail_seconds, 3))]
+    assert result['clip']['covid'] == {'width': 120}
+
+
+def test_merge_short_tail_keeps_samples_once():
+    sr = 10
+    y = np.arange(22, dtype=np.float32)
+    # 1 s windows with a 0.2 s overlap, as iter_windows() cuts them: the last one holds
+    # samples 16-21, of which 16 and 17 are already in the window before it
+    windows = [(start / sr, y[start:start + 10]) for start in range(0, 20, 8)]
+    merged = list(streaming.merge_short_tail(windows, min_samples=8, sample_rate=sr))
+    assert [start for start, _ in merged] == [0.0, 0.8]
+    np.testing.assert_array_equal(merged[-1][1], y[8:22])
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import feature_pipeline
+
+SAMPLE_RATE = 16000
+
+
+def tiny_wav2vec2(feat_extract_norm):
+    """Randomly initialised wav2vec2 small enough to run in a test, with a matching processor
+
+    'group' is the architecture of wav2vec2-base-960h (no attention mask),
+    'layer' that of the checkpoints trained with one.
+    """
+    torch.manual_seed(0)
+    config = transformers.Wav2Vec2Config(
+        hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        conv_dim=(16, 16, 16), conv_stride=(5, 4, 4), conv_kernel=(10, 4, 4),
+        num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2,
+        feat_extract_norm=feat_extract_norm, do_stable_layer_norm=feat_extract_norm == 'layer')
+    model = transformers.Wav2Vec2Model(config).eval()
+    processor = transformers.Wav2Vec2FeatureExtractor(
+        sampling_rate=SAMPLE_RATE, do_normalize=True, return_attention_mask=feat_extract_norm == 'layer')
+    return processor, model
+
+
+def waveforms():
+    rng = np.random.default_rng(0)
+    # Two clips share a length, so the unpadded path also batches
+    return [rng.standard_normal(n).astype(np.float32) * 0.1 for n in (8000, 12000, 8000, 20000)]
+
+
+@pytest.mark.parametrize("feat_extract_norm", ["group", "layer"])
+def test_batched_embeddings_match_single_clips(feat_extract_norm):
+    processor, model = tiny_wav2vec2(feat_extract_norm)
+    clips = waveforms()
+    batched = feature_pipeline.extract_wav2vec2_batch(clips, SAMPLE_RATE, processor, model)
+    single = np.stack([feature_pipeline.extract_wav2vec2(y, SAMPLE_RATE, processor, model) for y in clips])
+    assert batched.shape == single.shape
+    np.testing.assert_allclose(batched, single, rtol=1e-4, atol=1e-5)
+
+
+def test_batch_is_independent_of_its_neighbours():
+    processor, model = tiny_wav2vec2("group")
+    clips = waveforms()
+    alone = feature_pipeline.extract_wav2vec2_batch(clips[:1], SAMPLE_RATE, processor, model)
+    together = feature_pipeline.extract_wav2vec2_batch(clips, SAMPLE_RATE, processor, model)
+    np.testing.assert_allclose(together[0], alone[0], rtol=1e-4, atol=1e-5)
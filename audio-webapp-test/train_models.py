@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import argparse
+import resource
+
+import numpy as np
+
+import embedding_store
+import model_package
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+# Label spellings accepted for the COVID head; anything else is skipped
+POSITIVE_LABELS = {"1", "positive", "pos", "true", "yes", "covid"}
+NEGATIVE_LABELS = {"0", "negative", "neg", "false", "no", "healthy"}
+
+# Training reads every labeled row from an embedding store (embedding_store.py),
+# so retraining after new recordings are added only extracts the new ones. Each
+# head is cross-validated, refit on all rows and written as a new model package
+# version, which model_manager picks up like any other deployment.
+
+
+def _covid_target(value):
+    value = str(value).strip().lower()
+    if value in POSITIVE_LABELS:
+        return 1
+    if value in NEGATIVE_LABELS:
+        return 0
+    return None
+
+
+def _age_target(value):
+    try:
+        age = float(value)
+    except (TypeError, ValueError):
+        return None
+    return age if np.isfinite(age) and age >= 0 else None
+
+
+def _peak_memory_mb():
+    """Peak RSS of this trainer process, in MB
+
+    The CV and extraction workers aren't counted: getrusage() only sees
+    children that have been reaped, and joblib keeps its workers alive.
+    """
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def training_set(store, label, target, overrides=None):
+    """(X, y, rows) for every stored row whose label converts with target()
+
+    overrides maps absolute paths to label dicts (from read_labels) and
+    takes precedence over the labels stored at extraction time, so labels
+    can be corrected without re-extracting.
+    """
+    overrides = overrides or {}
+    rows = []
+    y = []
+    for row in range(len(store)):
+        record = store.metadata(row)
+        value = overrides.get(record.get("path"), {}).get(label, record.get(label))
+        converted = _covid_target(value) if target == "covid" else _age_target(value)
+        if converted is not None:
+            rows.append(row)
+            y.append(converted)
+    rows = np.array(rows, dtype=np.int64)
+    X = np.asarray(store.vectors()[rows]) if len(rows) else np.empty((0, store.dim), dtype=np.float32)
+    return X, np.array(y), rows
+
+
+def build_estimator(target, n_estimators, n_jobs, seed):
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    if target == "covid":
+        return RandomForestClassifier(n_estimators=n_estimators, class_weight="balanced",
+                                      n_jobs=n_jobs, random_state=seed)
+    return RandomForestRegressor(n_estimators=n_estimators, n_jobs=n_jobs, random_state=seed)
+
+
+def train_head(target, X, y, folds, n_estimators, n_jobs, seed):
+    """Cross-validate in parallel, then refit on all rows; returns (model, cv summary)"""
+    from sklearn.model_selection import KFold, StratifiedKFold, cross_validate
+
+    cv_summary = {}
+    if target == "covid":
+        folds = min(folds, int(np.bincount(y, minlength=2).min()))
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed) if folds >= 2 else None
+        scoring = {"accuracy": "accuracy", "balanced_accuracy": "balanced_accuracy", "roc_auc": "roc_auc"}
+    else:
+        folds = min(folds, len(y))
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=seed) if folds >= 2 else None
+        scoring = {"mae": "neg_mean_absolute_error", "r2": "r2"}
+
+    if splitter is None:
+        print(f"  Too few rows for cross-validation; fitting on all {len(y)} rows")
+    else:
+        # Folds run in parallel, one single-threaded forest per fold
+        start = time.perf_counter()
+        scores = cross_validate(build_estimator(target, n_estimators, 1, seed), X, y,
+                                cv=splitter, scoring=scoring, n_jobs=n_jobs)
+        elapsed = time.perf_counter() - start
+        for name in scoring:
+            values = scores[f"test_{name}"]
+            if scoring[name].startswith("neg_"):
+                values = -values
+            cv_summary[name] = float(values.mean())
+            print(f"  {folds}-fold {name}: {values.mean():.4f} +/- {values.std():.4f}")
+        print(f"  Cross-validation: {elapsed:.2f}s, {folds * len(y) / elapsed:.0f} rows/s")
+        cv_summary["folds"] = folds
+
+    start = time.perf_counter()
+    model = build_estimator(target, n_estimators, n_jobs, seed)
+    model.fit(X, y)
+    elapsed = time.perf_counter() - start
+    print(f"  Final fit on {len(y)} rows: {elapsed:.2f}s, {len(y) / elapsed:.0f} rows/s")
+    return model, cv_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the COVID and age models from an embedding store")
+    parser.add_argument("inputs", nargs="*",
+                        help="Audio directories, glob patterns or CSV manifests to extract first (only new files)")
+    parser.add_argument("--store", required=True, help="Embedding store directory (see embedding_store.py)")
+    parser.add_argument("--feature-type", default="wav2vec2", choices=embedding_store.FEATURE_TYPES,
+                        help="Features to extract when the store is created")
+    parser.add_argument("--labels", nargs="+",
+                        help="CSV manifests with a path column; overrides the labels stored at extraction")
+    parser.add_argument("--covid-label", default="covid", help="Label column for the COVID classifier")
+    parser.add_argument("--age-label", default="age", help="Label column for the age regressor")
+    parser.add_argument("--heads", nargs="+", default=["covid", "age"], choices=["covid", "age"])
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--n-estimators", type=int, default=300, help="Trees per forest")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel CV folds / tree fits (-1: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction worker processes")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Files per extraction task")
+    parser.add_argument("--packages-dir", default=model_package.packages_dir(MODELS_DIR),
+                        help="Where new model package versions are written")
+    parser.add_argument("--dry-run", action="store_true", help="Train and report without writing packages")
+    args = parser.parse_args()
+
+    if args.inputs:
+        embedding_store.fill(args.store, args.inputs, args.feature_type, args.labels,
+                             args.workers, args.chunk_size)
+    store = embedding_store.EmbeddingStore(args.store)
+    feature_type = store.feature_config.split(":", 1)[0]
+    print(f"{args.store}: {len(store)} rows x {store.dim} ({store.feature_config})")
+
+    overrides = {}
+    for manifest in args.labels or []:
+        overrides.update(embedding_store.read_labels(manifest))
+
+    exit_code = 0
+    for head in args.heads:
+        label = args.covid_label if head == "covid" else args.age_label
+        X, y, rows = training_set(store, label, head, overrides)
+        print(f"{head}: {len(rows)} labeled rows (label column '{label}')")
+        if head == "covid" and len(np.unique(y)) < 2:
+            print(f"  Skipping {head}: needs both positive and negative rows")
+            exit_code = 1
+            continue
+        if len(rows) < 2:
+            print(f"  Skipping {head}: not enough labeled rows")
+            exit_code = 1
+            continue
+
+        model, cv_summary = train_head(head, X, y, args.folds, args.n_estimators, args.n_jobs, args.seed)
+        feature_info = {
+            # Checked by predict_covid / predict_age before predicting
+            "feature_type": feature_type,
+            "input_shape": (store.dim,),
+            "feature_config": store.feature_config,
+            "label": label,
+            "n_samples": int(len(rows)),
+            "cv": cv_summary,
+        }
+        if head == "covid":
+            feature_info["class_counts"] = {"negative": int((y == 0).sum()), "positive": int((y == 1).sum())}
+
+        if args.dry_run:
+            continue
+        version_dir = model_package.package(model, feature_info, os.path.join(args.packages_dir, head),
+                                            source=f"train_models.py:{os.path.abspath(args.store)}")
+        print(f"  Wrote {version_dir}")
+
+    print(f"Peak memory: {_peak_memory_mb():.0f} MB (trainer process, workers not included)")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
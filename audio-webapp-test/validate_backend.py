@@ -0,0 +1,99 @@
+import sys
+import time
+import argparse
+
+import numpy as np
+
+import cpu_runtime
+import model_registry
+import feature_pipeline
+import feature_cache
+import embedding_backends
+import predict_covid
+import predict_age
+from batch_score import collect_inputs
+
+
+def embed_all(waveforms, processor, model, batch_size):
+    """Mean-pooled embeddings for every waveform and the seconds spent computing them"""
+    start = time.perf_counter()
+    rows = []
+    for i in range(0, len(waveforms), batch_size):
+        rows.append(feature_pipeline.extract_wav2vec2_batch(
+            waveforms[i:i + batch_size], feature_pipeline.TARGET_SAMPLE_RATE, processor, model))
+    return np.concatenate(rows), time.perf_counter() - start
+
+
+def compare_predictions(reference, candidate):
+    """Agreement of the COVID and age heads on the two embedding matrices"""
+    report = {}
+    if feature_pipeline.split_feature_type(predict_covid.get_feature_type())[0] == 'wav2vec2':
+        ref = predict_covid.predict_batch(reference)
+        new = predict_covid.predict_batch(candidate)
+        pairs = [(a, b) for a, b in zip(ref, new) if a is not None and b is not None]
+        if pairs:
+            report['covid_label_agreement'] = np.mean([a['prediction'] == b['prediction'] for a, b in pairs])
+            report['covid_confidence_max_diff'] = max(abs(a['confidence'] - b['confidence']) for a, b in pairs)
+    if feature_pipeline.split_feature_type(predict_age.get_feature_type())[0] == 'wav2vec2':
+        ref = predict_age.predict_batch(reference)
+        new = predict_age.predict_batch(candidate)
+        pairs = [(a, b) for a, b in zip(ref, new) if a is not None and b is not None]
+        if pairs:
+            report['age_mean_abs_diff_years'] = np.mean([abs(a['age'] - b['age']) for a, b in pairs])
+            report['age_max_abs_diff_years'] = max(abs(a['age'] - b['age']) for a, b in pairs)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how far a wav2vec2 embedding backend drifts from fp32")
+    parser.add_argument("inputs", nargs='+', help="Reference audio directories, glob patterns or CSV manifests")
+    parser.add_argument("--backends", nargs='+', default=["torch_int8", "onnx"],
+                        choices=[b for b in embedding_backends.BACKENDS if b != "torch"],
+                        help="Backends to compare against fp32 torch")
+    parser.add_argument("--batch-size", type=int, default=8, help="Recordings per forward pass")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Fail if any embedding's cosine similarity to fp32 is below this")
+    args = parser.parse_args()
+
+    # Compare raw model outputs, not cached vectors
+    feature_cache.configure(enabled=False)
+
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("No reference audio found")
+        return 1
+    waveforms = [feature_pipeline.load_audio(path)[0] for path in paths]
+    print(f"Reference set: {len(paths)} recordings")
+
+    processor, model = embedding_backends.load_backend(model_registry.AUDIO_MODEL_NAME, "torch")
+    reference, reference_seconds = embed_all(waveforms, processor, model, args.batch_size)
+    print(f"torch (fp32): {reference_seconds:.2f}s")
+
+    failed = False
+    for backend in args.backends:
+        processor, model = embedding_backends.load_backend(model_registry.AUDIO_MODEL_NAME, backend)
+        candidate, seconds = embed_all(waveforms, processor, model, args.batch_size)
+
+        cosine = np.sum(reference * candidate, axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1))
+        relative_l2 = np.linalg.norm(reference - candidate, axis=1) / np.linalg.norm(reference, axis=1)
+
+        print(f"{backend}: {seconds:.2f}s ({reference_seconds / seconds:.2f}x vs fp32)")
+        print(f"  cosine similarity   min {cosine.min():.5f}  mean {cosine.mean():.5f}")
+        print(f"  relative L2 error   max {relative_l2.max():.5f}  mean {relative_l2.mean():.5f}")
+        print(f"  max abs difference  {np.abs(reference - candidate).max():.5f}")
+        for name, value in compare_predictions(reference, candidate).items():
+            print(f"  {name:<26} {value:.4f}")
+
+        failed |= cosine.min() < args.min_cosine
+
+    if failed:
+        print(f"Drift check FAILED: cosine similarity below {args.min_cosine}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Before the models load: size torch, BLAS and OpenMP pools from CPU_THREADS
+    cpu_runtime.apply()
+    sys.exit(main())